@@ -0,0 +1,129 @@
+"""
+Latency of task search through the FTS5 index against a plain icontains
+filter, as a user types a query one keystroke at a time.
+
+    python benchmarks/search_fts_vs_icontains.py --tasks 1000000
+
+Each prefix of every query is searched the way the search box would send it
+(first page only). FTS5 goes through `todos.search.search_tasks`; icontains
+filters title OR description and orders by pk, which is the cheapest
+ordering it can have. Words follow a Zipf distribution over a 50k-word
+vocabulary; the queries mix common words, a rare word and a miss.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMON = (
+    "buy milk bread eggs report invoice call plumber dentist email review "
+    "deploy release budget meeting garden paint fence book flight hotel "
+    "renew passport insurance tax return backup laptop clean garage"
+).split()
+QUERIES = ['invoice', 'plumber', 'passport renew', 'quarterly', 'zephyrine']
+
+
+def vocabulary(rng, size=50000):
+    """Common task words plus `size` made-up ones, to get a realistic long tail."""
+    syllables = ['ka', 'lo', 'mi', 'ren', 'sto', 'vel', 'dra', 'pin', 'tur', 'ax', 'qui', 'bel']
+    words = {''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(size)}
+    return COMMON + sorted(words)
+
+
+def sentence(rng, words, weights, k):
+    return ' '.join(rng.choices(words, cum_weights=weights, k=k))
+
+
+def setup_django(db_path, tasks, batch_size=20000):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_project.settings')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+
+    from django.core.management import call_command
+    from todos.models import Task
+
+    call_command('migrate', verbosity=0)
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    # Zipf: the i-th most common word appears with weight 1/i.
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    started = time.perf_counter()
+    for start in range(0, tasks, batch_size):
+        Task.objects.bulk_create(
+            Task(
+                title=sentence(rng, words, weights, 4),
+                description=sentence(rng, words, weights, 15),
+            )
+            for _ in range(start, min(start + batch_size, tasks))
+        )
+    print(f"seeded {tasks} tasks in {time.perf_counter() - started:.0f}s")
+
+
+def keystrokes(query):
+    return [query[:i] for i in range(1, len(query) + 1) if not query[i - 1].isspace()]
+
+
+def fts(query, per_page):
+    from todos.search import search_tasks
+
+    return len(search_tasks(query, per_page))
+
+
+def icontains(query, per_page):
+    from django.db.models import Q
+    from todos.models import Task
+
+    queryset = Task.objects.all()
+    for word in query.split():
+        queryset = queryset.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    return len(queryset.order_by('pk')[:per_page])
+
+
+def run(search, query, per_page):
+    latencies = []
+    for typed in keystrokes(query):
+        started = time.perf_counter()
+        search(typed, per_page)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    print(f"{name:<26}{len(latencies):>6}{p50:>10.1f}{max(latencies) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=1000000)
+    parser.add_argument('--per-page', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'), args.tasks)
+        print(f"{'':<26}{'keys':>6}{'p50 ms':>10}{'max ms':>10}")
+        for name, search in (('fts5', fts), ('icontains', icontains)):
+            everything = []
+            for query in QUERIES:
+                latencies = run(search, query, args.per_page)
+                report(f"{name} {query}", latencies)
+                everything += latencies
+            report(f"{name} (all)", everything)
+
+
+if __name__ == '__main__':
+    main()
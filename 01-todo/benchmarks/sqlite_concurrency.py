@@ -0,0 +1,117 @@
+"""
+Concurrent write benchmark for the SQLite settings profiles.
+
+Runs the same workload against a fresh database under the development
+settings and under ``todo_project.settings_production``, and reports write
+throughput and "database is locked" errors for each:
+
+    python benchmarks/sqlite_concurrency.py --workers 8 --seconds 5
+
+Each worker process repeatedly reads a task and toggles it inside one
+transaction, the read-then-write shape of a form save. With deferred
+transactions and a rollback journal, two such transactions can both hold a
+read lock and neither can upgrade, so one fails immediately regardless of
+the busy timeout.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROFILES = {
+    'default': 'todo_project.settings',
+    'production': 'todo_project.settings_production',
+}
+
+
+def setup_django(settings_module, db_path):
+    sys.path.insert(0, str(ROOT))
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark-only')
+    os.environ['TODO_DB_PATH'] = db_path
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES['default']['NAME'] = db_path
+
+
+def prepare(settings_module, db_path, tasks):
+    setup_django(settings_module, db_path)
+    from django.core.management import call_command
+    from todos.models import Task
+
+    call_command('migrate', verbosity=0)
+    Task.objects.bulk_create(Task(title=f"Task {i}") for i in range(tasks))
+
+
+def work(settings_module, db_path, worker, seconds, results):
+    setup_django(settings_module, db_path)
+    from django.db import OperationalError, connection, transaction
+    from todos.models import Task
+
+    ids = list(Task.objects.values_list('pk', flat=True))
+    writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    i = worker
+    while time.perf_counter() < deadline:
+        pk = ids[i % len(ids)]
+        i += 1
+        try:
+            with transaction.atomic():
+                Task.objects.filter(pk=pk).values_list('completed', flat=True).first()
+                Task.objects.filter(pk=pk).toggle()
+            writes += 1
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((writes, errors))
+
+
+def run_profile(name, workers, seconds, tasks):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        process = context.Process(target=prepare, args=(PROFILES[name], db_path, tasks))
+        process.start()
+        process.join()
+
+        results = context.Queue()
+        processes = [
+            context.Process(target=work, args=(PROFILES[name], db_path, n, seconds, results))
+            for n in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    writes = sum(w for w, _ in totals)
+    errors = sum(e for _, e in totals)
+    return writes, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--profile', choices=PROFILES, action='append',
+                        help="Profile(s) to run (default: all).")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'writes':>10}{'writes/s':>12}{'lock errors':>14}")
+    for name in args.profile or PROFILES:
+        writes, errors = run_profile(name, args.workers, args.seconds, args.tasks)
+        print(f"{name:<12}{writes:>10}{writes / args.seconds:>12.0f}{errors:>14}")
+
+
+if __name__ == '__main__':
+    main()
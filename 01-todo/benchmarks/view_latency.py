@@ -0,0 +1,159 @@
+"""
+Latency percentiles, query counts and peak memory of every todos URL on
+seeded datasets.
+
+    python benchmarks/view_latency.py --sizes 10k 100k 1M --repeat 50
+
+For each size a fresh database is filled by ``manage.py seed_tasks``. Every
+URL in ``todos/urls.py`` is then requested ``--repeat`` times through the
+test client: the GET views with the same paths (and cursor / filter
+variants) that ``check_query_plans`` checks, the POST-only views with a
+small realistic form. The page cache is disabled so every request reaches
+the database. Peak memory is taken from one extra, tracemalloc-traced
+request per URL, so tracing does not distort the timings.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# URL names that only accept POST; get_cases() gives each a form.
+POST_VIEWS = {'task_reorder', 'task_bulk', 'task_restore'}
+
+
+def setup_django(db_path, size):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_project.settings')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    connection.close()
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    call_command('seed_tasks', size, verbosity=0, stdout=io.StringIO())
+    print(f"seeded {size} tasks in {time.perf_counter() - started:.0f}s")
+
+
+def get_cases():
+    """``(label, method, path, prepare)`` for every URL; `prepare` returns the POST data."""
+    from django.urls import reverse
+    from django.utils import timezone
+    from todos import archive
+    from todos.management.commands.check_query_plans import sample_task, view_requests
+    from todos.models import Task, TaskArchive
+
+    task = sample_task()
+    cases = [
+        (label, 'get', path, None) for label, path in view_requests(task)
+        if label.split()[0] not in POST_VIEWS
+    ]
+    # Reference tasks for the POST views: a neighbour in the same list and a
+    # batch of ids, fetched once, outside the measurements.
+    other = Task.objects.filter(task_list_id=task.task_list_id).exclude(pk=task.pk).first()
+    ids = ','.join(map(str, Task.objects.filter(task_list_id=task.task_list_id).values_list('pk', flat=True)[:100]))
+    # The oldest completed task, so archiving up to it moves only that one.
+    restorable = Task.objects.archivable(timezone.now()).first()
+
+    def archived():
+        if not TaskArchive.objects.filter(pk=restorable.pk).exists():
+            archive.archive_tasks(restorable.completed_at + timedelta(microseconds=1))
+        return {}
+
+    cases += [
+        ('task_reorder (POST)', 'post', reverse('task_reorder', args=[task.pk]), lambda: {'before': other.pk}),
+        ('task_bulk (POST)', 'post', reverse('task_bulk'),
+         lambda: {'action': 'reprioritize', 'ids': ids, 'priority': Task.PRIORITY_HIGH}),
+        ('task_restore (POST)', 'post', reverse('task_restore', args=[restorable.pk]), archived),
+    ]
+    return cases
+
+
+def measure(client, method, path, prepare):
+    """Return ``(seconds, queries)`` for one request."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    data = prepare() if prepare else None
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, method)(path, data)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}")
+    return elapsed, len(queries)
+
+
+def peak_memory(client, method, path, prepare):
+    data = prepare() if prepare else None
+    tracemalloc.start()
+    try:
+        response = getattr(client, method)(path, data)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(repeat):
+    from django.test import Client
+
+    client = Client()
+    print(f"{'':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KiB':>10}")
+    for label, method, path, prepare in get_cases():
+        latencies, counts = [], set()
+        for _ in range(repeat):
+            elapsed, queries = measure(client, method, path, prepare)
+            latencies.append(elapsed * 1000)
+            counts.add(queries)
+        peak = peak_memory(client, method, path, prepare)
+        queries = '/'.join(map(str, sorted(counts)))
+        print(
+            f"{label:<34}{statistics.median(latencies):>9.1f}{percentile(latencies, 0.95):>9.1f}"
+            f"{percentile(latencies, 0.99):>9.1f}{queries:>9}{peak / 1024:>10.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k'],
+                        help="Dataset sizes for seed_tasks (default: 10k 100k).")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\n== {size} ==")
+            setup_django(os.path.join(tmp, 'bench.sqlite3'), size)
+            run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Throughput and tail latency of the WSGI (sync views) and ASGI (async views)
+entry points under many concurrent clients.
+
+    python benchmarks/wsgi_vs_asgi.py --clients 100 --requests 5000
+
+Both applications are driven in-process, without a network server, so the
+numbers isolate Django plus the views: WSGI requests run on a pool of
+``--clients`` threads (like a threaded WSGI server), ASGI requests run as
+``--clients`` concurrent coroutines on one event loop (like uvicorn). Each
+client loops over the list page, a cursor page, an edit form and a toggle.
+The page cache is disabled so every request reaches the database.
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path, tasks):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_project.settings')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['localhost']
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    from django.core.management import call_command
+    from todos.models import Task, TaskList
+
+    call_command('migrate', verbosity=0)
+    lists = TaskList.objects.bulk_create(TaskList(name=f"List {i}") for i in range(20))
+    Task.objects.bulk_create(
+        Task(title=f"Task {i}", task_list=lists[i % len(lists)], priority=i % 3 + 1)
+        for i in range(tasks)
+    )
+
+
+def request_paths(count):
+    from todos.models import Task
+    from todos.pagination import KeysetPaginator
+    from todos.views import TaskListView
+
+    ids = list(Task.objects.values_list('pk', flat=True)[:200])
+    paginator = KeysetPaginator(TaskListView().get_queryset(), TaskListView.paginate_by)
+    cursor = paginator.encode(Task.objects.get(pk=ids[len(ids) // 2]))
+    pattern = ['/', f'/?cursor={cursor}', 'update', 'toggle']
+    paths = []
+    for i in range(count):
+        kind = pattern[i % len(pattern)]
+        pk = ids[i % len(ids)]
+        paths.append({'update': f'/update/{pk}/', 'toggle': f'/toggle/{pk}/'}.get(kind, kind))
+    return paths
+
+
+def run_wsgi(paths, clients):
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def call(path):
+        path, _, query = path.partition('?')
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': 'localhost',
+                   'wsgi.input': io.BytesIO()}
+        setup_testing_defaults(environ)
+        status = []
+        started = time.perf_counter()
+        body = application(environ, lambda s, headers: status.append(s))
+        b''.join(body)
+        body.close()
+        elapsed = time.perf_counter() - started
+        assert status[0][:3] in ('200', '302'), (path, status[0])
+        return elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(call, paths))
+    return time.perf_counter() - started, latencies
+
+
+def run_asgi(paths, clients):
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def call(path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        disconnect = asyncio.get_running_loop().create_future()
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            return await disconnect
+
+        async def send(message):
+            sent.append(message)
+
+        started = time.perf_counter()
+        await application(scope, receive, send)
+        elapsed = time.perf_counter() - started
+        assert sent[0]['status'] in (200, 302), (path, sent[0]['status'])
+        return elapsed
+
+    async def client(queue, latencies):
+        while queue:
+            latencies.append(await call(queue.pop()))
+
+    async def main():
+        queue = list(reversed(paths))
+        latencies = []
+        started = time.perf_counter()
+        await asyncio.gather(*(client(queue, latencies) for _ in range(clients)))
+        return time.perf_counter() - started, latencies
+
+    return asyncio.run(main())
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{name:<6}{len(latencies) / elapsed:>12.0f}{p50:>10.1f}{p99:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--tasks', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'), args.tasks)
+        paths = request_paths(args.requests)
+        print(f"{args.requests} requests, {args.clients} concurrent clients, {args.tasks} tasks")
+        print(f"{'':<6}{'req/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        report('wsgi', *run_wsgi(paths, args.clients))
+        report('asgi', *run_asgi(paths, args.clients))
+
+
+if __name__ == '__main__':
+    main()
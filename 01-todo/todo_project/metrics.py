@@ -0,0 +1,171 @@
+"""
+Per-request timing and SQL accounting, and in-process latency histograms.
+
+`RequestMetrics` collects what one request spent: queries and their time
+(through an execute wrapper installed on every database connection) and
+template rendering time (through a thin wrapper around Django's
+``Template.render``). Both only record while a request is being measured,
+which is tracked with a context variable, so they also follow async views
+into the threads the async ORM runs queries in.
+
+Finished requests are added to per-URL-name histograms kept in this process;
+`snapshot()` returns them for the metrics endpoint.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import base as template_base
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Statements kept per request for the slow-request sample.
+MAX_STATEMENTS = 200
+# Slow requests kept for the metrics endpoint.
+MAX_SLOW_SAMPLES = 20
+
+_current = ContextVar('todo_request_metrics', default=None)
+
+_lock = threading.Lock()
+_histograms = {}
+_slow = deque(maxlen=MAX_SLOW_SAMPLES)
+
+
+class RequestMetrics:
+    """What one request spent, filled in while it runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.statements = []
+        self._template_depth = 0
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """The value of a ``Server-Timing`` header for this request."""
+        return (
+            f'db;dur={self.sql_ms:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_ms:.1f}, total;dur={self.total_ms:.1f}'
+        )
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_ms, 1),
+            'template_ms': round(self.template_ms, 1),
+            'total_ms': round(self.total_ms, 1),
+        }
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.queries += 1
+        metrics.sql_ms += elapsed
+        if len(metrics.statements) < MAX_STATEMENTS:
+            # No params: they carry user data (titles, search terms).
+            metrics.statements.append({'sql': sql, 'ms': round(elapsed, 2)})
+
+
+def _instrument_connection(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _render(self, context):
+    metrics = _current.get()
+    if metrics is None:
+        return _original_render(self, context)
+    # {% include %} and {% extends %} render nested templates; only the
+    # outermost call is timed so nothing is counted twice.
+    metrics._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        metrics._template_depth -= 1
+        if not metrics._template_depth:
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+_original_render = None
+
+
+def install():
+    """Start measuring queries and template rendering; safe to call repeatedly."""
+    global _original_render
+    with _lock:
+        if _original_render is None:
+            _original_render = template_base.Template.render
+            template_base.Template.render = _render
+            connection_created.connect(_instrument_connection, dispatch_uid='todo_request_metrics')
+    instrument_connections()
+
+
+def instrument_connections():
+    """Measure the connections this thread opened before `install()`."""
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection)
+
+
+def observe(url_name, metrics, sample=None):
+    """Add a finished request to the histogram of `url_name`; keep `sample` if given."""
+    with _lock:
+        histogram = _histograms.get(url_name)
+        if histogram is None:
+            histogram = _histograms[url_name] = {
+                'count': 0, 'total_ms': 0.0, 'sql_ms': 0.0, 'queries': 0,
+                'buckets': [0] * (len(BUCKETS_MS) + 1),
+            }
+        histogram['count'] += 1
+        histogram['total_ms'] += metrics.total_ms
+        histogram['sql_ms'] += metrics.sql_ms
+        histogram['queries'] += metrics.queries
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if metrics.total_ms <= bound), len(BUCKETS_MS))
+        histogram['buckets'][index] += 1
+        if sample is not None:
+            _slow.append(sample)
+
+
+def snapshot():
+    """Histograms per URL name and the recent slow-request samples, for this process."""
+    with _lock:
+        views = {}
+        for url_name, histogram in sorted(_histograms.items()):
+            count = histogram['count']
+            views[url_name] = {
+                'count': count,
+                'mean_ms': round(histogram['total_ms'] / count, 1),
+                'mean_sql_ms': round(histogram['sql_ms'] / count, 1),
+                'mean_queries': round(histogram['queries'] / count, 1),
+                'buckets': {
+                    **{f'le_{bound}': n for bound, n in zip(BUCKETS_MS, histogram['buckets'])},
+                    'inf': histogram['buckets'][-1],
+                },
+            }
+        return {'buckets_ms': list(BUCKETS_MS), 'views': views, 'slow': list(_slow)}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _slow.clear()
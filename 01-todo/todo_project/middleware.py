@@ -0,0 +1,131 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics, routers
+
+logger = logging.getLogger('todo_project.requests')
+
+# Requests slower than this (ms) are logged with their SQL; overridable
+# with the REQUEST_METRICS_SLOW_MS setting.
+SLOW_MS = 500
+# Holds the time until which a client that wrote reads from the primary.
+PIN_COOKIE = 'primary_until'
+
+
+@sync_and_async_middleware
+def asgi_urlconf_middleware(get_response):
+    """
+    Route requests that arrive through ASGI to ``settings.ASGI_URLCONF``.
+
+    WSGI requests keep ROOT_URLCONF and its sync views, so the same settings
+    serve both entry points without either paying for sync/async switches.
+    """
+    urlconf = getattr(settings, 'ASGI_URLCONF', None)
+
+    def route(request):
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            route(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            route(request)
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """
+    Measure every request: query count, SQL time, template time and total time.
+
+    The numbers are returned in a ``Server-Timing`` header (shown by browser
+    dev tools), logged as one JSON line on the ``todo_project.requests``
+    logger and added to the per-view histograms of `todo_project.metrics`.
+    Requests slower than REQUEST_METRICS_SLOW_MS are also logged as a
+    warning with their SQL, and kept for the metrics endpoint. For streaming
+    responses the total covers the time to the first byte.
+    """
+    metrics.install()
+    slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', SLOW_MS)
+
+    def finish(request, response, measured):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        response['Server-Timing'] = measured.server_timing()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            **measured.as_dict(),
+        }
+        sample = None
+        if measured.total_ms >= slow_ms:
+            sample = {**record, 'sql': measured.statements}
+            logger.warning(json.dumps(sample))
+        else:
+            logger.info(json.dumps(record))
+        metrics.observe(view, measured, sample)
+        return response
+
+    if iscoroutinefunction(get_response):
+        pending = [True]
+
+        async def middleware(request):
+            if pending:
+                # The async ORM queries from another thread, which may
+                # already hold a connection that install() could not see.
+                await sync_to_async(metrics.instrument_connections)()
+                pending.clear()
+            with metrics.RequestMetrics() as measured:
+                response = await get_response(request)
+            return finish(request, response, measured)
+    else:
+        def middleware(request):
+            with metrics.RequestMetrics() as measured:
+                response = get_response(request)
+            return finish(request, response, measured)
+    return middleware
+
+
+@sync_and_async_middleware
+def replica_pinning_middleware(get_response):
+    """
+    Read-your-writes for `todo_project.routers`: pin a client whose request
+    wrote to the primary for REPLICA_LAG seconds, with a cookie holding the
+    pin's expiry. A forged cookie only sends its owner's reads to the primary.
+    """
+    def client(request):
+        try:
+            pinned = float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        return routers.Client(pinned)
+
+    def finish(response, client):
+        if client.wrote:
+            lag = routers.replica_lag()
+            response.set_cookie(PIN_COOKIE, f'{time.time() + lag:.3f}', max_age=lag, httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with client(request) as bound:
+                response = await get_response(request)
+            return finish(response, bound)
+    else:
+        def middleware(request):
+            with client(request) as bound:
+                response = get_response(request)
+            return finish(response, bound)
+    return middleware
@@ -0,0 +1,150 @@
+"""
+Database router sending the reads of selected views to read replicas.
+
+Only views wrapped in `use_replica` read from a replica; everything else,
+and every write, uses the ``default`` (primary) database. Replicas are the
+aliases listed in ``settings.DATABASE_REPLICAS``; with none configured the
+router sends everything to the primary.
+
+Read-your-writes: a request that writes reads from the primary for the rest
+of the request, and ``todo_project.middleware.replica_pinning_middleware``
+then pins the client to the primary for ``settings.REPLICA_LAG`` seconds (a
+cookie), long enough for the replicas to catch up with what it wrote.
+"""
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Seconds a replica may lag behind the primary; overridable with the
+# REPLICA_LAG setting.
+REPLICA_LAG = 5
+
+_client = ContextVar('todo_db_client', default=None)
+_replica_reads = ContextVar('todo_replica_reads', default=False)
+
+
+class Client:
+    """
+    Routing state of the client making the current request, bound by the
+    pinning middleware for the duration of the request.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+    def __enter__(self):
+        self._token = _client.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _client.reset(self._token)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def replica_lag():
+    return getattr(settings, 'REPLICA_LAG', REPLICA_LAG)
+
+
+def reading_replica():
+    """Whether reads in the current context go to a replica."""
+    client = _client.get()
+    return _replica_reads.get() and not (client and client.pinned) and bool(replicas())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_replica():
+            return random.choice(replicas())
+        # Explicit, or Django would follow an instance read from a replica.
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        client = _client.get()
+        if client is not None:
+            client.pinned = client.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        if db in replicas():
+            return False
+        return None
+
+
+@contextmanager
+def _replica_context(client):
+    """Replica reads on, on behalf of `client`."""
+    client_token = _client.set(client)
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+        _client.reset(client_token)
+
+
+def _streaming(chunks, client):
+    """
+    Iterate `chunks` as the view that returned them would: streamed content
+    is read after the view, and the middleware, have returned.
+    """
+    chunks = iter(chunks)
+    while True:
+        with _replica_context(client):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+async def _async_streaming(chunks, client):
+    chunks = aiter(chunks)
+    while True:
+        with _replica_context(client):
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def use_replica(view):
+    """
+    Let `view` read from a replica, unless the client is pinned to the
+    primary. Applies to streamed response content too.
+    """
+    def finish(response):
+        if getattr(response, 'streaming', False):
+            stream = _async_streaming if response.is_async else _streaming
+            response.streaming_content = stream(response.streaming_content, _client.get())
+        return response
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with _replica_context(_client.get()):
+                response = await view(*args, **kwargs)
+            return finish(response)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with _replica_context(_client.get()):
+                response = view(*args, **kwargs)
+            return finish(response)
+    return wrapper
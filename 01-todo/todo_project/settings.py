@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack.
+    'todo_project.middleware.request_metrics_middleware',
+    'todo_project.middleware.replica_pinning_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,10 +52,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'todo_project.middleware.asgi_urlconf_middleware',
 ]
 
 ROOT_URLCONF = 'todo_project.urls'
 
+# Requests slower than this many milliseconds are logged with their SQL.
+REQUEST_METRICS_SLOW_MS = 500
+
+# Used instead of ROOT_URLCONF for requests served by todo_project.asgi.
+ASGI_URLCONF = 'todo_project.urls_async'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -80,6 +91,45 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASES that todo_project.routers sends the
+# reads of list, export and search views to. To try it locally, point
+# TODO_REPLICA_DB at a second SQLite file and copy the primary into it with
+# `manage.py replicate` (e.g. `--every 2` to keep copying).
+DATABASE_ROUTERS = ['todo_project.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+if os.environ.get('TODO_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['TODO_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# Seconds a replica may lag behind the primary: a client reads from the
+# primary for this long after it writes.
+REPLICA_LAG = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# todos.cache versions its keys, so any backend works; use a shared one
+# (e.g. 'django.core.cache.backends.filebased.FileBasedCache') when running
+# several worker processes so invalidations reach all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'todos',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+
+# Background jobs (todos.jobs, run by `manage.py run_workers`): where export
+# jobs write their files.
+
+JOBS_EXPORT_DIR = BASE_DIR / 'exports'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,70 @@
+"""
+Production settings for todo_project.
+
+Use with ``DJANGO_SETTINGS_MODULE=todo_project.settings_production``. Only
+the values that differ from the development settings are set here.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+
+# Database
+# SQLite tuned for a web workload: WAL lets readers run alongside the single
+# writer, IMMEDIATE transactions take the write lock up front (so two
+# transactions never deadlock upgrading from a read lock), and busy_timeout
+# makes writers queue instead of failing with "database is locked".
+
+DATABASES['default'].update({
+    'NAME': os.environ.get('TODO_DB_PATH', BASE_DIR / 'db.sqlite3'),
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        'transaction_mode': 'IMMEDIATE',
+    },
+})
+
+# Applied to every new connection by todos.sqlite.apply_pragmas.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # durable across app crashes; fsync only at checkpoints under WAL
+    'busy_timeout': 5000,  # ms
+    'cache_size': -64000,  # negative = KiB, i.e. 64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# Shared by every worker process: todos.cache invalidates pages (and their
+# ETags) by bumping a version key, which a per-process LocMemCache would bump
+# in the writing worker only.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('TODO_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+
+# One JSON line per request from todo_project.middleware.request_metrics_middleware.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'todo_project.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     path('', include('todos.urls')),
 ]
@@ -0,0 +1,16 @@
+"""
+URL configuration used for requests served through todo_project.asgi.
+
+Identical to todo_project.urls except that the todos app is routed to its
+async views. Selected per request by todo_project.middleware.asgi_urlconf_middleware.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+from . import views
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('metrics/', views.request_metrics, name='request_metrics'),
+    path('', include('todos.async_urls')),
+]
@@ -0,0 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from . import metrics
+
+
+@staff_member_required
+def request_metrics(request):
+    """Latency histograms per view and recent slow requests, for this process."""
+    return JsonResponse(metrics.snapshot())
@@ -0,0 +1,70 @@
+"""
+Archival of old completed tasks.
+
+`archive_tasks()` (``manage.py archive_tasks``, e.g. nightly from cron)
+moves tasks completed before a cutoff from `todos_task` into
+`todos_taskarchive`, so the hot table and its indexes only hold current
+work. Each chunk is its own short transaction, so the views never wait on a
+long-held write lock. `restore()` moves archived tasks back, with their
+original ids.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Task, TaskArchive
+
+OLDER_THAN_DAYS = 90
+CHUNK_SIZE = 500
+
+
+def cutoff(days, now=None):
+    """The completion time before which tasks are archived."""
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_tasks(before, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Move every task completed before `before` into the archive.
+
+    Walks todos_task_completed_idx oldest first, `chunk_size` tasks per
+    transaction; each chunk is copied, then deleted through
+    `TaskQuerySet.delete()` so the TaskList counters and the search index
+    follow. `progress`, if given, is called with the running total after
+    each chunk. Returns the number of tasks archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            tasks = list(Task.objects.archivable(before)[:chunk_size])
+            if not tasks:
+                return archived
+            now = timezone.now()
+            TaskArchive.objects.bulk_create(TaskArchive.from_task(task, now) for task in tasks)
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+        archived += len(tasks)
+        if progress is not None:
+            progress(archived)
+
+
+def restore(archived, chunk_size=CHUNK_SIZE):
+    """
+    Move the archived tasks in `archived` (a TaskArchive queryset) back into
+    `todos_task`, completed, with their ids. Returns the number restored.
+    """
+    restored = 0
+    pks = list(archived.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), chunk_size):
+        batch = pks[start:start + chunk_size]
+        with transaction.atomic():
+            chunk = TaskArchive.objects.filter(pk__in=batch)
+            Task.objects.bulk_create(task.to_task() for task in chunk)
+            # bulk_create() stamps created_at as if the tasks were new.
+            Task.objects.filter(pk__in=batch).update(
+                created_at=Subquery(chunk.filter(pk=OuterRef('pk')).values('created_at')[:1]),
+                updated_at=timezone.now(),
+            )
+            restored += chunk.delete()[0]
+    return restored
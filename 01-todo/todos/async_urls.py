@@ -0,0 +1,19 @@
+from django.urls import path
+from . import async_views, urls
+
+# Same routes and names as todos.urls; the views below are swapped for their
+# async versions, everything else is served by the sync views.
+async_patterns = [
+    path('', async_views.task_list, name='task_list'),
+    path('create/', async_views.task_create, name='task_create'),
+    path('update/<int:pk>/', async_views.task_update, name='task_update'),
+    path('delete/<int:pk>/', async_views.task_delete, name='task_delete'),
+    path('toggle/<int:pk>/', async_views.toggle_task, name='task_toggle'),
+    path('feed/', async_views.task_feed, name='task_feed'),
+]
+
+_async_names = {pattern.name for pattern in async_patterns}
+
+urlpatterns = async_patterns + [
+    pattern for pattern in urls.urlpatterns if pattern.name not in _async_names
+]
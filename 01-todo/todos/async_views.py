@@ -0,0 +1,126 @@
+"""
+Async counterparts of the views in `todos.views`, served under ASGI.
+
+They use the async ORM directly, so a request under an ASGI server is not
+handed to a worker thread just to reach the view. Form validation still runs
+through `sync_to_async` because ModelChoiceField looks up its value with the
+sync ORM, and so does toggling (`TaskQuerySet.atoggle`), whose two UPDATEs
+need a transaction. The page cache and its validators are read through the
+async cache API.
+"""
+from asgiref.sync import sync_to_async
+from django.forms import modelform_factory
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from todo_project.routers import use_replica
+from . import cache, feed
+from .models import Task
+from .pagination import InvalidCursor, KeysetPaginator
+from .views import (
+    TaskCreateView, TaskDeleteView, TaskListView, TaskUpdateView, areplica_may_lag, conditional_on_data,
+    sidebar_lists,
+)
+
+TaskCreateForm = modelform_factory(Task, fields=TaskCreateView.fields)
+TaskUpdateForm = modelform_factory(Task, fields=TaskUpdateView.fields)
+
+
+async def _load_choices(form):
+    """Evaluate the task list choices up front so rendering never hits the DB."""
+    async for _ in form.fields['task_list'].queryset:
+        pass
+
+
+@use_replica
+@conditional_on_data
+async def task_list(request):
+    key = await cache.amake_key('page', request.GET.get('cursor', ''))
+    content = await cache.alookup(key)
+    if content is not None:
+        return HttpResponse(content)
+
+    queryset = Task.objects.order_by(*TaskListView.ordering)
+    paginator = KeysetPaginator(queryset, TaskListView.paginate_by)
+    try:
+        page = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    response = render(request, TaskListView.template_name, {
+        'tasks': page.object_list,
+        'object_list': page.object_list,
+        'page_obj': page,
+        'paginator': paginator,
+        'is_paginated': page.has_other_pages(),
+        'task_lists': [task_list async for task_list in sidebar_lists()],
+    })
+    if not await areplica_may_lag():
+        await cache.astore(key, response.content)
+    return response
+
+
+async def task_create(request):
+    form = TaskCreateForm(request.POST or None)
+    if request.method == 'POST' and await sync_to_async(form.is_valid)():
+        await form.save(commit=False).asave()
+        return redirect('task_list')
+    await _load_choices(form)
+    return render(request, TaskCreateView.template_name, {'form': form})
+
+
+async def task_update(request, pk):
+    # Like TaskUpdateView: only GETs are answered from the cache version; a
+    # POST with validators must always be processed.
+    if request.method == 'POST':
+        return await _task_update(request, pk)
+    return await _conditional_task_update(request, pk)
+
+
+async def _task_update(request, pk):
+    task = await aget_object_or_404(Task, pk=pk)
+    form = TaskUpdateForm(request.POST or None, instance=task)
+    if request.method == 'POST' and await sync_to_async(form.is_valid)():
+        await form.save(commit=False).asave()
+        return redirect('task_list')
+    await _load_choices(form)
+    return render(request, TaskUpdateView.template_name, {'form': form, 'object': task, 'task': task})
+
+
+_conditional_task_update = conditional_on_data(_task_update)
+
+
+async def task_delete(request, pk):
+    task = await aget_object_or_404(Task, pk=pk)
+    if request.method == 'POST':
+        await task.adelete()
+        return redirect('task_list')
+    return render(request, TaskDeleteView.template_name, {'object': task, 'task': task})
+
+
+async def toggle_task(request, pk):
+    if not await Task.objects.filter(pk=pk).atoggle():
+        raise Http404("No Task matches the given query.")
+    # atoggle()'s transaction has committed by now.
+    feed.task_toggled(pk, committed=True)
+    return redirect('task_list')
+
+
+async def task_feed(request):
+    """
+    Server-sent events for every task change, optionally for one `?task_list=`.
+
+    A reconnecting EventSource sends Last-Event-ID and resumes from there.
+    """
+    try:
+        last_id = request.headers.get('Last-Event-ID') or request.GET.get('since')
+        last_id = int(last_id) if last_id else None
+        task_list_id = int(request.GET['task_list']) if request.GET.get('task_list') else None
+    except ValueError:
+        return HttpResponse("Expected integer ids.", status=400)
+    response = StreamingHttpResponse(
+        feed.stream(last_id, task_list_id=task_list_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,65 @@
+from django.db import transaction
+
+from . import feed
+from .models import Task
+
+COMPLETE = 'complete'
+REOPEN = 'reopen'
+DELETE = 'delete'
+MOVE = 'move'
+REPRIORITIZE = 'reprioritize'
+
+ACTION_CHOICES = (
+    (COMPLETE, "Mark completed"),
+    (REOPEN, "Mark open"),
+    (DELETE, "Delete"),
+    (MOVE, "Move to list"),
+    (REPRIORITIZE, "Set priority"),
+)
+
+# Ids per statement; keeps each IN (...) well under SQLite's variable limit.
+BATCH_SIZE = 500
+
+
+def apply_action(action, queryset, task_list=None, priority=None):
+    """
+    Apply a bulk `action` to every task in `queryset` and return the row count.
+
+    Each action is one queryset UPDATE/DELETE, so the number of statements
+    does not depend on how many tasks match. `move` uses `task_list`
+    (None removes tasks from their list) and `reprioritize` uses `priority`.
+    Live-feed subscribers are told to reload rather than sent every task.
+    """
+    with feed.batched():
+        if action == COMPLETE:
+            count = queryset.complete()
+        elif action == REOPEN:
+            count = queryset.reopen()
+        elif action == DELETE:
+            count = queryset.delete()[0]
+        elif action == MOVE:
+            count = queryset.move_to(task_list)
+        elif action == REPRIORITIZE:
+            count = queryset.reprioritize(priority)
+        else:
+            raise ValueError(f"Unknown bulk action: {action!r}")
+        if count:
+            feed.tasks_reloaded()
+    return count
+
+
+def apply_action_to_ids(action, ids, queryset=None, **kwargs):
+    """
+    Apply `action` to the tasks with the given ids, `BATCH_SIZE` ids per statement.
+
+    When `queryset` is given, only ids that also match it are affected.
+    """
+    if queryset is None:
+        queryset = Task.objects.all()
+    ids = sorted(set(ids))
+    count = 0
+    with transaction.atomic():
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            count += apply_action(action, queryset.filter(pk__in=batch), **kwargs)
+    return count
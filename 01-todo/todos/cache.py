@@ -0,0 +1,145 @@
+"""
+Versioned cache for rendered task pages.
+
+Every key embeds the current data version. Writes to Task or TaskList bump
+the version instead of deleting entries, so stale pages become unreachable
+and simply age out. Works with any Django cache backend that implements
+``incr`` (locmem, file-based, memcached, redis).
+
+The ``a``-prefixed functions are the async counterparts used by
+`todos.async_views`, so a file or network cache does not block the event
+loop.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_ALIAS = 'default'
+VERSION_KEY = 'todos:version'
+MODIFIED_KEY = 'todos:modified'
+TIMEOUT = 300
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _seed():
+    # Seeded from the clock so a lost or evicted version key can never come
+    # back as a number that old entries were stored under.
+    _cache().add(VERSION_KEY, time.time_ns(), timeout=None)
+    return _cache().get(VERSION_KEY)
+
+
+def get_version():
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        version = _seed()
+    return version
+
+
+async def _aseed():
+    await _cache().aadd(VERSION_KEY, time.time_ns(), timeout=None)
+    return await _cache().aget(VERSION_KEY)
+
+
+async def aget_version():
+    version = await _cache().aget(VERSION_KEY)
+    if version is None:
+        version = await _aseed()
+    return version
+
+
+def bump_version():
+    _cache().set(MODIFIED_KEY, time.time(), timeout=None)
+    try:
+        return _cache().incr(VERSION_KEY)
+    except ValueError:
+        return _seed()
+
+
+def last_modified():
+    """When the version was last bumped (or first seen), as an aware datetime."""
+    modified = _cache().get(MODIFIED_KEY)
+    if modified is None:
+        _cache().add(MODIFIED_KEY, time.time(), timeout=None)
+        # DummyCache stores nothing: treat the data as modified just now.
+        modified = _cache().get(MODIFIED_KEY) or time.time()
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+async def alast_modified():
+    modified = await _cache().aget(MODIFIED_KEY)
+    if modified is None:
+        await _cache().aadd(MODIFIED_KEY, time.time(), timeout=None)
+        modified = await _cache().aget(MODIFIED_KEY) or time.time()
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def invalidate():
+    """
+    Make every cached page unreachable.
+
+    Bumps now, so this request never reads a stale entry, and again after
+    commit, so a page rendered from pre-commit data in between is dropped too.
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def make_key(*parts):
+    return ':'.join(['todos', str(get_version()), *(str(part) for part in parts)])
+
+
+async def amake_key(*parts):
+    return ':'.join(['todos', str(await aget_version()), *(str(part) for part in parts)])
+
+
+def _count(content):
+    with _stats_lock:
+        _stats['hits' if content is not None else 'misses'] += 1
+
+
+def lookup(key):
+    """Return the cached content for `key` (or None), counting the hit or miss."""
+    content = _cache().get(key)
+    _count(content)
+    return content
+
+
+async def alookup(key):
+    content = await _cache().aget(key)
+    _count(content)
+    return content
+
+
+def store(key, content):
+    _cache().set(key, content, TIMEOUT)
+
+
+async def astore(key, content):
+    await _cache().aset(key, content, TIMEOUT)
+
+
+def stats():
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+        'version': get_version(),
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,79 @@
+"""
+Overdue and due-soon tracking.
+
+`sweep()` runs periodically (``manage.py sweep_due_tasks``, e.g. from cron).
+Each run reads only the open tasks whose due date passed, or entered the
+due-soon window, since the previous run: the high-water marks stored in
+`HighWaterMark` bound an index range scan on todos_task_due_open_idx, so a
+run costs what changed, not the size of the table.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HighWaterMark, Task, TaskList
+from .signals import task_due_soon, task_overdue
+
+DUE_SOON_HOURS = 24
+# Largest due-soon window the task_due view accepts: one year.
+MAX_HOURS = 24 * 366
+CHUNK_SIZE = 1000
+
+OVERDUE = 'overdue'
+DUE_SOON = 'due_soon'
+
+
+def sweep(now=None, hours=DUE_SOON_HOURS, chunk_size=CHUNK_SIZE):
+    """
+    Process tasks that became overdue or due within `hours` since the last sweep.
+
+    Sends `task_overdue` / `task_due_soon` with each chunk of newly due tasks,
+    adds the newly overdue ones to their TaskList's `overdue_count` and
+    advances both marks, all in one transaction. Returns the number of
+    tasks walked per mark.
+    """
+    now = now or timezone.now()
+    horizon = now + timedelta(hours=hours)
+    with transaction.atomic():
+        marks = dict(
+            HighWaterMark.objects.select_for_update()
+            .filter(name__in=(OVERDUE, DUE_SOON)).values_list('name', 'value')
+        )
+        # First run: start where the TaskList counters were last brought up
+        # to date, and announce everything already inside the window.
+        overdue_since = marks.get(OVERDUE) or _counted_until(now)
+        due_soon_since = marks.get(DUE_SOON) or now
+
+        walked = {
+            OVERDUE: _walk(task_overdue, overdue_since, now, chunk_size),
+            DUE_SOON: _walk(task_due_soon, due_soon_since, horizon, chunk_size),
+        }
+        TaskList.objects.advance_overdue(since=overdue_since, now=now)
+        # A shorter window than last time must not move the mark backwards.
+        for name, value in ((OVERDUE, now), (DUE_SOON, max(horizon, due_soon_since))):
+            HighWaterMark.objects.update_or_create(name=name, defaults={'value': value})
+    return walked
+
+
+def _counted_until(now):
+    earliest = TaskList.objects.order_by('overdue_as_of').values_list('overdue_as_of', flat=True).first()
+    return min(earliest or now, now)
+
+
+def _walk(signal, since, until, chunk_size):
+    """Send `signal` for every open task due in (since, until], a chunk at a time."""
+    if until <= since:
+        return 0
+    walked = 0
+    chunk = []
+    for task in Task.objects.due_by(until).filter(due_date__gt=since).iterator(chunk_size=chunk_size):
+        chunk.append(task)
+        if len(chunk) == chunk_size:
+            signal.send(sender=Task, tasks=chunk)
+            walked += len(chunk)
+            chunk = []
+    if chunk:
+        signal.send(sender=Task, tasks=chunk)
+        walked += len(chunk)
+    return walked
@@ -0,0 +1,71 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Task
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+FIELDS = (
+    'id', 'task_list_id', 'task_list_name', 'title', 'description', 'due_date',
+    'completed', 'priority', 'created_at', 'updated_at', 'completed_at', 'order',
+)
+CHUNK_SIZE = 2000
+
+
+def export_rows(task_list=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield one dict per task, in primary key order.
+
+    Rows come from `values()` through `iterator()`, so no model instances are
+    built and only `chunk_size` rows are held in memory at a time.
+    """
+    queryset = Task.objects.order_by('pk')
+    if task_list is not None:
+        queryset = queryset.filter(task_list=task_list)
+    columns = [field for field in FIELDS if field != 'task_list_name']
+    queryset = queryset.values(*columns, task_list_name=F('task_list__name'))
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in FIELDS])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_lines(format, task_list=None, chunk_size=CHUNK_SIZE):
+    """Yield the export as text lines in `format` ('ndjson' or 'csv')."""
+    rows = export_rows(task_list=task_list, chunk_size=chunk_size)
+    if format == 'ndjson':
+        return ndjson_lines(rows)
+    if format == 'csv':
+        return csv_lines(rows)
+    raise ValueError(f"Unknown export format: {format!r}")
@@ -0,0 +1,212 @@
+"""
+Live change feed of tasks, streamed to browsers as server-sent events.
+
+`publish()` appends a small per-task event (created, the fields that
+changed, toggled, deleted) to an in-process ring buffer once the writing
+transaction commits. Subscribers (``async_views.task_feed``, one per open
+page) read the buffer from their last event id and then wait for the next
+event. All subscribers on an event loop wait on one shared future, so a
+publish costs one wake-up per event loop, not one per subscriber, and
+thousands of open pages cost no extra work for the writer.
+
+The feed is per process: run the ASGI server as a single process (it is
+async, so one process serves many connections), or changes made in another
+process will not reach its subscribers.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+# Events kept for subscribers catching up after a reconnect.
+BUFFER_SIZE = 1000
+# Seconds between keep-alive comments on an idle stream.
+KEEPALIVE = 15
+
+# Task fields sent to subscribers, by attribute name.
+FIELDS = ('title', 'description', 'due_date', 'completed', 'priority', 'task_list_id', 'order')
+
+CREATE = 'create'
+UPDATE = 'update'
+TOGGLE = 'toggle'
+DELETE = 'delete'
+# Many tasks changed at once (bulk actions): subscribers should re-fetch.
+RELOAD = 'reload'
+
+# Inside `batched()`: whether any event was held back.
+_batched = ContextVar('todo_feed_batched', default=None)
+
+
+class Broker:
+    """A ring buffer of events, with one shared wake-up per event loop for its subscribers."""
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=size)
+        self._last_id = 0
+        self._waiters = {}
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event):
+        """Append `event` (a dict) and wake every waiting subscriber. Returns its id."""
+        with self._lock:
+            self._last_id += 1
+            self._events.append((self._last_id, event))
+            waiters, self._waiters = self._waiters, {}
+        for loop, future in waiters.items():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, future)
+        return self._last_id
+
+    def since(self, last_id):
+        """
+        Events after `last_id`, as ``(id, event)`` pairs, or None if some of
+        them have already left the buffer.
+        """
+        with self._lock:
+            if self._events and self._events[0][0] > last_id + 1:
+                return None
+            if last_id > self._last_id:
+                # An id from before a server restart.
+                return None
+            return [(event_id, event) for event_id, event in self._events if event_id > last_id]
+
+    async def wait(self, last_id, timeout=None):
+        """
+        Wait until there is an event after `last_id`. Returns False if
+        `timeout` seconds passed first.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._last_id > last_id:
+                return True
+            future = self._waiters.get(loop)
+            if future is None:
+                future = self._waiters[loop] = loop.create_future()
+        # asyncio.wait() does not cancel the shared future when one
+        # subscriber goes away.
+        done, _ = await asyncio.wait({future}, timeout=timeout)
+        return bool(done)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+broker = Broker()
+
+
+def publish(event):
+    """Publish `event` once the current transaction commits (at once outside one)."""
+    held = _batched.get()
+    if held is not None:
+        held.append(event)
+        return
+    transaction.on_commit(lambda: broker.publish(event))
+
+
+@contextmanager
+def batched():
+    """
+    Replace every event published inside the block with a single reload,
+    published when it exits, for writes touching many tasks at once (bulk
+    deletes, archiving, a TaskList's CASCADE), which would otherwise send
+    an event per task and overflow the buffer. Nested blocks share the
+    outermost one's reload; nothing is published if the block raises.
+    """
+    if _batched.get() is not None:
+        yield
+        return
+    held = []
+    token = _batched.set(held)
+    try:
+        yield
+    finally:
+        _batched.reset(token)
+    if held:
+        tasks_reloaded()
+
+
+def task_state(task):
+    """The feed fields `task` currently has in memory (deferred ones are left out)."""
+    return {name: task.__dict__[name] for name in FIELDS if name in task.__dict__}
+
+
+def task_saved(task, created):
+    """Publish a create, or an update with only the fields that changed since load."""
+    state = task_state(task)
+    if created:
+        publish({'op': CREATE, 'id': task.pk, 'task_list_id': task.task_list_id, 'fields': state})
+    else:
+        loaded = getattr(task, '_feed_state', {})
+        changes = {name: value for name, value in state.items() if loaded.get(name, object()) != value}
+        if changes:
+            event = {'op': UPDATE, 'id': task.pk, 'task_list_id': task.task_list_id, 'fields': changes}
+            if 'task_list_id' in changes and 'task_list_id' in loaded:
+                # Subscribers of the old list need to drop the task.
+                event['previous_task_list_id'] = loaded['task_list_id']
+            publish(event)
+    task._feed_state = state
+
+
+def task_deleted(pk, task_list_id):
+    publish({'op': DELETE, 'id': pk, 'task_list_id': task_list_id})
+
+
+def task_toggled(pk, committed=False):
+    """Publish a toggle; `committed` skips waiting for a commit, e.g. after `atoggle()`."""
+    event = {'op': TOGGLE, 'id': pk}
+    if committed:
+        broker.publish(event)
+    else:
+        publish(event)
+
+
+def tasks_reloaded():
+    publish({'op': RELOAD})
+
+
+def format_event(event_id, event):
+    """One server-sent event, ready to write to the stream."""
+    data = json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event['op']}\ndata: {data}\n\n"
+
+
+async def stream(last_id=None, task_list_id=None, keepalive=KEEPALIVE):
+    """
+    Yield server-sent events from after `last_id` (from now if None), forever.
+
+    With `task_list_id`, only events of that TaskList's tasks are sent
+    (toggles and reloads carry no list and are always sent). If the
+    subscriber fell too far behind, a ``reset`` event tells it to reload.
+    """
+    if last_id is None:
+        last_id = broker.last_id
+    yield "retry: 3000\n: connected\n\n"
+    while True:
+        events = broker.since(last_id)
+        if events is None:
+            last_id = broker.last_id
+            yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+            continue
+        for event_id, event in events:
+            last_id = event_id
+            if task_list_id is None or _concerns(event, task_list_id):
+                yield format_event(event_id, event)
+        if not await broker.wait(last_id, timeout=keepalive):
+            yield ": keep-alive\n\n"
+
+
+def _concerns(event, task_list_id):
+    if 'task_list_id' not in event:
+        return True
+    return task_list_id in (event['task_list_id'], event.get('previous_task_list_id'))
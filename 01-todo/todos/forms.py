@@ -0,0 +1,126 @@
+from django import forms
+
+from . import archive, bulk, export, jobs
+from .models import Task, TaskList
+
+
+class IdListField(forms.Field):
+    """A list of primary keys, sent as repeated values and/or comma-separated."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        ids = []
+        for item in value:
+            for part in str(item).split(','):
+                part = part.strip()
+                if not part:
+                    continue
+                try:
+                    ids.append(int(part))
+                except ValueError:
+                    raise forms.ValidationError(f"'{part}' is not a valid task id.")
+        return ids
+
+
+class BulkTaskForm(forms.Form):
+    """
+    Selects tasks by `ids` or by filter fields and names the action to apply.
+
+    At least one selector is required so an empty POST can never touch
+    every task.
+    """
+    action = forms.ChoiceField(choices=bulk.ACTION_CHOICES)
+    ids = IdListField(required=False)
+    filter_task_list = forms.ModelChoiceField(TaskList.objects.all(), required=False)
+    filter_completed = forms.NullBooleanField(required=False)
+    filter_priority = forms.TypedChoiceField(
+        choices=Task.PRIORITY_CHOICES, coerce=int, required=False, empty_value=None
+    )
+    task_list = forms.ModelChoiceField(TaskList.objects.all(), required=False)
+    priority = forms.TypedChoiceField(
+        choices=Task.PRIORITY_CHOICES, coerce=int, required=False, empty_value=None
+    )
+    # Queue the action as a `todos.jobs` job instead of applying it now.
+    background = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (
+            cleaned_data.get('ids')
+            or cleaned_data.get('filter_task_list')
+            or cleaned_data.get('filter_completed') is not None
+            or cleaned_data.get('filter_priority') is not None
+        ):
+            raise forms.ValidationError("Select tasks by ids or by at least one filter.")
+        if cleaned_data.get('action') == bulk.REPRIORITIZE and cleaned_data.get('priority') is None:
+            self.add_error('priority', "A priority is required for this action.")
+        return cleaned_data
+
+    def filtered_queryset(self):
+        """Tasks matching the filter fields; `ids`, if any, narrow it further."""
+        queryset = Task.objects.all()
+        if self.cleaned_data.get('filter_task_list'):
+            queryset = queryset.filter(task_list=self.cleaned_data['filter_task_list'])
+        if self.cleaned_data.get('filter_completed') is not None:
+            queryset = queryset.filter(completed=self.cleaned_data['filter_completed'])
+        if self.cleaned_data.get('filter_priority') is not None:
+            queryset = queryset.filter(priority=self.cleaned_data['filter_priority'])
+        return queryset
+
+    def save(self):
+        """Apply the action and return the number of tasks affected."""
+        data = self.cleaned_data
+        kwargs = {'task_list': data.get('task_list'), 'priority': data.get('priority')}
+        if data['ids']:
+            return bulk.apply_action_to_ids(
+                data['action'], data['ids'], queryset=self.filtered_queryset(), **kwargs
+            )
+        return bulk.apply_action(data['action'], self.filtered_queryset(), **kwargs)
+
+
+class JobForm(forms.Form):
+    """Queues one of the background jobs that take no server-side input."""
+    kind = forms.ChoiceField(choices=(
+        (jobs.EXPORT, "Export tasks"),
+        (jobs.ARCHIVE, "Archive old completed tasks"),
+        (jobs.RECOUNT, "Recount task lists"),
+    ))
+    format = forms.ChoiceField(choices=[(format, format) for format in export.FORMATS], required=False)
+    task_list = forms.ModelChoiceField(TaskList.objects.all(), required=False)
+    older_than = forms.IntegerField(min_value=0, required=False)
+
+    def save(self):
+        """Queue the job and return it."""
+        data = self.cleaned_data
+        if data['kind'] == jobs.EXPORT:
+            params = {'format': data['format'] or 'ndjson'}
+            if data['task_list'] is not None:
+                params['task_list'] = data['task_list'].pk
+        elif data['kind'] == jobs.ARCHIVE:
+            params = {'older_than': archive.OLDER_THAN_DAYS if data['older_than'] is None else data['older_than']}
+        else:
+            params = {}
+        return jobs.enqueue(data['kind'], **params)
+
+
+class ReorderTaskForm(forms.Form):
+    """Names the task to place the moved task, `task`, directly before or after."""
+    before = forms.ModelChoiceField(Task.objects.all(), required=False)
+    after = forms.ModelChoiceField(Task.objects.all(), required=False)
+
+    def __init__(self, *args, task, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.task = task
+
+    def clean(self):
+        cleaned_data = super().clean()
+        before, after = cleaned_data.get('before'), cleaned_data.get('after')
+        if (before is None) == (after is None):
+            raise forms.ValidationError("Give exactly one of before and after.")
+        if (before or after).pk == self.task.pk:
+            raise forms.ValidationError("A task cannot be placed before or after itself.")
+        return cleaned_data
@@ -0,0 +1,295 @@
+"""
+Background jobs: heavy work queued in the `todos_job` table and run by
+``manage.py run_workers``, so the request that asks for it only inserts a row.
+
+A job kind is a function registered with `register()` and called as
+``func(job, **job.params)``. It reports progress through `Job.report()` as it
+finishes each chunk and returns a JSON-serializable result. A job that
+raises is retried, after a delay that doubles each time, until it has run
+`max_attempts` times. The built-in jobs work in chunks that commit on their
+own, so a retry picks up whatever is left.
+
+Workers claim a job with a conditional UPDATE (``... WHERE status =
+'queued'``): whoever changes the row owns the job. That needs no row locks
+or SKIP LOCKED, so it works on SQLite, and the database is the only broker.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from . import archive, bulk, export
+from .models import Job, Task, TaskList
+
+# Seconds between polls of an empty queue.
+POLL_SECONDS = 1.0
+# Delay (seconds) before the first retry; doubled for every later one.
+RETRY_DELAY = 30
+# A running job whose heartbeat is older than this is assumed to have lost
+# its worker, and is requeued. Workers beat every HEARTBEAT, and on every
+# progress report.
+STALE_AFTER = timedelta(minutes=10)
+HEARTBEAT = STALE_AFTER / 5
+# Queued jobs read per claim attempt, in case other workers take some first.
+CLAIM_CANDIDATES = 5
+# Rows per progress report for exports; TaskLists per recount transaction.
+EXPORT_CHUNK_SIZE = 2000
+RECOUNT_CHUNK_SIZE = 100
+
+EXPORT = 'export'
+ARCHIVE = 'archive'
+RECOUNT = 'recount'
+BULK = 'bulk'
+IMPORT = 'import'
+
+_kinds = {}
+
+
+def register(kind, max_attempts=3):
+    """Register the decorated function as the job kind `kind`."""
+    def decorator(func):
+        func.max_attempts = max_attempts
+        _kinds[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **params):
+    """Queue a `kind` job with `params` (JSON-serializable) and return it."""
+    if kind not in _kinds:
+        raise ValueError(f"Unknown job kind: {kind!r}")
+    return Job.objects.create(kind=kind, params=params, max_attempts=_kinds[kind].max_attempts)
+
+
+def claim(worker, now=None):
+    """Take the next runnable job for `worker`, or return None if there is none."""
+    now = now or timezone.now()
+    for job in Job.objects.runnable(now)[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run(job):
+    """Run a claimed job and record how it ended. Returns its new status."""
+    func = _kinds.get(job.kind)
+    if func is None:
+        return _finish(job, Job.FAILED, error=f"Unknown job kind: {job.kind!r}")
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        result = func(job, **job.params)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+            _update(job, status=Job.QUEUED, run_after=timezone.now() + delay, error=error)
+            return Job.QUEUED
+        return _finish(job, Job.FAILED, error=error)
+    finally:
+        heartbeat.stop()
+    return _finish(job, Job.SUCCEEDED, result=result, error='')
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps a running job's heartbeat fresh for jobs that report rarely (or never)."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(HEARTBEAT.total_seconds()):
+                Job.objects.filter(pk=self.job.pk, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _finish(job, status, **fields):
+    _update(job, status=status, finished_at=timezone.now(), **fields)
+    return status
+
+
+def _update(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    Job.objects.filter(pk=job.pk).update(**fields)
+
+
+def requeue_stale(now=None):
+    """
+    Requeue running jobs whose worker stopped reporting (it crashed or was
+    killed), or fail them if they are out of attempts. Returns how many.
+    """
+    now = now or timezone.now()
+    stale = Job.objects.stale(now - STALE_AFTER)
+    error = "The worker stopped responding."
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(status=Job.FAILED, finished_at=now, error=error)
+    return failed + stale.update(status=Job.QUEUED, run_after=now, error=error)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(worker=None, stop=None, once=False, poll=POLL_SECONDS):
+    """
+    Claim and run jobs until `stop` (a threading or multiprocessing Event)
+    is set, or, with `once`, until the queue is empty. Returns the number of
+    jobs run.
+    """
+    worker = worker or worker_name()
+    ran = 0
+    while not (stop and stop.is_set()):
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            requeue_stale()
+            if stop:
+                stop.wait(poll)
+            else:
+                time.sleep(poll)
+            continue
+        run(job)
+        ran += 1
+    return ran
+
+
+def describe(job):
+    """The status of `job` as a JSON-serializable dict."""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'done': job.done,
+        'total': job.total,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def export_path(job):
+    return Path(settings.JOBS_EXPORT_DIR) / f"tasks-{job.pk}.{job.params.get('format', 'ndjson')}"
+
+
+@register(EXPORT)
+def export_tasks(job, format='ndjson', task_list=None):
+    """Write the `todos.export` file for all tasks (or one TaskList's) to JOBS_EXPORT_DIR."""
+    task_list = TaskList.objects.get(pk=task_list) if task_list is not None else None
+    tasks = Task.objects.filter(task_list=task_list) if task_list is not None else Task.objects.all()
+    job.report(0, tasks.count())
+    path = export_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.part')
+    rows = 0
+    with open(partial, 'w', encoding='utf-8', newline='') as output:
+        for line in export.export_lines(format, task_list=task_list):
+            output.write(line)
+            rows += 1
+            if rows % EXPORT_CHUNK_SIZE == 0:
+                job.report(rows)
+    if format == 'csv':
+        rows -= 1  # the header line
+    os.replace(partial, path)
+    job.report(rows)
+    return {'file': path.name, 'rows': rows}
+
+
+@register(ARCHIVE)
+def archive_tasks(job, older_than=archive.OLDER_THAN_DAYS):
+    before = archive.cutoff(older_than)
+    job.report(0, Task.objects.archivable(before).count())
+    return {'archived': archive.archive_tasks(before, progress=job.report)}
+
+
+@register(RECOUNT)
+def recount(job):
+    """Recompute every TaskList's counters, RECOUNT_CHUNK_SIZE lists per transaction."""
+    pks = list(TaskList.objects.order_by('pk').values_list('pk', flat=True))
+    job.report(0, len(pks))
+    for start in range(0, len(pks), RECOUNT_CHUNK_SIZE):
+        TaskList.objects.filter(pk__in=pks[start:start + RECOUNT_CHUNK_SIZE]).recount()
+        job.report(min(start + RECOUNT_CHUNK_SIZE, len(pks)))
+    return {'task_lists': len(pks)}
+
+
+@register(BULK)
+def bulk_action(job, data):
+    """
+    A `todos.bulk` action on the tasks a `BulkTaskForm` selects (`data` maps
+    its field names to their POSTed value lists), `bulk.BATCH_SIZE` tasks
+    per transaction.
+    """
+    from .forms import BulkTaskForm
+
+    form = BulkTaskForm(MultiValueDict(data))
+    if not form.is_valid():
+        raise ValueError(form.errors.as_json())
+    action = form.cleaned_data['action']
+    kwargs = {'task_list': form.cleaned_data.get('task_list'), 'priority': form.cleaned_data.get('priority')}
+    tasks = form.filtered_queryset()
+    ids = sorted(set(form.cleaned_data['ids']))
+    if ids:
+        batches = (ids[start:start + bulk.BATCH_SIZE] for start in range(0, len(ids), bulk.BATCH_SIZE))
+        job.report(0, len(ids))
+    else:
+        batches = _pk_batches(tasks, bulk.BATCH_SIZE)
+        job.report(0, tasks.count())
+    count = done = 0
+    for batch in batches:
+        with transaction.atomic():
+            count += bulk.apply_action(action, tasks.filter(pk__in=batch), **kwargs)
+        done += len(batch)
+        job.report(done)
+    return {'action': action, 'count': count}
+
+
+def _pk_batches(queryset, size):
+    """
+    Primary keys of `queryset` in batches, read one batch at a time by key
+    order, so a batch whose tasks stop matching (e.g. completing open tasks)
+    does not shift the next one.
+    """
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+@register(IMPORT, max_attempts=1)
+def import_tasks(job, path, format=None):
+    """``manage.py import_tasks`` on a file on the server. Not retried: it would import twice."""
+    args = [path] if format is None else [path, '--format', format]
+    output, errors = StringIO(), StringIO()
+    call_command('import_tasks', *args, stdout=output, stderr=errors)
+    return {'output': output.getvalue().strip(), 'skipped': errors.getvalue().splitlines()[:100]}
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todos import archive
+from todos.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Move tasks completed more than --older-than days ago into the archive "
+        "table, a chunk per transaction. Run it periodically, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=archive.OLDER_THAN_DAYS, metavar='DAYS',
+            help="Archive tasks completed more than DAYS days ago (default: %(default)s).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=archive.CHUNK_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Count the tasks to archive without moving them.",
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError("--older-than must not be negative.")
+        before = archive.cutoff(options['older_than'])
+        if options['dry_run']:
+            count = Task.objects.archivable(before).count()
+            self.stdout.write(f"{count} task(s) completed before {before:%Y-%m-%d %H:%M} would be archived.")
+            return
+        count = archive.archive_tasks(before, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {count} task(s) completed before {before:%Y-%m-%d %H:%M}."
+        ))
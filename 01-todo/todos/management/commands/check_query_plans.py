@@ -0,0 +1,182 @@
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import URLPattern, resolve, reverse
+from django.utils import timezone
+
+from todos import cache, urls as todo_urls
+from todos.models import Job, Task, TaskArchive, TaskList, Tombstone
+from todos.pagination import KeysetPaginator, encode_cursor
+from todos.views import TaskListFragmentView, TaskListView
+
+
+# Plan steps a view is allowed to use by design. Export reads every row, so
+# a table scan is fine there; search orders its matches by relevance, which
+# no index can provide, so it sorts the (already filtered) match set. The
+# job list walks the rowid backwards and stops at its LIMIT, which SQLite
+# reports as a plain SCAN.
+ALLOWED = {
+    'task_export': {'scan'},
+    'task_search': {'sort'},
+    'job_list': {'scan'},
+}
+
+
+def plan_problems(plan, allow=()):
+    """
+    Return the plan lines that indicate a full table scan or an explicit sort.
+
+    ``SCAN <table> USING [COVERING] INDEX`` is accepted: it is an ordered walk
+    of an index that stops at the query's LIMIT, not a read of every row.
+    So is ``SCAN <fts table> VIRTUAL TABLE INDEX n:<constraint>``, a lookup
+    in a full-text index rather than a read of the whole table, and a scan of
+    a subquery's result, whose own plan lines are checked separately.
+    """
+    subqueries = {
+        detail.split()[-1] for detail in plan
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    problems = []
+    for detail in plan:
+        if 'USE TEMP B-TREE' in detail:
+            if 'sort' not in allow:
+                problems.append(detail)
+        elif detail.startswith('SCAN ') and not _uses_index(detail, subqueries):
+            if 'scan' not in allow:
+                problems.append(detail)
+    return problems
+
+
+def _uses_index(detail, subqueries):
+    if detail.split()[1] in subqueries:
+        return True
+    if ' VIRTUAL TABLE INDEX ' in detail:
+        return bool(detail.partition(':')[2])
+    return ' USING ' in detail
+
+
+def sample_task():
+    """A task that belongs to a TaskList, created if there is none."""
+    task = Task.objects.filter(task_list__isnull=False).order_by('pk').first()
+    if task is None:
+        task_list = TaskList.objects.create(name="Query plan check")
+        task = Task.objects.create(title="Query plan check", task_list=task_list)
+    return task
+
+
+def view_requests(task):
+    """
+    Yield ``(label, path)`` for every todos URL, plus query-string variants.
+    Job URLs use the latest job, and are skipped if there is none.
+    """
+    job = Job.objects.order_by('-pk').first()
+    for pattern in todo_urls.urlpatterns:
+        if not isinstance(pattern, URLPattern):
+            continue
+        if pattern.name.startswith('job_'):
+            ids = {'pk': job and job.pk}
+        else:
+            ids = {'pk': task.pk, 'list_pk': task.task_list_id}
+        kwargs = {name: ids[name] for name in pattern.pattern.converters}
+        if None in kwargs.values():
+            continue
+        yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+    list_path = reverse('task_list')
+    paginator = KeysetPaginator(TaskListView().get_queryset(), TaskListView.paginate_by)
+    yield 'task_list (next)', f"{list_path}?cursor={paginator.encode(task)}"
+    yield 'task_list (previous)', f"{list_path}?cursor={paginator.encode(task, backward=True)}"
+    fragment_path = reverse('task_list_fragment', kwargs={'list_pk': task.task_list_id})
+    paginator = KeysetPaginator(
+        Task.objects.order_by(*TaskListFragmentView.ordering), TaskListFragmentView.paginate_by
+    )
+    yield 'task_list_fragment (next)', f"{fragment_path}?cursor={paginator.encode(task)}"
+    yield 'task_list_fragment (previous)', f"{fragment_path}?cursor={paginator.encode(task, backward=True)}"
+    yield 'task_export (task list)', f"{reverse('task_export')}?task_list={task.task_list_id}"
+    due_paginator = KeysetPaginator(Task.objects.order_by('due_date', 'id'), TaskListView.paginate_by)
+    yield 'task_due (next)', f"{reverse('task_due')}?cursor={due_paginator.encode(task)}"
+    yield 'task_due (previous)', f"{reverse('task_due')}?cursor={due_paginator.encode(task, backward=True)}"
+    search_path = f"{reverse('task_search')}?{urlencode({'q': task.title})}"
+    yield 'task_search (query)', search_path
+    yield 'task_search (next)', f"{search_path}&cursor={encode_cursor([0.0, task.pk])}"
+    archive_path = f"{reverse('task_archive')}?task_list={task.task_list_id}"
+    archive_paginator = KeysetPaginator(TaskArchive.objects.order_by('-completed_at', '-id'), TaskListView.paginate_by)
+    archived = TaskArchive(id=task.pk, completed_at=timezone.now())
+    yield 'task_archive (task list)', archive_path
+    yield 'task_archive (next)', f"{reverse('task_archive')}?cursor={archive_paginator.encode(archived)}"
+    yield 'task_archive (task list, next)', f"{archive_path}&cursor={archive_paginator.encode(archived)}"
+    changes_cursor = encode_cursor([
+        KeysetPaginator(TaskList.objects.order_by('updated_at', 'id'), 1).encode(
+            TaskList(id=task.task_list_id, updated_at=task.updated_at)
+        ),
+        KeysetPaginator(Task.objects.order_by('updated_at', 'id'), 1).encode(task),
+        KeysetPaginator(Tombstone.objects.order_by('deleted_at', 'id'), 1).encode(
+            Tombstone(id=0, deleted_at=timezone.now())
+        ),
+    ])
+    yield 'task_changes (next)', f"{reverse('task_changes')}?cursor={changes_cursor}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every todos view, EXPLAIN QUERY PLAN each statement it issues and "
+        "fail if any plan needs a temp B-tree sort or a full table scan."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN checks require the SQLite backend.")
+
+        failures = []
+        # Cached pages would skip the queries under test.
+        cache.bump_version()
+        # Views are executed for real (toggle included), so roll everything back.
+        with transaction.atomic():
+            task = sample_task()
+            for label, path in view_requests(task):
+                statements = self._capture(path)
+                for sql, params in statements:
+                    plan = self._explain(sql, params)
+                    problems = plan_problems(plan, allow=ALLOWED.get(label.split()[0], ()))
+                    status = 'FAIL' if problems else 'ok'
+                    self.stdout.write(f"[{status}] {label}: {sql}")
+                    for detail in plan:
+                        self.stdout.write(f"    {detail}")
+                    if problems:
+                        failures.append((label, sql, problems))
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} statement(s) need a sort or full scan: "
+                + "; ".join(f"{label}: {', '.join(problems)}" for label, _, problems in failures)
+            )
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes."))
+
+    def _capture(self, path):
+        statements = []
+
+        def collect(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        request = RequestFactory().get(path)
+        match = resolve(request.path_info)
+        with connection.execute_wrapper(collect):
+            response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        return [
+            (sql, params) for sql, params in statements
+            if sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))
+        ]
+
+    def _explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
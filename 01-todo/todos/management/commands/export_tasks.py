@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todos import export
+from todos.models import TaskList
+
+
+class Command(BaseCommand):
+    help = "Stream all tasks, or one TaskList's tasks, as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--task-list', type=int, help="Only export tasks in this TaskList id.")
+        parser.add_argument('--output', '-o', help="File to write to (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        task_list = None
+        if options['task_list'] is not None:
+            try:
+                task_list = TaskList.objects.get(pk=options['task_list'])
+            except TaskList.DoesNotExist:
+                raise CommandError(f"TaskList {options['task_list']} does not exist.")
+
+        lines = export.export_lines(
+            options['format'], task_list=task_list, chunk_size=options['chunk_size']
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        written = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # header row
+        self.stderr.write(f"Exported {written} task(s) to {options['output']}.")
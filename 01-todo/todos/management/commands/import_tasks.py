@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from todos import jobs
+from todos.models import Task, TaskList
+
+PRIORITY_BY_LABEL = {label.lower(): value for value, label in Task.PRIORITY_CHOICES}
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+
+def read_records(stream, format):
+    """
+    Yield one record per input row without reading the whole stream.
+
+    CSV rows are yielded as dicts; NDJSON lines are yielded unparsed so a
+    malformed line is reported and skipped instead of aborting the import.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def parse_priority(value):
+    if value in (None, ''):
+        return Task.PRIORITY_MEDIUM
+    if isinstance(value, str) and value.strip().lower() in PRIORITY_BY_LABEL:
+        return PRIORITY_BY_LABEL[value.strip().lower()]
+    priority = int(value)
+    if priority not in dict(Task.PRIORITY_CHOICES):
+        raise ValueError(f"unknown priority {value!r}")
+    return priority
+
+
+def parse_when(value):
+    if value in (None, ''):
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid datetime {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load tasks from NDJSON or CSV (the export_tasks format). TaskLists "
+        "are matched by name and created when missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help="Input format (default: guessed from the file extension, else ndjson).",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Rows inserted per transaction (default: 5000).")
+        parser.add_argument('--background', action='store_true',
+                            help="Queue the import for `run_workers` and return at once.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['background']:
+            if path == '-':
+                raise CommandError("--background needs a file, not stdin.")
+            job = jobs.enqueue(jobs.IMPORT, path=os.path.abspath(path), format=format)
+            self.stdout.write(f"Queued import job {job.pk}.")
+            return
+
+        # name -> id for every existing list; the first list wins on duplicate names.
+        self.list_ids = {}
+        for name, pk in TaskList.objects.order_by('-pk').values_list('name', 'pk').iterator():
+            self.list_ids[name] = pk
+
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            self._import(stream, format, batch_size)
+        else:
+            try:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    self._import(stream, format, batch_size)
+            except FileNotFoundError:
+                raise CommandError(f"{path} does not exist.")
+
+    def _import(self, stream, format, batch_size):
+        started = time.perf_counter()
+        imported = skipped = 0
+        rows = enumerate(read_records(stream, format), start=1)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            now = timezone.now()
+            tasks = []
+            for line, row in batch:
+                try:
+                    tasks.append(self._build(row, now))
+                except (ValueError, TypeError, AttributeError) as exc:
+                    skipped += 1
+                    self.stderr.write(f"Skipping record {line}: {exc}")
+            self._insert(tasks)
+            imported += len(tasks)
+            if self.verbosity >= 2:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{imported} tasks ({imported / elapsed:.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} task(s) in {elapsed:.2f}s ({rate:.0f} rows/s); skipped {skipped}."
+        ))
+
+    def _build(self, row, now):
+        """Return ``(task, task_list_name)`` for one input record."""
+        if isinstance(row, str):
+            row = json.loads(row)
+        title = (row.get('title') or '').strip()
+        if not title:
+            raise ValueError("missing title")
+        completed = parse_bool(row.get('completed'))
+        completed_at = None
+        if completed:
+            # Same rule as Task.save(): keep a given timestamp, otherwise stamp now.
+            completed_at = parse_when(row.get('completed_at')) or now
+        task = Task(
+            title=title[:200],
+            description=row.get('description') or '',
+            due_date=parse_when(row.get('due_date')),
+            completed=completed,
+            completed_at=completed_at,
+            priority=parse_priority(row.get('priority')),
+            order=int(row.get('order') or 0),
+        )
+        list_name = (row.get('task_list_name') or row.get('task_list') or '').strip() or None
+        return task, list_name
+
+    def _insert(self, tasks):
+        with transaction.atomic():
+            missing = {name for _, name in tasks if name and name not in self.list_ids}
+            if missing:
+                created = TaskList.objects.bulk_create(TaskList(name=name) for name in sorted(missing))
+                self.list_ids.update((task_list.name, task_list.pk) for task_list in created)
+            for task, name in tasks:
+                task.task_list_id = self.list_ids.get(name)
+            Task.objects.bulk_create(task for task, _ in tasks)
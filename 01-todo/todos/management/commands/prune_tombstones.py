@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from todos import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete delta-sync tombstones older than --older-than days. Keep the "
+        "default unless sync.TOMBSTONE_DAYS changes with it: cursors are only "
+        "rejected as expired after that many days. Run it periodically, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=sync.TOMBSTONE_DAYS, metavar='DAYS',
+            help="Delete tombstones older than DAYS days (default: %(default)s).",
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError("--older-than must not be negative.")
+        count = sync.prune_tombstones(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} tombstone(s)."))
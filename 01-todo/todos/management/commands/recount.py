@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from todos.models import TaskList
+
+COUNTERS = ('open_count', 'completed_count', 'overdue_count')
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the open/completed/overdue counters of every TaskList from "
+        "its tasks, reporting and repairing any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--task-list', type=int, action='append', dest='task_lists',
+            help="Only recount this TaskList id (may be repeated).",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help="Report drift without writing.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        task_lists = TaskList.objects.all()
+        if options['task_lists']:
+            task_lists = task_lists.filter(pk__in=options['task_lists'])
+
+        with transaction.atomic():
+            drifted = behind = 0
+            # overdue_count is only exact as of the list's overdue_as_of; tasks
+            # that fell due since then are not drift, and are reported apart.
+            expected = task_lists.annotate(
+                actual_open=Count('tasks', filter=Q(tasks__completed=False)),
+                actual_completed=Count('tasks', filter=Q(tasks__completed=True)),
+                actual_overdue=Count('tasks', filter=Q(
+                    tasks__completed=False, tasks__due_date__lte=F('overdue_as_of'),
+                )),
+                newly_due=Count('tasks', filter=Q(
+                    tasks__completed=False, tasks__due_date__gt=F('overdue_as_of'), tasks__due_date__lte=now,
+                )),
+            )
+            for task_list in expected.iterator():
+                if task_list.newly_due:
+                    behind += 1
+                    if options['verbosity'] >= 1:
+                        self.stdout.write(
+                            f"{task_list.name} (#{task_list.pk}): {task_list.newly_due} task(s) due since "
+                            f"{task_list.overdue_as_of:%Y-%m-%d %H:%M:%S}, overdue_count "
+                            f"{task_list.overdue_count} -> {task_list.overdue_count + task_list.newly_due}"
+                        )
+                changes = [
+                    f"{counter} {getattr(task_list, counter)} -> {actual}"
+                    for counter, actual in zip(COUNTERS, (
+                        task_list.actual_open, task_list.actual_completed, task_list.actual_overdue,
+                    ))
+                    if getattr(task_list, counter) != actual
+                ]
+                if changes:
+                    drifted += 1
+                    if options['verbosity'] >= 1:
+                        self.stdout.write(f"{task_list.name} (#{task_list.pk}): {', '.join(changes)}")
+
+            if options['dry_run']:
+                self.stdout.write(
+                    f"{drifted} task list(s) out of date, {behind} with tasks due since their last "
+                    f"sweep; nothing written (--dry-run)."
+                )
+                return
+            total = task_lists.recount(now=now)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted {total} task list(s); {drifted} had drifted, {behind} brought up to date."
+        ))
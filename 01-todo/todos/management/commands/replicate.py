@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into every alias in DATABASE_REPLICAS "
+        "with SQLite's online backup API: a stand-in for replication when trying "
+        "the read-replica router locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float, metavar='SECONDS',
+            help="Keep copying, every SECONDS seconds, until interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set TODO_REPLICA_DB or DATABASE_REPLICAS.")
+        aliases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError("replicate only copies between SQLite databases.")
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                copy(DEFAULT_DB_ALIAS, alias)
+            self.stdout.write(f"Copied the primary to {', '.join(settings.DATABASE_REPLICAS)}.")
+            if not options['every']:
+                return
+            time.sleep(options['every'])
+
+
+def copy(source, target):
+    """Copy SQLite database `source` over `target` (both aliases), consistently."""
+    source, target = connections[source], connections[target]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
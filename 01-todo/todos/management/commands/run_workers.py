@@ -0,0 +1,77 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from todos import jobs
+
+
+def _worker(stop, poll):
+    # Ctrl-C reaches the whole process group; the parent sets `stop` instead,
+    # so a job in progress is finished rather than interrupted.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        jobs.work(stop=stop, poll=poll)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (todos.jobs) in a pool of worker processes "
+        "until interrupted. Ctrl-C or SIGTERM lets running jobs finish first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help="Worker processes (default: %(default)s); 0 runs jobs in this process.",
+        )
+        parser.add_argument(
+            '--poll', type=float, default=jobs.POLL_SECONDS, metavar='SECONDS',
+            help="How often an idle worker checks the queue (default: %(default)s).",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Run the jobs that are due now in this process, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0:
+            raise CommandError("--processes must not be negative.")
+        if options['once']:
+            count = jobs.work(once=True)
+            self.stdout.write(f"Ran {count} job(s).")
+            return
+        if options['processes'] == 0:
+            try:
+                jobs.work(poll=options['poll'])
+            except KeyboardInterrupt:
+                pass
+            return
+        self._supervise(options['processes'], options['poll'])
+
+    def _supervise(self, processes, poll):
+        """Keep `processes` workers running, replacing any that die, until told to stop."""
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        # Forked children must not share the parent's database connections.
+        connections.close_all()
+        workers = []
+        self.stdout.write(f"Starting {processes} worker(s); Ctrl-C to stop.")
+        try:
+            while not stop.is_set():
+                workers = [worker for worker in workers if worker.is_alive()]
+                for _ in range(processes - len(workers)):
+                    worker = context.Process(target=_worker, args=(stop, poll), daemon=True)
+                    worker.start()
+                    workers.append(worker)
+                stop.wait(poll)
+        except KeyboardInterrupt:
+            stop.set()
+        self.stdout.write("Stopping: waiting for running jobs to finish.")
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,119 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from todos.models import Task, TaskList
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+VERBS = (
+    "Buy", "Call", "Email", "Review", "Fix", "Write", "Plan", "Book", "Renew",
+    "Clean", "Pay", "Prepare", "Schedule", "Update", "Return", "Order", "Check",
+)
+OBJECTS = (
+    "milk", "invoice", "plumber", "dentist", "quarterly report", "release notes",
+    "budget", "flight", "hotel", "passport", "insurance", "tax return", "garage",
+    "laptop backup", "team meeting", "fence", "birthday gift", "car service",
+    "library books", "design review", "client proposal", "expenses", "newsletter",
+)
+DETAILS = (
+    "before the deadline", "for next week", "with the team", "again",
+    "if there is time", "first thing tomorrow", "after lunch", "by Friday",
+)
+LIST_NAMES = (
+    "Work", "Home", "Errands", "Groceries", "Finance", "Health", "Travel",
+    "Garden", "Reading", "Projects", "Family", "Car", "Admin", "Ideas",
+)
+
+
+def parse_size(value):
+    """`10k`, `100k`, `1M` or a plain number of tasks."""
+    size = SIZES.get(value.lower())
+    if size is None:
+        try:
+            size = int(value.replace('_', ''))
+        except ValueError:
+            raise CommandError(f"Unknown size {value!r}: use {', '.join(SIZES)} or a number.")
+    return size
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate realistic tasks across many TaskLists for benchmarks: mixed "
+        "priorities, past and future due dates and a share of completed tasks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('size', help="Number of tasks: 10k, 100k, 1M or a number.")
+        parser.add_argument('--lists', type=int, default=200,
+                            help="TaskLists to spread the tasks over (default: %(default)s).")
+        parser.add_argument('--completed', type=float, default=0.6,
+                            help="Share of completed tasks (default: %(default)s).")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed (default: %(default)s).")
+        parser.add_argument('--batch-size', type=int, default=10_000,
+                            help="Tasks inserted per transaction (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        size = parse_size(options['size'])
+        if options['lists'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--lists and --batch-size must be at least 1.")
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        started = time.perf_counter()
+
+        task_lists = TaskList.objects.bulk_create(
+            TaskList(name=f"{LIST_NAMES[i % len(LIST_NAMES)]} {i // len(LIST_NAMES) + 1}")
+            for i in range(options['lists'])
+        )
+        # A few big lists and a long tail of small ones.
+        weights = [1 / rank for rank in range(1, len(task_lists) + 1)]
+        for start in range(0, size, options['batch_size']):
+            count = min(options['batch_size'], size - start)
+            lists = rng.choices(task_lists, weights=weights, k=count)
+            with transaction.atomic():
+                tasks = [self._task(rng, now, task_list, options['completed']) for task_list in lists]
+                # auto_now_add overwrites created_at on insert, so the
+                # generated ages are written back afterwards.
+                ages = [task.created_at for task in tasks]
+                tasks = Task.objects.bulk_create(tasks)
+                self._set_created_at(tasks, ages)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{start + count} tasks")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {size} task(s) in {len(task_lists)} list(s) in {elapsed:.1f}s."
+        ))
+
+    @staticmethod
+    def _set_created_at(tasks, ages):
+        """One prepared UPDATE run for every task; bulk_update() would build a CASE per row."""
+        field = Task._meta.get_field('created_at')
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {connection.ops.quote_name(Task._meta.db_table)} "
+                f"SET {connection.ops.quote_name(field.column)} = %s WHERE id = %s",
+                [(field.get_db_prep_value(age, connection), task.pk) for task, age in zip(tasks, ages)],
+            )
+
+    @staticmethod
+    def _task(rng, now, task_list, completed_share):
+        created_at = now - timedelta(days=rng.uniform(0, 365))
+        due_date = None
+        if rng.random() < 0.7:
+            due_date = created_at + timedelta(days=rng.uniform(-10, 60))
+        completed = rng.random() < completed_share
+        return Task(
+            task_list=task_list,
+            created_at=created_at,
+            title=f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}",
+            description=f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(DETAILS)}." if rng.random() < 0.5 else '',
+            due_date=due_date,
+            completed=completed,
+            completed_at=min(created_at + timedelta(days=rng.uniform(0, 30)), now) if completed else None,
+            priority=rng.choices((Task.PRIORITY_HIGH, Task.PRIORITY_MEDIUM, Task.PRIORITY_LOW), (1, 3, 2))[0],
+        )
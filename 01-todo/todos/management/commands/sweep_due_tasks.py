@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from todos import due
+
+
+class Command(BaseCommand):
+    help = (
+        "Process open tasks that became overdue or due soon since the last run: "
+        "update the TaskList overdue counters and send the due signals. Run it "
+        "periodically, e.g. every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=due.DUE_SOON_HOURS,
+            help="Size of the due-soon window (default: %(default)s).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=due.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        walked = due.sweep(hours=options['hours'], chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f"{walked[due.OVERDUE]} task(s) became overdue, "
+            f"{walked[due.DUE_SOON]} became due within {options['hours']} hour(s)."
+        )
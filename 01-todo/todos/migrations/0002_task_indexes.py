@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed', '-priority', 'due_date', 'id'], name='todos_task_listview_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-priority', 'due_date', 'order'], name='todos_task_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('task_list__isnull', False)), fields=['task_list', '-priority', 'due_date', 'order'], name='todos_task_tasklist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasklist',
+            index=models.Index(fields=['name'], name='todos_tasklist_name_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# External-content FTS5 index over Task.title/description. Triggers keep it in
+# sync with todos_task for every write path, including queryset update(),
+# bulk_create() and raw SQL, which model signals would miss. prefix='2 3'
+# adds prefix indexes so search-as-you-type queries ("ta*") stay cheap.
+#
+# SQLite drops a table's triggers when Django rebuilds it (most AlterField /
+# RemoveField operations on todos_task): a migration that rebuilds the table
+# must run CREATE_SQL's triggers and the 'rebuild' again.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE todos_task_fts USING fts5(
+        title, description,
+        content='todos_task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER todos_task_fts_insert AFTER INSERT ON todos_task BEGIN
+        INSERT INTO todos_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_task_fts_delete AFTER DELETE ON todos_task BEGIN
+        INSERT INTO todos_task_fts(todos_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_task_fts_update AFTER UPDATE OF title, description ON todos_task BEGIN
+        INSERT INTO todos_task_fts(todos_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Index the rows that already exist.
+    "INSERT INTO todos_task_fts(todos_task_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS todos_task_fts_update",
+    "DROP TRIGGER IF EXISTS todos_task_fts_delete",
+    "DROP TRIGGER IF EXISTS todos_task_fts_insert",
+    "DROP TABLE IF EXISTS todos_task_fts",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0002_task_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:01
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_tasks(apps, schema_editor):
+    Task = apps.get_model('todos', 'Task')
+    TaskList = apps.get_model('todos', 'TaskList')
+    now = django.utils.timezone.now()
+
+    def count(**filters):
+        tasks = Task.objects.filter(task_list=OuterRef('pk'), **filters).order_by()
+        return Coalesce(Subquery(tasks.annotate(n=Func('pk', function='COUNT')).values('n')), 0)
+
+    TaskList.objects.update(
+        open_count=count(completed=False),
+        completed_count=count(completed=True),
+        overdue_count=count(completed=False, due_date__lte=now),
+        overdue_as_of=now,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0003_task_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasklist',
+            name='completed_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tasklist',
+            name='open_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tasklist',
+            name='overdue_as_of',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tasklist',
+            name='overdue_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_tasks, migrations.RunPython.noop),
+    ]
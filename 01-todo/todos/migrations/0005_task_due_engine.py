@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0004_tasklist_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HighWaterMark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['due_date'], name='todos_task_due_open_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0006_task_manual_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('priority', models.PositiveSmallIntegerField(choices=[(1, 'High'), (2, 'Medium'), (3, 'Low')], default=2)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField()),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-completed_at', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['completed_at'], name='todos_task_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskarchive',
+            name='task_list',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to='todos.tasklist'),
+        ),
+        migrations.AddIndex(
+            model_name='taskarchive',
+            index=models.Index(fields=['-completed_at', '-id'], name='todos_archive_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskarchive',
+            index=models.Index(fields=['task_list', '-completed_at', '-id'], name='todos_archive_list_idx'),
+        ),
+    ]
@@ -1,18 +1,301 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Func, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from . import cache, feed
+
+
+def _count(tasks, **filters):
+	"""A scalar subquery counting `tasks` that also match `filters`."""
+	tasks = tasks.filter(**filters).order_by().annotate(n=Func("pk", function="COUNT")).values("n")
+	return Coalesce(Subquery(tasks), 0)
+
+
+class TaskListQuerySet(models.QuerySet):
+	def recount(self, now=None):
+		"""
+		Recompute every counter from the tasks table, repairing any drift.
+
+		Tasks due at or before `now` (default: the current time) and still open
+		are counted as overdue, and `overdue_as_of` moves to `now`.
+		"""
+		now = now or timezone.now()
+		tasks = Task.objects.filter(task_list=OuterRef("pk"))
+		rows = self.update(
+			open_count=_count(tasks, completed=False),
+			completed_count=_count(tasks, completed=True),
+			overdue_count=_count(tasks, completed=False, due_date__lte=now),
+			overdue_as_of=now,
+		)
+		if rows:
+			cache.invalidate()
+		return rows
+
+	def advance_overdue(self, since, now):
+		"""
+		Bring `overdue_count` forward to `now` by adding each list's open tasks
+		due after its `overdue_as_of`, and move `overdue_as_of` to `now`.
+
+		Only tasks due after `since` are read, so the cost follows how many
+		tasks became due rather than the size of the table; no list's
+		`overdue_as_of` may be earlier than `since`.
+		"""
+		# One grouped read of the newly due index range, then one UPDATE. A
+		# correlated subquery per list would be planned on the task_list
+		# index and read every task of each list instead.
+		newly_due = (
+			Task.objects.due_by(now)
+			.filter(due_date__gt=since)
+			.filter(due_date__gt=F("task_list__overdue_as_of"))
+			.order_by().values("task_list").annotate(n=Count("pk"))
+		)
+		added = {row["task_list"]: row["n"] for row in newly_due}
+		if added:
+			self.filter(pk__in=added).update(overdue_count=Case(
+				*(When(pk=pk, then=F("overdue_count") + n) for pk, n in added.items()),
+				default=F("overdue_count"),
+			))
+		rows = self.filter(overdue_as_of__lt=now).update(overdue_as_of=now)
+		if rows:
+			cache.invalidate()
+		return rows
+
+	def delete(self):
+		# The CASCADE deletes every task of the lists: one feed reload and
+		# one INSERT of their tombstones.
+		with transaction.atomic(savepoint=False), feed.batched(), Tombstone.objects.batched():
+			return super().delete()
+
 
 class TaskList(models.Model):
 	"""Optional grouping of tasks (e.g., "Personal", "Work")."""
 	name = models.CharField(max_length=200)
 	created_at = models.DateTimeField(auto_now_add=True)
+	# Only changes to the list itself (its name), not its counters.
+	updated_at = models.DateTimeField(auto_now=True)
+	# Denormalized counts of this list's tasks, kept up to date with F()
+	# increments by every TaskQuerySet write method and Task.save()/delete().
+	# Raw SQL or a plain queryset update() of completed, due_date or task_list
+	# bypasses them; `manage.py recount` repairs the drift.
+	open_count = models.IntegerField(default=0, editable=False)
+	completed_count = models.IntegerField(default=0, editable=False)
+	# Open tasks due at or before `overdue_as_of`. Time passing does not
+	# change the count by itself; it is brought forward by the periodic
+	# `sweep_due_tasks` command (or a full `recount`).
+	overdue_count = models.IntegerField(default=0, editable=False)
+	overdue_as_of = models.DateTimeField(default=timezone.now, editable=False)
+
+	objects = TaskListQuerySet.as_manager()
 
 	class Meta:
 		ordering = ["name"]
+		indexes = [
+			models.Index(fields=["name"], name="todos_tasklist_name_idx"),
+			# Delta sync (todos.sync).
+			models.Index(fields=["updated_at", "id"], name="todos_tasklist_updated_idx"),
+		]
 
 	def __str__(self):
 		return self.name
 
+	def delete(self, *args, **kwargs):
+		# The CASCADE deletes every task of the list: one feed reload and
+		# one INSERT of their tombstones.
+		with transaction.atomic(savepoint=False), feed.batched(), Tombstone.objects.batched():
+			return super().delete(*args, **kwargs)
+
+
+# Spacing of `Task.order` keys within a list. Leaves room to move a task
+# between two others about ten times before their keys run out.
+ORDER_GAP = 1024
+
+
+class TaskQuerySet(models.QuerySet):
+	# update() and bulk_create() skip the post_save signal, so they
+	# invalidate the page cache themselves.
+	def update(self, **kwargs):
+		rows = super().update(**kwargs)
+		if rows:
+			cache.invalidate()
+		return rows
+
+	def bulk_create(self, objs, *args, **kwargs):
+		objs = list(objs)
+		with transaction.atomic(savepoint=False):
+			_append_in_order(objs)
+			objs = super().bulk_create(objs, *args, **kwargs)
+			_add_to_counters(objs)
+		if objs:
+			cache.invalidate()
+		return objs
+
+	def delete(self):
+		# One feed reload instead of an event per deleted task, and one
+		# INSERT of all their tombstones.
+		with transaction.atomic(savepoint=False), feed.batched(), Tombstone.objects.batched():
+			self._shift_counters(-1)
+			return super().delete()
+
+	def toggle(self):
+		"""
+		Flip `completed` for every task in the queryset with a single UPDATE.
+
+		`completed_at` is set or cleared in the same statement with the same
+		rules as `Task.save()`; only the changed columns are written. The
+		TaskList counters are adjusted by one more UPDATE, issued first so it
+		still sees the rows in their old state. Returns the number of tasks
+		updated.
+		"""
+		with transaction.atomic(savepoint=False):
+			self._flip_counters()
+			return self.update(**self._toggle_values())
+
+	async def atoggle(self):
+		"""
+		Async `toggle()`. Not on the async ORM: the counter and task UPDATEs
+		must share a transaction, which the async ORM cannot open, so this
+		runs `toggle()` in a thread.
+		"""
+		return await sync_to_async(self.toggle)()
+
+	@staticmethod
+	def _toggle_values():
+		now = timezone.now()
+		return {
+			"completed": Case(When(completed=True, then=Value(False)), default=Value(True)),
+			"completed_at": Case(
+				When(completed=False, then=Coalesce(F("completed_at"), Value(now))),
+				default=Value(None),
+			),
+			"updated_at": now,
+		}
+
+	def complete(self):
+		"""Mark every open task as completed, stamping `completed_at` like `Task.save()`."""
+		now = timezone.now()
+		tasks = self.filter(completed=False)
+		with transaction.atomic(savepoint=False):
+			tasks._flip_counters()
+			return tasks.update(completed=True, completed_at=now, updated_at=now)
+
+	def reopen(self):
+		"""Mark every completed task as open and clear `completed_at` like `Task.save()`."""
+		tasks = self.filter(completed=True)
+		with transaction.atomic(savepoint=False):
+			tasks._flip_counters()
+			return tasks.update(completed=False, completed_at=None, updated_at=timezone.now())
+
+	def move_to(self, task_list):
+		"""Move every task into `task_list` (or out of any list when None)."""
+		with transaction.atomic(savepoint=False):
+			self._shift_counters(-1)
+			if task_list is not None:
+				self._shift_counters(1, into=task_list)
+			return self.update(task_list=task_list, updated_at=timezone.now())
+
+	def reprioritize(self, priority):
+		"""Set the same priority on every task."""
+		return self.update(priority=priority, updated_at=timezone.now())
+
+	def next_order(self):
+		"""An `order` key that sorts after every task in the queryset."""
+		last = self.order_by("-order").values_list("order", flat=True).first()
+		return ORDER_GAP if last is None else last + ORDER_GAP
+
+	def overdue(self, now=None):
+		"""Open tasks due at or before `now`, most overdue first."""
+		return self.due_by(now or timezone.now())
+
+	def due_soon(self, hours, now=None):
+		"""Open tasks due after `now` and within the next `hours` hours, soonest first."""
+		now = now or timezone.now()
+		return self.due_by(now + timedelta(hours=hours)).filter(due_date__gt=now)
+
+	def due_by(self, when):
+		"""
+		Open tasks due at or before `when`, in due date order.
+
+		`completed=False` plus a due_date range is exactly the shape of
+		todos_task_due_open_idx, so this reads only the matching index range.
+		"""
+		return self.filter(completed=False, due_date__lte=when).order_by("due_date", "id")
+
+	def archivable(self, before):
+		"""Completed tasks finished before `before`, oldest first (todos_task_completed_idx)."""
+		return self.filter(completed=True, completed_at__lt=before).order_by("completed_at", "id")
+
+	# The counter methods below read the tasks in the queryset through
+	# correlated subqueries, so each is one UPDATE of the affected TaskLists
+	# however many tasks there are, and must run before the tasks change.
+
+	def _shift_counters(self, sign, into=None):
+		"""Add (sign=1) or remove (sign=-1) the tasks' contribution to their lists' counters, or to `into`'s."""
+		if into is None:
+			lists = TaskList.objects.filter(pk__in=self.values("task_list"))
+			owned = {"task_list": OuterRef("pk")}
+		else:
+			lists = TaskList.objects.filter(pk=into.pk)
+			owned = {}
+		return lists.update(
+			open_count=F("open_count") + sign * _count(self, completed=False, **owned),
+			completed_count=F("completed_count") + sign * _count(self, completed=True, **owned),
+			overdue_count=F("overdue_count") + sign * _count(
+				self, completed=False, due_date__lte=OuterRef("overdue_as_of"), **owned
+			),
+		)
+
+	def _flip_counters(self):
+		"""Adjust the tasks' lists' counters for `completed` flipping on every task."""
+		owned = {"task_list": OuterRef("pk")}
+		opened = _count(self, completed=True, **owned)
+		closed = _count(self, completed=False, **owned)
+		overdue = {"due_date__lte": OuterRef("overdue_as_of")}
+		return TaskList.objects.filter(pk__in=self.values("task_list")).update(
+			open_count=F("open_count") + opened - closed,
+			completed_count=F("completed_count") + closed - opened,
+			overdue_count=F("overdue_count")
+			+ _count(self, completed=True, **overdue, **owned)
+			- _count(self, completed=False, **overdue, **owned),
+		)
+
+
+def _append_in_order(tasks):
+	"""Give new tasks without an `order` keys after the last task of their list."""
+	by_list = {}
+	for task in tasks:
+		if not task.order:
+			by_list.setdefault(task.task_list_id, []).append(task)
+	for list_id, tasks in by_list.items():
+		order = Task.objects.filter(task_list_id=list_id).next_order()
+		for task in tasks:
+			task.order = order
+			order += ORDER_GAP
+
+
+def _add_to_counters(tasks):
+	"""Count freshly inserted `tasks`, which are only in memory, into their lists."""
+	by_list = {}
+	for task in tasks:
+		if task.task_list_id is not None:
+			by_list.setdefault(task.task_list_id, []).append(task)
+	if not by_list:
+		return
+	as_of = dict(TaskList.objects.filter(pk__in=by_list).values_list("pk", "overdue_as_of"))
+	for list_id, tasks in by_list.items():
+		open_tasks = [task for task in tasks if not task.completed]
+		overdue = [task for task in open_tasks if task.due_date and list_id in as_of and task.due_date <= as_of[list_id]]
+		TaskList.objects.filter(pk=list_id).update(
+			open_count=F("open_count") + len(open_tasks),
+			completed_count=F("completed_count") + len(tasks) - len(open_tasks),
+			overdue_count=F("overdue_count") + len(overdue),
+		)
+
 
 class Task(models.Model):
 	"""A single todo/task item."""
@@ -38,17 +321,288 @@ class Task(models.Model):
 	completed_at = models.DateTimeField(null=True, blank=True)
 	order = models.PositiveIntegerField(default=0)
 
+	objects = TaskQuerySet.as_manager()
+
+	# The fields the TaskList counters depend on.
+	COUNTER_FIELDS = ("task_list_id", "completed", "due_date")
+
 	class Meta:
 		ordering = ["-priority", "due_date", "order"]
+		indexes = [
+			# TaskListView ordering (plus the keyset tiebreaker).
+			models.Index(fields=["completed", "-priority", "due_date", "id"], name="todos_task_listview_idx"),
+			# Default Meta.ordering, used by Task.objects.all().
+			models.Index(fields=["-priority", "due_date", "order"], name="todos_task_ordering_idx"),
+			# TaskList.tasks, i.e. Meta.ordering within one list.
+			models.Index(
+				fields=["task_list", "-priority", "due_date", "order"],
+				name="todos_task_tasklist_idx",
+				condition=models.Q(task_list__isnull=False),
+			),
+			# Manual order within a list: reorder neighbour lookups and next_order().
+			models.Index(fields=["task_list", "order", "id"], name="todos_task_manual_order_idx"),
+			# Open tasks by due date: overdue / due-soon queries and the sweep.
+			# Completed tasks, usually the bulk of the table, are left out.
+			models.Index(
+				fields=["due_date"],
+				name="todos_task_due_open_idx",
+				condition=models.Q(completed=False),
+			),
+			# Delta sync (todos.sync).
+			models.Index(fields=["updated_at", "id"], name="todos_task_updated_idx"),
+			# Completed tasks by completion time: picking tasks to archive.
+			models.Index(
+				fields=["completed_at"],
+				name="todos_task_completed_idx",
+				condition=models.Q(completed=True),
+			),
+		]
 
 	def __str__(self):
 		return self.title
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		task = super().from_db(db, field_names, values)
+		task._counted = task._counter_state()
+		task._feed_state = feed.task_state(task)
+		return task
+
+	def _counter_state(self):
+		"""
+		The fields the TaskList counters depend on, or None if any of them
+		is deferred (read from __dict__, so that does not load it).
+		"""
+		try:
+			return tuple(self.__dict__[name] for name in self.COUNTER_FIELDS)
+		except KeyError:
+			return None
+
 	def save(self, *args, **kwargs):
-		"""Set or clear `completed_at` automatically when `completed` changes."""
+		"""
+		Set or clear `completed_at` automatically when `completed` changes,
+		and keep the TaskList counters in step with the saved state. A new
+		task without an `order` goes after the last task of its list.
+		"""
 		if self.completed and self.completed_at is None:
 			self.completed_at = timezone.now()
 		if not self.completed and self.completed_at is not None:
 			self.completed_at = None
-		super().save(*args, **kwargs)
+		adding = self._state.adding
+		if adding and not self.order:
+			self.order = Task.objects.filter(task_list_id=self.task_list_id).next_order()
+		with transaction.atomic(savepoint=False):
+			counted = None if adding else getattr(self, "_counted", None)
+			if counted is None and not adding:
+				# Loaded with a counted field deferred: the counters hold
+				# the stored row, and a deferred field is saved unchanged.
+				counted = Task.objects.filter(pk=self.pk).values_list(*self.COUNTER_FIELDS).first()
+			state = tuple(
+				self.__dict__.get(name, stored)
+				for name, stored in zip(self.COUNTER_FIELDS, counted or (None,) * len(self.COUNTER_FIELDS))
+			)
+			changed = adding or counted != state
+			if changed and not adding:
+				Task.objects.filter(pk=self.pk)._shift_counters(-1)
+			super().save(*args, **kwargs)
+			if changed:
+				Task.objects.filter(pk=self.pk)._shift_counters(1)
+		self._counted = state
+
+	def delete(self, *args, **kwargs):
+		with transaction.atomic(savepoint=False):
+			Task.objects.filter(pk=self.pk)._shift_counters(-1)
+			return super().delete(*args, **kwargs)
+
+
+class TaskArchive(models.Model):
+	"""
+	A completed Task moved out of `todos_task` by `todos.archive`.
+
+	Keeps the task's primary key, so restoring it brings back the same id.
+	"""
+	id = models.BigIntegerField(primary_key=True)
+	task_list = models.ForeignKey(
+		TaskList, related_name="archived_tasks", on_delete=models.CASCADE, null=True, blank=True
+	)
+	title = models.CharField(max_length=200)
+	description = models.TextField(blank=True)
+	due_date = models.DateTimeField(null=True, blank=True)
+	priority = models.PositiveSmallIntegerField(choices=Task.PRIORITY_CHOICES, default=Task.PRIORITY_MEDIUM)
+	created_at = models.DateTimeField()
+	updated_at = models.DateTimeField()
+	completed_at = models.DateTimeField()
+	order = models.PositiveIntegerField(default=0)
+	archived_at = models.DateTimeField(default=timezone.now)
+
+	# Fields copied to and from Task as they are.
+	TASK_FIELDS = (
+		"id", "task_list_id", "title", "description", "due_date", "priority",
+		"created_at", "updated_at", "completed_at", "order",
+	)
+
+	class Meta:
+		ordering = ["-completed_at", "-id"]
+		indexes = [
+			# Archive views, newest first, overall and per list.
+			models.Index(fields=["-completed_at", "-id"], name="todos_archive_completed_idx"),
+			models.Index(fields=["task_list", "-completed_at", "-id"], name="todos_archive_list_idx"),
+		]
+
+	def __str__(self):
+		return self.title
+
+	@classmethod
+	def from_task(cls, task, archived_at):
+		return cls(archived_at=archived_at, **{name: getattr(task, name) for name in cls.TASK_FIELDS})
+
+	def to_task(self):
+		return Task(completed=True, **{name: getattr(self, name) for name in self.TASK_FIELDS})
+
+
+# Inside `TombstoneManager.batched()`: the tombstones waiting to be written.
+_pending_tombstones = ContextVar("todo_pending_tombstones", default=None)
+
+
+class TombstoneManager(models.Manager):
+	def record(self, model, object_id):
+		"""Record a deletion, at once or, inside `batched()`, with the others when it exits."""
+		tombstone = Tombstone(model=model, object_id=object_id)
+		pending = _pending_tombstones.get()
+		if pending is None:
+			tombstone.save()
+		else:
+			pending.append(tombstone)
+
+	@contextmanager
+	def batched(self):
+		"""
+		Write the tombstones recorded inside the block with one bulk INSERT
+		when it exits, rather than an INSERT per deleted row. Nested blocks
+		write with the outermost one; nothing is written if the block raises.
+		"""
+		if _pending_tombstones.get() is not None:
+			yield
+			return
+		pending = []
+		token = _pending_tombstones.set(pending)
+		try:
+			yield
+		finally:
+			_pending_tombstones.reset(token)
+		if pending:
+			self.bulk_create(pending)
+
+
+class Tombstone(models.Model):
+	"""
+	Records that a Task or TaskList was deleted, so delta-sync clients
+	(`todos.sync`) can drop their copy. Written by a post_delete receiver,
+	so it covers single deletes, queryset deletes, a TaskList's CASCADE and
+	archiving; the bulk ones write theirs in one statement.
+	"""
+	TASK = "task"
+	TASK_LIST = "task_list"
+	MODEL_CHOICES = ((TASK, "Task"), (TASK_LIST, "Task list"))
+
+	model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+	object_id = models.BigIntegerField()
+	deleted_at = models.DateTimeField(default=timezone.now)
+
+	objects = TombstoneManager()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=["deleted_at", "id"], name="todos_tombstone_deleted_idx"),
+		]
+
+	def __str__(self):
+		return f"{self.model} #{self.object_id}"
+
+
+class HighWaterMark(models.Model):
+	"""How far a periodic job has processed a time-ordered stream, by job name."""
+	name = models.CharField(max_length=50, primary_key=True)
+	value = models.DateTimeField()
+
+	def __str__(self):
+		return f"{self.name}: {self.value.isoformat()}"
+
+
+class JobQuerySet(models.QuerySet):
+	def runnable(self, now):
+		"""Queued jobs due to run at `now`, oldest first: a walk of todos_job_queued_idx."""
+		return self.filter(status=Job.QUEUED, run_after__lte=now).order_by("run_after", "id")
+
+	def stale(self, before):
+		"""Running jobs whose worker has not reported since `before`."""
+		return self.filter(status=Job.RUNNING, heartbeat_at__lt=before)
+
+
+class Job(models.Model):
+	"""
+	A unit of heavy work run outside the request by `manage.py run_workers`.
+
+	`kind` names a function registered in `todos.jobs`, called with `params`.
+	It reports progress through `report()`, which is also the worker's
+	heartbeat.
+	"""
+	QUEUED = "queued"
+	RUNNING = "running"
+	SUCCEEDED = "succeeded"
+	FAILED = "failed"
+	STATUS_CHOICES = (
+		(QUEUED, "Queued"),
+		(RUNNING, "Running"),
+		(SUCCEEDED, "Succeeded"),
+		(FAILED, "Failed"),
+	)
+
+	kind = models.CharField(max_length=50)
+	params = models.JSONField(default=dict, blank=True)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+	attempts = models.PositiveSmallIntegerField(default=0)
+	max_attempts = models.PositiveSmallIntegerField(default=3)
+	# Units of work done out of `total` (None until the job knows it).
+	done = models.PositiveIntegerField(default=0)
+	total = models.PositiveIntegerField(null=True, blank=True)
+	result = models.JSONField(null=True, blank=True)
+	# Traceback of the last failed attempt.
+	error = models.TextField(blank=True)
+	worker = models.CharField(max_length=100, blank=True)
+	# Not run before this time: set in the future to back off a retry.
+	run_after = models.DateTimeField(default=timezone.now)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	heartbeat_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	objects = JobQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			# Claiming the next job.
+			models.Index(
+				fields=["run_after", "id"],
+				name="todos_job_queued_idx",
+				condition=models.Q(status="queued"),
+			),
+			# Finding jobs whose worker died.
+			models.Index(
+				fields=["heartbeat_at"],
+				name="todos_job_running_idx",
+				condition=models.Q(status="running"),
+			),
+		]
+
+	def __str__(self):
+		return f"{self.kind} #{self.pk} ({self.status})"
 
+	def report(self, done, total=None):
+		"""Record progress; also tells `run_workers` the job is still alive."""
+		self.done = done
+		self.heartbeat_at = timezone.now()
+		fields = {"done": done, "heartbeat_at": self.heartbeat_at}
+		if total is not None:
+			self.total = fields["total"] = total
+		Job.objects.filter(pk=self.pk).update(**fields)
@@ -0,0 +1,136 @@
+"""
+Manual task order within a TaskList, on gapped integer keys.
+
+New tasks are appended `ORDER_GAP` after the last key of their list, so
+moving a task between two others takes the midpoint of their keys and
+writes only that task. When two neighbours' keys are adjacent, a window of
+tasks around the insertion point is renumbered evenly to open the gaps up
+again; the window starts small and doubles until its outer bounds leave
+enough room, so the renumbering stays local to the crowded range.
+"""
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from .models import ORDER_GAP, Task
+from .pagination import KeysetPaginator
+
+# Tasks on each side of the insertion point in the first rebalance window.
+REBALANCE_WINDOW = 8
+# Smallest spacing a rebalance may leave, so the next moves have room too.
+MIN_SPACING = ORDER_GAP // 16
+# Rows renumbered per UPDATE; a normal window fits in one statement.
+BATCH_SIZE = 500
+
+
+def move(task, before=None, after=None):
+    """
+    Put `task` directly before `before` or directly after `after`.
+
+    If the other task is in a different TaskList, `task` moves into that
+    list too. Returns the number of other tasks that had to be renumbered,
+    which is 0 unless the keys around the insertion point had run out.
+    The other task's `order` must be current; it is updated in place if it
+    gets renumbered.
+    """
+    anchor = before if before is not None else after
+    if anchor is None or (before is not None and after is not None):
+        raise ValueError("Give exactly one of before= and after=.")
+    if anchor.pk == task.pk:
+        raise ValueError("A task cannot be placed before or after itself.")
+    placing_before = before is not None
+    with transaction.atomic():
+        if task.task_list_id != anchor.task_list_id:
+            Task.objects.filter(pk=task.pk).move_to(anchor.task_list)
+            task.task_list_id = anchor.task_list_id
+        siblings = Task.objects.filter(task_list_id=anchor.task_list_id).exclude(pk=task.pk)
+        lower, upper = _neighbours(siblings, anchor, placing_before)
+        renumbered = 0
+        if upper is not None and upper - lower < 2:
+            lower, upper, renumbered = _rebalance(siblings, anchor, placing_before)
+        order = lower + ORDER_GAP if upper is None else (lower + upper) // 2
+        Task.objects.filter(pk=task.pk).update(order=order, updated_at=timezone.now())
+    task.order = order
+    return renumbered
+
+
+def _paginator(siblings, per_page):
+    return KeysetPaginator(siblings.order_by('order', 'id'), per_page)
+
+
+def _before(siblings, anchor, count):
+    """Up to `count` tasks directly before `anchor`, in order."""
+    paginator = _paginator(siblings, count)
+    return list(paginator.page(paginator.encode(anchor, backward=True)))
+
+
+def _after(siblings, anchor, count):
+    """Up to `count` tasks directly after `anchor`, in order."""
+    paginator = _paginator(siblings, count)
+    return list(paginator.page(paginator.encode(anchor)))
+
+
+def _neighbours(siblings, anchor, placing_before):
+    """
+    The keys the moved task must fit strictly between, as ``(lower, upper)``.
+
+    `lower` is -1 at the start of the list (keys are non-negative) and
+    `upper` is None at the end.
+    """
+    if placing_before:
+        previous = _before(siblings, anchor, 1)
+        return (previous[0].order if previous else -1), anchor.order
+    following = _after(siblings, anchor, 1)
+    return anchor.order, (following[0].order if following else None)
+
+
+def _rebalance(siblings, anchor, placing_before):
+    """
+    Renumber tasks around the insertion point so there is room for one more.
+
+    Returns the new ``(lower, upper)`` keys around the insertion point and
+    the number of tasks renumbered.
+    """
+    width = REBALANCE_WINDOW
+    while True:
+        # width + 1 tasks on each side of the insertion point: the
+        # outermost one on each side is a fixed bound, the rest are renumbered.
+        if placing_before:
+            left = _before(siblings, anchor, width + 1)
+            right = [anchor] + _after(siblings, anchor, width)
+        else:
+            left = _before(siblings, anchor, width) + [anchor]
+            right = _after(siblings, anchor, width + 1)
+        lower = -1
+        if len(left) > width:
+            lower, left = left[0].order, left[1:]
+        upper = None
+        if len(right) > width:
+            upper, right = right[-1].order, right[:-1]
+
+        # One slot per renumbered task plus one for the moved task.
+        slots = len(left) + len(right) + 1
+        spacing = ORDER_GAP if upper is None else (upper - lower) // (slots + 1)
+        if spacing >= MIN_SPACING or (upper is None and lower == -1):
+            break
+        width *= 2
+
+    keys = {}
+    gap = lower + spacing * (len(left) + 1)
+    for position, task in enumerate(left + [None] + right, start=1):
+        if task is not None:
+            # Also updates `anchor` in place, which sits in `left` or `right`.
+            task.order = keys[task.pk] = lower + spacing * position
+    _renumber(keys)
+    return gap - 1, gap + 1, len(keys)
+
+
+def _renumber(keys):
+    now = timezone.now()
+    pks = list(keys)
+    for start in range(0, len(pks), BATCH_SIZE):
+        batch = pks[start:start + BATCH_SIZE]
+        Task.objects.filter(pk__in=batch).update(
+            order=Case(*(When(pk=pk, then=Value(keys[pk])) for pk in batch)),
+            updated_at=now,
+        )
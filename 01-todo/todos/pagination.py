@@ -0,0 +1,190 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, Value
+from django.db.models.lookups import Exact
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination token cannot be decoded."""
+
+
+def _isoformat(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(values, backward=False):
+    """Pack sort key `values` and a direction into an opaque URL-safe token."""
+    # Not DjangoJSONEncoder: it truncates datetimes to milliseconds and
+    # the cursor must round-trip to the exact stored value.
+    payload = json.dumps({'b': backward, 'k': values}, default=_isoformat, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(backward, raw_values)`` for a token from `encode_cursor`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return bool(payload['b']), list(payload['k'])
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class KeysetPage:
+    """One page of results plus the opaque tokens to reach its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over an ordered queryset.
+
+    The queryset's ordering is used as the sort key; the primary key is
+    appended as a tiebreaker when missing so every row has a unique position.
+    NULLs sort as the smallest value (SQLite's default), regardless of backend.
+
+    Rather than one ``WHERE (a, b, c) > cursor`` predicate, which SQLite can
+    only satisfy by scanning from the start of the leading column's range,
+    each page is fetched as a short series of "tiers": rows sharing the
+    cursor's first N-1 key values with the Nth value strictly after it. Each
+    tier is an equality prefix plus one range, i.e. a plain index seek, so
+    a deep page costs the same as the first one.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset.order_by()
+        self.per_page = int(per_page)
+        model = queryset.model
+        ordering = list(ordering or queryset.query.order_by)
+        pk_name = model._meta.pk.name
+        if not any(name.lstrip('-') in (pk_name, 'pk') for name in ordering):
+            ordering.append(pk_name)
+        self.keys = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            if name == 'pk':
+                name = pk_name
+            field = model._meta.get_field(name)
+            self.keys.append((field, descending))
+
+    def page(self, cursor=None):
+        """Return the `KeysetPage` at `cursor`, or the first page if omitted."""
+        backward, querysets = self._plan(cursor)
+        rows = []
+        for queryset in querysets:
+            rows.extend(queryset[:self.per_page + 1 - len(rows)])
+            if len(rows) > self.per_page:
+                break
+        return self._build(rows, cursor, backward)
+
+    async def apage(self, cursor=None):
+        """Async `page()`, fetching through the async ORM."""
+        backward, querysets = self._plan(cursor)
+        rows = []
+        for queryset in querysets:
+            rows.extend([obj async for obj in queryset[:self.per_page + 1 - len(rows)]])
+            if len(rows) > self.per_page:
+                break
+        return self._build(rows, cursor, backward)
+
+    def _plan(self, cursor):
+        """Return ``(backward, querysets)``: the ordered querysets to read in turn."""
+        if not cursor:
+            return False, [self._ordered(backward=False)]
+        backward, values = self.decode(cursor)
+        return backward, self._tiers(values, backward)
+
+    def _build(self, rows, cursor, backward):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+            previous_cursor = self.encode(rows[0], backward=True) if has_more else None
+            next_cursor = self.encode(rows[-1], backward=False) if rows else None
+        else:
+            next_cursor = self.encode(rows[-1], backward=False) if has_more else None
+            previous_cursor = self.encode(rows[0], backward=True) if rows and cursor else None
+        return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+    def encode(self, obj, backward=False):
+        return encode_cursor([getattr(obj, field.attname) for field, _ in self.keys], backward)
+
+    def decode(self, cursor):
+        """Return ``(backward, values)`` for a token produced by `encode`."""
+        backward, raw = decode_cursor(cursor)
+        if len(raw) != len(self.keys):
+            raise InvalidCursor(cursor)
+        try:
+            values = [field.to_python(value) for (field, _), value in zip(self.keys, raw)]
+        except ValidationError as exc:
+            raise InvalidCursor(cursor) from exc
+        return backward, values
+
+    def _ordered(self, backward):
+        expressions = []
+        for field, descending in self.keys:
+            expression = F(field.attname)
+            if descending != backward:
+                expressions.append(expression.desc(nulls_last=True) if field.null else expression.desc())
+            else:
+                expressions.append(expression.asc(nulls_first=True) if field.null else expression.asc())
+        return self.queryset.order_by(*expressions)
+
+    def _equal(self, field, value):
+        if value is None:
+            return Q(**{f'{field.attname}__isnull': True})
+        # Wrapping the value keeps booleans as ``col = %s``; a bare bool is
+        # rendered as ``NOT col``, which SQLite cannot match to an index.
+        return Exact(F(field.attname), Value(value, output_field=field))
+
+    def _after(self, field, value, walk_descending):
+        """Conditions selecting values strictly after `value` in walk order."""
+        name = field.attname
+        if not walk_descending:
+            if value is None:
+                return [Q(**{f'{name}__isnull': False})]
+            return [Q(**{f'{name}__gt': value})]
+        if value is None:
+            return []
+        conditions = [Q(**{f'{name}__lt': value})]
+        if field.null:
+            conditions.append(Q(**{f'{name}__isnull': True}))
+        return conditions
+
+    def _tiers(self, values, backward):
+        ordered = self._ordered(backward)
+        querysets = []
+        for depth in reversed(range(len(self.keys))):
+            prefix = [
+                self._equal(field, value)
+                for (field, _), value in zip(self.keys[:depth], values[:depth])
+            ]
+            field, descending = self.keys[depth]
+            for condition in self._after(field, values[depth], descending != backward):
+                querysets.append(ordered.filter(*prefix, condition))
+        return querysets
@@ -0,0 +1,132 @@
+"""
+Ranked full-text search over Task.title and Task.description.
+
+Backed by the ``todos_task_fts`` FTS5 table (migration 0003), which triggers
+keep in sync with ``todos_task``. Results are ordered by bm25 relevance, with
+title matches weighted above description matches, and paginated with the
+same opaque cursor tokens as the task list.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Task
+from .pagination import InvalidCursor, KeysetPage, decode_cursor, encode_cursor
+
+# bm25() column weights: title, description.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Shortest last word that is searched as a prefix.
+MIN_PREFIX = 2
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 MATCH expression, or '' if it has no words.
+
+    Every word must match; the last one also matches as a prefix so results
+    update while the user is still typing it. Words are quoted, so FTS5
+    operators in user input are treated as plain text. A single character
+    is not expanded: the index only stores 2- and 3-character prefixes, and
+    expanding one letter would visit a large share of the vocabulary.
+    """
+    words = _TOKEN_RE.findall(query)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_tasks(query, per_page, cursor=None):
+    """Return a `KeysetPage` of tasks matching `query`, best matches first."""
+    match = build_match(query)
+    if not match:
+        return KeysetPage([])
+
+    backward, after = False, None
+    if cursor:
+        backward, after = decode_cursor(cursor)
+        if len(after) != 2:
+            raise InvalidCursor(cursor)
+        try:
+            after = [float(after[0]), int(after[1])]
+        except (TypeError, ValueError) as exc:
+            raise InvalidCursor(cursor) from exc
+
+    rows = _fetch(match, per_page + 1, after, backward)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+        previous_cursor = _encode(rows[0], backward=True) if has_more else None
+        next_cursor = _encode(rows[-1], backward=False) if rows else None
+    else:
+        next_cursor = _encode(rows[-1], backward=False) if has_more else None
+        previous_cursor = _encode(rows[0], backward=True) if rows and cursor else None
+    return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+def filter_matching(queryset, query):
+    """
+    Narrow a Task queryset to the tasks matching `query`, unranked, keeping
+    its own ordering (for the admin changelist). An empty query matches all.
+    """
+    match = build_match(query)
+    if not match:
+        return queryset
+    if connection.vendor != 'sqlite':
+        return _contains_words(queryset, match)
+    return queryset.filter(pk__in=RawSQL('SELECT rowid FROM todos_task_fts WHERE todos_task_fts MATCH %s', [match]))
+
+
+def _encode(task, backward):
+    return encode_cursor([task.score, task.pk], backward)
+
+
+def _fetch(match, limit, after, backward):
+    if connection.vendor != 'sqlite':
+        return _fetch_fallback(match, limit, after, backward)
+
+    score = f'bm25(todos_task_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})'
+    # bm25() is lower-is-better, so ascending score means best first.
+    order = 'DESC' if backward else 'ASC'
+    compare = '<' if backward else '>'
+    where = ['todos_task_fts MATCH %s']
+    params = [match]
+    if after is not None:
+        where.append(f'({score} {compare} %s OR ({score} = %s AND rowid {compare} %s))')
+        params += [after[0], after[0], after[1]]
+    # Rank and cut inside the FTS table first, so only one page of matches
+    # is joined back to todos_task.
+    sql = (
+        'SELECT todos_task.*, matches.score FROM ('
+        f'SELECT rowid, {score} AS score FROM todos_task_fts '
+        f'WHERE {" AND ".join(where)} '
+        f'ORDER BY score {order}, rowid {order} LIMIT %s'
+        ') AS matches JOIN todos_task ON todos_task.id = matches.rowid '
+        f'ORDER BY matches.score {order}, todos_task.id {order}'
+    )
+    return list(Task.objects.raw(sql, params + [limit]))
+
+
+def _fetch_fallback(match, limit, after, backward):
+    """Unranked icontains search for databases without FTS5."""
+    queryset = _contains_words(Task.objects.all(), match)
+    if after is not None:
+        queryset = queryset.filter(**{'pk__lt' if backward else 'pk__gt': after[1]})
+    tasks = list(queryset.order_by('-pk' if backward else 'pk')[:limit])
+    for task in tasks:
+        task.score = 0.0
+    return tasks
+
+
+def _contains_words(queryset, match):
+    for word in _TOKEN_RE.findall(match):
+        queryset = queryset.filter(title__icontains=word) | queryset.filter(description__icontains=word)
+    return queryset
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import cache, feed
+from .models import Task, TaskList, Tombstone
+
+# Sent by `todos.due.sweep` with `tasks`, a list of Tasks that became
+# overdue / entered the due-soon window since the previous sweep. A batch may
+# be sent again if a sweep fails before it commits.
+task_overdue = Signal()
+task_due_soon = Signal()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=TaskList)
+@receiver(post_delete, sender=TaskList)
+def invalidate_page_cache(sender, **kwargs):
+    cache.invalidate()
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, created, **kwargs):
+    feed.task_saved(instance, created)
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, **kwargs):
+    # Queryset deletes, archiving and a TaskList's CASCADE run inside
+    # `feed.batched()`, which turns these into a single reload.
+    feed.task_deleted(instance.pk, instance.task_list_id)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=TaskList)
+def record_tombstone(sender, instance, **kwargs):
+    # For delta-sync clients (todos.sync); covers CASCADE and archiving too,
+    # which batch their tombstones into one INSERT.
+    Tombstone.objects.record(Tombstone.TASK if sender is Task else Tombstone.TASK_LIST, instance.pk)
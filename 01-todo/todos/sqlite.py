@@ -0,0 +1,16 @@
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    `connection_created` receiver that runs ``settings.SQLITE_PRAGMAS``.
+
+    A no-op for other backends and when the setting is absent, so it is safe
+    to connect unconditionally.
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,115 @@
+"""
+Delta sync for offline clients: what changed since the client's last sync.
+
+A sync cursor holds one keyset position per stream: TaskLists and Tasks by
+``(updated_at, id)`` and Tombstones by ``(deleted_at, id)``. Each page reads
+at most `limit` rows of each stream through its index, so a sync costs what
+changed since the cursor, not the size of the tables. Clients store the
+returned cursor and send it back; while ``has_more`` is true they should
+fetch again straight away.
+
+Rows changed within the last `SETTLE` are held back until a later sync:
+`updated_at` is stamped before the writing transaction commits, so without
+the delay a row could become visible behind a cursor that already passed it.
+
+A task deleted and later restored (`todos.archive.restore`) comes back with
+its id, so a client should only apply a tombstone whose ``deleted_at`` is
+later than the ``updated_at`` of its copy.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Task, TaskList, Tombstone
+from .pagination import InvalidCursor, KeysetPage, KeysetPaginator, decode_cursor, encode_cursor
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+SETTLE = timedelta(seconds=2)
+# Tombstones older than this are pruned, and cursors older than this expire.
+TOMBSTONE_DAYS = 90
+
+TASK_FIELDS = (
+    'id', 'task_list_id', 'title', 'description', 'due_date', 'completed',
+    'priority', 'created_at', 'updated_at', 'completed_at', 'order',
+)
+TASK_LIST_FIELDS = ('id', 'name', 'created_at', 'updated_at')
+
+
+class CursorExpired(Exception):
+    """The cursor predates the retained tombstones; the client must sync from scratch."""
+
+
+def changes(cursor=None, limit=PAGE_SIZE, now=None):
+    """
+    One page of changes after `cursor`, or of everything on a first sync.
+
+    Returns a dict with ``task_lists`` and ``tasks`` (created or changed,
+    as field dicts), ``deleted`` (``{'tasks': [ids], 'task_lists': [ids]}``),
+    the next ``cursor`` and ``has_more``. Raises InvalidCursor or
+    CursorExpired.
+    """
+    now = now or timezone.now()
+    until = now - SETTLE
+    task_lists = KeysetPaginator(
+        TaskList.objects.filter(updated_at__lte=until).order_by('updated_at', 'id'), limit,
+    )
+    tasks = KeysetPaginator(
+        Task.objects.filter(updated_at__lte=until).order_by('updated_at', 'id'), limit,
+    )
+    tombstones = KeysetPaginator(
+        Tombstone.objects.filter(deleted_at__lte=until).order_by('deleted_at', 'id'), limit,
+    )
+    if cursor:
+        lists_at, tasks_at, deleted_at = _decode(cursor)
+        _, (since, _) = tombstones.decode(deleted_at)
+        if since < now - timedelta(days=TOMBSTONE_DAYS):
+            raise CursorExpired(cursor)
+    else:
+        lists_at = tasks_at = deleted_at = None
+
+    list_page = task_lists.page(lists_at)
+    task_page = tasks.page(tasks_at)
+    # A first sync downloads every list and task, so only deletions after
+    # it matter: there are no tombstones to read yet.
+    deleted_page = tombstones.page(deleted_at) if cursor else KeysetPage([])
+    deleted = {'tasks': [], 'task_lists': []}
+    for tombstone in deleted_page:
+        deleted['tasks' if tombstone.model == Tombstone.TASK else 'task_lists'].append(tombstone.object_id)
+    if not deleted_page.has_next():
+        # Caught up: move to `until` even without new tombstones, so an idle
+        # client's cursor does not expire. Tombstones stamped exactly at
+        # `until` may be sent twice, which is harmless.
+        deleted_at = tombstones.encode(Tombstone(id=0, deleted_at=until))
+    else:
+        deleted_at = tombstones.encode(deleted_page.object_list[-1])
+
+    return {
+        'task_lists': [{name: getattr(row, name) for name in TASK_LIST_FIELDS} for row in list_page],
+        'tasks': [{name: getattr(row, name) for name in TASK_FIELDS} for row in task_page],
+        'deleted': deleted,
+        'cursor': encode_cursor([
+            _advance(task_lists, list_page, lists_at),
+            _advance(tasks, task_page, tasks_at),
+            deleted_at,
+        ]),
+        'has_more': list_page.has_next() or task_page.has_next() or deleted_page.has_next(),
+    }
+
+
+def _advance(paginator, page, position):
+    """The position after `page`: its last row, or `position` if it is empty."""
+    return paginator.encode(page.object_list[-1]) if page.object_list else position
+
+
+def _decode(cursor):
+    _, positions = decode_cursor(cursor)
+    if len(positions) != 3 or not all(p is None or isinstance(p, str) for p in positions) or not positions[2]:
+        raise InvalidCursor(cursor)
+    return positions
+
+
+def prune_tombstones(days=TOMBSTONE_DAYS, now=None):
+    """Delete tombstones older than `days`. Returns how many were deleted."""
+    before = (now or timezone.now()) - timedelta(days=days)
+    return Tombstone.objects.filter(deleted_at__lt=before).delete()[0]
@@ -1,7 +1,33 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import subprocess
+import sys
+import threading
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, Max, Min
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
-from .models import Task, TaskList
+from todo_project import metrics
+from todo_project.middleware import PIN_COOKIE
+from . import archive, async_views, cache as page_cache, due, feed, jobs, ordering, sync
+from .admin import EstimatedCountPaginator
+from .models import ORDER_GAP, HighWaterMark, Job, Task, TaskArchive, TaskList, Tombstone
+from .pagination import KeysetPaginator
+from .management.commands.check_query_plans import sample_task, view_requests
+from .search import build_match, search_tasks
+from .signals import task_due_soon, task_overdue
+from .sqlite import apply_pragmas
+from .views import TaskListView, sidebar_lists
 
 class TaskModelTests(TestCase):
     def test_completed_at_set_on_completion(self):
@@ -86,3 +112,1293 @@ class TaskViewTests(TestCase):
         response = self.client.post(reverse('task_toggle', args=[self.task.pk]))
         self.task.refresh_from_db()
         self.assertFalse(self.task.completed)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        due_dates = [None, now, now + timezone.timedelta(days=1), None, now]
+        for i in range(15):
+            Task.objects.create(
+                title=f"Task {i}",
+                priority=(i % 3) + 1,
+                completed=(i % 4 == 0),
+                due_date=due_dates[i % len(due_dates)],
+            )
+        self.queryset = Task.objects.order_by('completed', '-priority', 'due_date', 'id')
+        self.expected = list(self.queryset.values_list('pk', flat=True))
+
+    def test_forward_walk_matches_full_ordering(self):
+        """Following next tokens visits every task once in list order."""
+        paginator = KeysetPaginator(self.queryset, 4)
+        page = paginator.page()
+        seen = [task.pk for task in page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(task.pk for task in page)
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_walk_returns_same_pages(self):
+        """Previous tokens lead back to the pages seen going forward."""
+        paginator = KeysetPaginator(self.queryset, 4)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual([t.pk for t in page], [t.pk for t in expected])
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('task_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_view_is_paginated(self):
+        """The list view renders one page and links to the next one."""
+        response = self.client.get(reverse('task_list'))
+        self.assertEqual(len(response.context['tasks']), 15)
+
+        Task.objects.bulk_create(Task(title=f"Bulk {i}") for i in range(50))
+        response = self.client.get(reverse('task_list'))
+        page = response.context['page_obj']
+        self.assertEqual(len(response.context['tasks']), 50)
+        self.assertTrue(page.has_next())
+        response = self.client.get(reverse('task_list'), {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['tasks']), 15)
+
+
+class QueryPlanTests(TestCase):
+    def test_view_queries_use_indexes(self):
+        """Every statement issued by the todos views is an index search or ordered index walk."""
+        task_list = TaskList.objects.create(name="Work")
+        Task.objects.create(title="Task", task_list=task_list, due_date=timezone.now())
+        call_command('check_query_plans', stdout=StringIO())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.milk = Task.objects.create(title="Buy milk", description="Semi-skimmed")
+        self.report = Task.objects.create(title="Write report", description="Mention the milk budget")
+        Task.objects.create(title="Call plumber")
+
+    def test_build_match_quotes_words_and_prefixes_the_last(self):
+        self.assertEqual(build_match('buy mi'), '"buy" "mi"*')
+        self.assertEqual(build_match('buy m'), '"buy" "m"')
+        self.assertEqual(build_match('"a" OR bc*'), '"a" "OR" "bc"*')
+        self.assertEqual(build_match('  -- '), '')
+
+    def test_title_matches_rank_first(self):
+        page = search_tasks('milk', 10)
+        self.assertEqual([task.pk for task in page], [self.milk.pk, self.report.pk])
+
+    def test_prefix_matching(self):
+        self.assertEqual([task.pk for task in search_tasks('plu', 10)], [Task.objects.get(title="Call plumber").pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.milk.title = "Buy bread"
+        self.milk.save()
+        self.assertEqual([task.pk for task in search_tasks('bread', 10)], [self.milk.pk])
+        self.report.delete()
+        self.assertEqual([task.pk for task in search_tasks('milk', 10)], [])
+
+    def test_pages_walk_forward_and_back(self):
+        for i in range(5):
+            Task.objects.create(title=f"Shopping item {i}")
+        first = search_tasks('shopping', 2)
+        second = search_tasks('shopping', 2, first.next_cursor)
+        third = search_tasks('shopping', 2, second.next_cursor)
+        seen = [task.pk for page in (first, second, third) for task in page]
+        self.assertEqual(len(set(seen)), 5)
+        self.assertFalse(third.has_next())
+        back = search_tasks('shopping', 2, second.previous_cursor)
+        self.assertEqual([task.pk for task in back], [task.pk for task in first])
+
+    def test_view(self):
+        response = self.client.get(reverse('task_search'), {'q': 'milk'})
+        self.assertContains(response, "Buy milk")
+        self.assertNotContains(response, "Call plumber")
+        self.assertEqual(self.client.get(reverse('task_search'), {'q': 'x', 'cursor': 'bogus'}).status_code, 404)
+
+
+class TaskListCounterTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.home = TaskList.objects.create(name="Home")
+        self.past = timezone.now() - timezone.timedelta(days=1)
+
+    def assertCounts(self, task_list, open, completed, overdue):
+        task_list.refresh_from_db()
+        self.assertEqual(
+            (task_list.open_count, task_list.completed_count, task_list.overdue_count),
+            (open, completed, overdue),
+        )
+
+    def test_save_and_delete(self):
+        task = Task.objects.create(title="Late", task_list=self.work, due_date=self.past)
+        Task.objects.create(title="Done", task_list=self.work, completed=True)
+        self.assertCounts(self.work, 1, 1, 1)
+
+        task.completed = True
+        task.save()
+        self.assertCounts(self.work, 0, 2, 0)
+
+        task.task_list = self.home
+        task.completed = False
+        task.save()
+        self.assertCounts(self.work, 0, 1, 0)
+        self.assertCounts(self.home, 1, 0, 1)
+
+        task.delete()
+        self.assertCounts(self.home, 0, 0, 0)
+
+    def test_unchanged_save_skips_counters(self):
+        task = Task.objects.create(title="Task", task_list=self.work)
+        task = Task.objects.get(pk=task.pk)
+        task.title = "Renamed"
+        with self.assertNumQueries(1):
+            task.save()
+
+    def test_save_after_partial_load(self):
+        pk = Task.objects.create(title="Late", task_list=self.work, due_date=self.past).pk
+
+        task = Task.objects.only('title').get(pk=pk)
+        task.title = "Renamed"
+        task.save()
+        self.assertCounts(self.work, 1, 0, 1)
+        task.completed = True
+        task.save()
+        self.assertCounts(self.work, 0, 1, 0)
+
+        task = Task.objects.defer('completed').get(pk=pk)
+        task.task_list = self.home
+        task.save()
+        self.assertCounts(self.work, 0, 0, 0)
+        self.assertCounts(self.home, 0, 1, 0)
+        task = Task.objects.defer('due_date', 'task_list').get(pk=pk)
+        task.completed = False
+        task.save()
+        self.assertCounts(self.home, 1, 0, 1)
+
+        task = Task.objects.get(pk=pk)
+        task.refresh_from_db(fields=['order'])
+        task.task_list = self.work
+        task.save()
+        self.assertCounts(self.home, 0, 0, 0)
+        self.assertCounts(self.work, 1, 0, 1)
+
+    def test_toggle_view(self):
+        task = Task.objects.create(title="Late", task_list=self.work, due_date=self.past)
+        self.client.post(reverse('task_toggle', args=[task.pk]))
+        self.assertCounts(self.work, 0, 1, 0)
+        self.client.post(reverse('task_toggle', args=[task.pk]))
+        self.assertCounts(self.work, 1, 0, 1)
+
+    def test_bulk_actions(self):
+        Task.objects.bulk_create(
+            [Task(title=f"Work {i}", task_list=self.work, due_date=self.past) for i in range(4)]
+            + [Task(title="Done", task_list=self.work, completed=True)]
+        )
+        self.assertCounts(self.work, 4, 1, 4)
+        ids = list(Task.objects.order_by('pk').values_list('pk', flat=True))
+
+        self.client.post(reverse('task_bulk'), {'action': 'complete', 'ids': ids[:2]})
+        self.assertCounts(self.work, 2, 3, 2)
+        self.client.post(reverse('task_bulk'), {'action': 'move', 'ids': ids[1:3], 'task_list': self.home.pk})
+        self.assertCounts(self.work, 1, 2, 1)
+        self.assertCounts(self.home, 1, 1, 1)
+        self.client.post(reverse('task_bulk'), {'action': 'reopen', 'filter_task_list': self.home.pk})
+        self.assertCounts(self.home, 2, 0, 2)
+        self.client.post(reverse('task_bulk'), {'action': 'delete', 'ids': ids})
+        self.assertCounts(self.work, 0, 0, 0)
+        self.assertCounts(self.home, 0, 0, 0)
+
+    def test_recount_repairs_drift(self):
+        Task.objects.create(title="Task", task_list=self.work)
+        Task.objects.create(title="Now late", task_list=self.work, due_date=timezone.now())
+        TaskList.objects.filter(pk=self.work.pk).update(open_count=7, completed_count=3)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn("Work (#%d): open_count 7 -> 2" % self.work.pk, out.getvalue())
+        self.assertIn("1 had drifted", out.getvalue())
+        self.assertCounts(self.work, 2, 0, 1)
+
+    def test_sidebar_is_one_query(self):
+        Task.objects.create(title="Task", task_list=self.work)
+        with self.assertNumQueries(1):
+            lists = list(sidebar_lists())
+        self.assertEqual([(task_list.name, task_list.open_count) for task_list in lists], [("Home", 0), ("Work", 1)])
+        self.assertContains(self.client.get(reverse('task_list')), 'title="Open">1<')
+
+
+class DueTaskTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.work = TaskList.objects.create(name="Work")
+        self.late = Task.objects.create(title="Late", task_list=self.work, due_date=self.now - timezone.timedelta(hours=2))
+        self.soon = Task.objects.create(title="Soon", task_list=self.work, due_date=self.now + timezone.timedelta(hours=3))
+        Task.objects.create(title="Later", due_date=self.now + timezone.timedelta(days=3))
+        Task.objects.create(title="Done", due_date=self.now - timezone.timedelta(hours=1), completed=True)
+        Task.objects.create(title="Someday")
+
+    def titles(self, queryset):
+        return [task.title for task in queryset]
+
+    def test_queries(self):
+        self.assertEqual(self.titles(Task.objects.overdue(self.now)), ["Late"])
+        self.assertEqual(self.titles(Task.objects.due_soon(24, self.now)), ["Soon"])
+        self.assertEqual(self.titles(Task.objects.due_by(self.now + timezone.timedelta(days=7))), ["Late", "Soon", "Later"])
+
+    def test_view(self):
+        response = self.client.get(reverse('task_due'), {'hours': 24})
+        self.assertEqual(self.titles(response.context['tasks']), ["Late", "Soon"])
+        self.assertContains(response, "Overdue", count=1 + 1)  # heading + one badge
+        self.assertEqual(self.client.get(reverse('task_due'), {'hours': 'soon'}).status_code, 400)
+        for hours in (-1, due.MAX_HOURS + 1, 1000000000, -1000000000):
+            self.assertEqual(self.client.get(reverse('task_due'), {'hours': hours}).status_code, 400)
+
+    def collect(self, signal):
+        received = []
+
+        def receiver(sender, tasks, **kwargs):
+            received.extend(task.title for task in tasks)
+        signal.connect(receiver, weak=False)
+        self.addCleanup(signal.disconnect, receiver)
+        return received
+
+    def test_sweep_walks_only_newly_due_tasks(self):
+        overdue, due_soon = self.collect(task_overdue), self.collect(task_due_soon)
+        # Take the counters from before "Late" fell due.
+        TaskList.objects.recount(now=self.now - timezone.timedelta(hours=3))
+
+        self.assertEqual(due.sweep(now=self.now), {due.OVERDUE: 1, due.DUE_SOON: 1})
+        self.assertEqual((overdue, due_soon), (["Late"], ["Soon"]))
+        self.work.refresh_from_db()
+        self.assertEqual(self.work.overdue_count, 1)
+        self.assertEqual(HighWaterMark.objects.get(name=due.OVERDUE).value, self.now)
+
+        # Nothing new: the next run reads nothing and counts nothing twice.
+        self.assertEqual(due.sweep(now=self.now + timezone.timedelta(minutes=5)), {due.OVERDUE: 0, due.DUE_SOON: 0})
+        later = self.now + timezone.timedelta(hours=4)
+        self.assertEqual(due.sweep(now=later), {due.OVERDUE: 1, due.DUE_SOON: 0})
+        self.assertEqual(overdue, ["Late", "Soon"])
+        self.work.refresh_from_db()
+        self.assertEqual(self.work.overdue_count, 2)
+
+    def test_completing_between_sweeps_keeps_counts_exact(self):
+        due.sweep(now=self.now)
+        self.soon.completed = True
+        self.soon.save()
+        due.sweep(now=self.now + timezone.timedelta(hours=4))
+        out = StringIO()
+        call_command('recount', '--dry-run', stdout=out)
+        self.assertIn("0 task list(s) out of date", out.getvalue())
+
+    def test_dry_run_recount_ignores_tasks_due_since_the_sweep(self):
+        # Counters exact as of a sweep before "Late" fell due.
+        TaskList.objects.recount(now=self.now - timezone.timedelta(hours=3))
+        out = StringIO()
+        call_command('recount', '--dry-run', stdout=out)
+        self.assertIn("0 task list(s) out of date, 1 with tasks due since their last sweep", out.getvalue())
+        self.assertIn("Work (#%d): 1 task(s) due since" % self.work.pk, out.getvalue())
+        self.assertIn("overdue_count 0 -> 1", out.getvalue())
+        self.work.refresh_from_db()
+        self.assertEqual(self.work.overdue_count, 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sweep_due_tasks', '--hours', '6', stdout=out)
+        self.assertIn("became due within 6 hour(s)", out.getvalue())
+
+
+class ReorderTaskTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.a, self.b, self.c = (Task.objects.create(title=title, task_list=self.work) for title in "abc")
+
+    def titles(self, task_list):
+        return [task.title for task in task_list.tasks.order_by('order', 'id')]
+
+    def test_new_tasks_are_appended_with_gaps(self):
+        self.assertEqual([self.a.order, self.b.order, self.c.order], [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP])
+        added = Task.objects.bulk_create([Task(title="d", task_list=self.work)])
+        self.assertEqual(added[0].order, 4 * ORDER_GAP)
+
+    def test_move_writes_only_the_moved_task(self):
+        # Both tasks, the neighbour lookup (two index seeks) and one UPDATE, in a savepoint.
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse('task_reorder', args=[self.c.pk]), {'before': self.a.pk})
+        self.assertEqual(response.json(), {'id': self.c.pk, 'order': (ORDER_GAP - 1) // 2, 'rebalanced': 0})
+        self.assertEqual(self.titles(self.work), ["c", "a", "b"])
+
+        ordering.move(self.c, after=self.b)
+        self.assertEqual(self.titles(self.work), ["a", "b", "c"])
+        self.assertEqual(self.c.order, 3 * ORDER_GAP)
+
+    def test_task_cannot_be_its_own_anchor(self):
+        for anchor in ('before', 'after'):
+            with self.assertNumQueries(2):
+                response = self.client.post(reverse('task_reorder', args=[self.b.pk]), {anchor: self.b.pk})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['errors']['__all__'], ["A task cannot be placed before or after itself."])
+        self.assertEqual(Task.objects.get(pk=self.b.pk).order, 2 * ORDER_GAP)
+        with self.assertRaises(ValueError):
+            ordering.move(self.b, after=self.b)
+
+    def test_rebalances_when_keys_run_out(self):
+        Task.objects.filter(pk=self.b.pk).update(order=self.a.order + 1)
+        self.b.refresh_from_db()
+        self.assertEqual(ordering.move(self.c, after=self.a), 2)
+        self.assertEqual(self.titles(self.work), ["a", "c", "b"])
+        orders = list(self.work.tasks.order_by('order').values_list('order', flat=True))
+        self.assertEqual(len(set(orders)), 3)
+        self.assertGreaterEqual(min(b - a for a, b in zip(orders, orders[1:])), ordering.MIN_SPACING)
+
+    def test_many_moves_into_the_same_gap_keep_order(self):
+        moved = [Task.objects.create(title=f"m{i}", task_list=self.work) for i in range(30)]
+        for task in moved:
+            ordering.move(task, before=self.b)
+        self.assertEqual(self.titles(self.work), ["a"] + [task.title for task in moved] + ["b", "c"])
+
+    def test_move_into_another_list_updates_counters(self):
+        home = TaskList.objects.create(name="Home")
+        chores = Task.objects.create(title="chores", task_list=home)
+        ordering.move(self.a, before=chores)
+        self.assertEqual(self.titles(home), ["a", "chores"])
+        self.work.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((self.work.open_count, home.open_count), (2, 2))
+
+    def test_requires_exactly_one_anchor(self):
+        url = reverse('task_reorder', args=[self.a.pk])
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.post(url, {'before': self.b.pk, 'after': self.c.pk}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('task_reorder', args=[0]), {'before': self.b.pk}).status_code, 404)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.now = timezone.now()
+        self.old = [
+            Task.objects.create(title=f"Old {i}", task_list=self.work, completed=True) for i in range(5)
+        ]
+        Task.objects.filter(pk__in=[task.pk for task in self.old]).update(
+            completed_at=self.now - timezone.timedelta(days=200)
+        )
+        self.recent = Task.objects.create(title="Recent", task_list=self.work, completed=True)
+        self.open = Task.objects.create(title="Open", task_list=self.work)
+
+    def test_archives_old_completed_tasks_in_chunks(self):
+        before = archive.cutoff(90, now=self.now)
+        self.assertEqual(archive.archive_tasks(before, chunk_size=2), 5)
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ["Open", "Recent"])
+        self.assertEqual(TaskArchive.objects.count(), 5)
+        self.assertEqual(search_tasks("old", 10).object_list, [])
+        self.work.refresh_from_db()
+        self.assertEqual((self.work.open_count, self.work.completed_count), (1, 1))
+
+    def test_restore_keeps_id_and_created_at(self):
+        task = self.old[0]
+        archive.archive_tasks(archive.cutoff(90, now=self.now))
+        response = self.client.post(reverse('task_restore', args=[task.pk]))
+        self.assertRedirects(response, reverse('task_archive'))
+        restored = Task.objects.get(pk=task.pk)
+        self.assertEqual((restored.title, restored.created_at, restored.completed), (task.title, task.created_at, True))
+        self.assertEqual(restored.completed_at, self.now - timezone.timedelta(days=200))
+        self.assertFalse(TaskArchive.objects.filter(pk=task.pk).exists())
+        self.work.refresh_from_db()
+        self.assertEqual(self.work.completed_count, 2)
+        self.assertEqual(self.client.post(reverse('task_restore', args=[task.pk])).status_code, 404)
+
+    def test_archive_view(self):
+        archive.archive_tasks(archive.cutoff(90, now=self.now))
+        response = self.client.get(reverse('task_archive'), {'task_list': self.work.pk})
+        self.assertEqual(len(response.context['tasks']), 5)
+        self.assertContains(response, "Restore", count=5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_tasks', '--older-than', '90', '--dry-run', stdout=out)
+        self.assertIn("5 task(s) completed before", out.getvalue())
+        self.assertEqual(TaskArchive.objects.count(), 0)
+        call_command('archive_tasks', '--older-than', '90', stdout=out)
+        self.assertIn("Archived 5 task(s)", out.getvalue())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.task = Task.objects.create(title="Write report", task_list=self.work)
+        self.other = Task.objects.create(title="Call Bob")
+
+    def later(self, seconds=1):
+        """A sync time at which everything written so far has settled."""
+        return timezone.now() + sync.SETTLE + timezone.timedelta(seconds=seconds)
+
+    def test_first_sync_returns_everything(self):
+        page = sync.changes(now=self.later())
+        self.assertEqual([t['id'] for t in page['tasks']], [self.task.pk, self.other.pk])
+        self.assertEqual(page['task_lists'][0]['name'], "Work")
+        self.assertEqual(page['deleted'], {'tasks': [], 'task_lists': []})
+        self.assertFalse(page['has_more'])
+
+    def test_recent_writes_wait_until_settled(self):
+        self.assertEqual(sync.changes()['tasks'], [])
+
+    def test_next_sync_returns_only_changes(self):
+        cursor = sync.changes(now=self.later())['cursor']
+        self.task.title = "Write the report"
+        self.task.save()
+        page = sync.changes(cursor, now=self.later(2))
+        self.assertEqual([(t['id'], t['title']) for t in page['tasks']], [(self.task.pk, "Write the report")])
+        self.assertEqual(page['task_lists'], [])
+        page = sync.changes(page['cursor'], now=self.later(2))
+        self.assertEqual((page['tasks'], page['task_lists']), ([], []))
+
+    def test_deletions_are_sent_as_tombstones(self):
+        cursor = sync.changes()['cursor']
+        self.client.post(reverse('task_delete', args=[self.other.pk]))
+        work_pk = self.work.pk
+        self.work.delete()
+        page = sync.changes(cursor, now=self.later())
+        self.assertEqual(page['deleted'], {'tasks': [self.other.pk, self.task.pk], 'task_lists': [work_pk]})
+        self.assertEqual(page['tasks'], [])
+
+    def test_bulk_deletes_write_tombstones_in_one_statement(self):
+        Task.objects.bulk_create(Task(title=f"Task {i}", task_list=self.work) for i in range(200))
+        # counters, the tasks (for their signals), 3 DELETEs of 100 ids, tombstones
+        with self.assertNumQueries(6):
+            Task.objects.filter(task_list=self.work).delete()
+        self.assertEqual(Tombstone.objects.filter(model=Tombstone.TASK).count(), 201)
+        Task.objects.bulk_create(Task(title=f"Task {i}", task_list=self.work) for i in range(200))
+        # its tasks, DELETEs of its archived tasks, the list and 2x100 tasks, tombstones
+        with self.assertNumQueries(6):
+            self.work.delete()
+        self.assertEqual(Tombstone.objects.count(), 402)
+
+    def test_pages_until_caught_up(self):
+        Task.objects.bulk_create(Task(title=f"Task {i}") for i in range(5))
+        cursor, seen, now = None, [], self.later()
+        while True:
+            page = sync.changes(cursor, limit=3, now=now)
+            seen += [t['id'] for t in page['tasks']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, list(Task.objects.order_by('updated_at', 'id').values_list('pk', flat=True)))
+
+    def test_expired_cursor(self):
+        cursor = sync.changes(now=self.later())['cursor']
+        with self.assertRaises(sync.CursorExpired):
+            sync.changes(cursor, now=self.later() + timezone.timedelta(days=sync.TOMBSTONE_DAYS + 1))
+        Tombstone.objects.create(model=Tombstone.TASK, object_id=1, deleted_at=timezone.now() - timezone.timedelta(days=100))
+        self.assertEqual(sync.prune_tombstones(), 1)
+
+    def test_view(self):
+        response = self.client.get(reverse('task_changes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'task_lists', 'tasks', 'deleted', 'cursor', 'has_more'})
+        self.assertEqual(self.client.get(reverse('task_changes'), {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('task_changes'), {'cursor': 'bogus'}).status_code, 404)
+
+
+class QueryCountTests(TestCase):
+    """
+    Lock in the number of queries per view on a seeded dataset, so an N+1
+    (a query per task or per list) fails the suite.
+
+    Cursor pages read one query per keyset tier until the page is full, so
+    their counts depend on the seeded data rather than on the page size.
+    """
+    EXPECTED = {
+        'task_list': 2,  # tasks + sidebar lists
+        'task_create': 1,  # TaskList choices
+        'task_update': 2,  # task + TaskList choices
+        'task_delete': 1,
+        'task_toggle': 2,  # list counters + task
+        'task_export': 1,
+        'task_search': 0,  # no query given
+        'task_due': 1,
+        'task_archive': 1,
+        'task_list_fragment': 1,
+        'cache_stats': 0,
+        'task_feed': 0,  # 204 outside ASGI
+        'task_list (next)': 3,
+        'task_list (previous)': 5,
+        'task_list_fragment (next)': 4,
+        'task_list_fragment (previous)': 5,
+        'task_export (task list)': 2,  # list + tasks
+        'task_due (next)': 2,
+        'task_due (previous)': 3,
+        'task_search (query)': 1,
+        'task_search (next)': 1,
+        'task_archive (task list)': 2,  # list + tasks
+        'task_archive (next)': 2,
+        'task_archive (task list, next)': 3,
+        'task_changes': 2,  # lists + tasks; no tombstones on a first sync
+        'task_changes (next)': 6,  # two keyset tiers per stream
+        'job_list': 1,
+        'job_status': 1,
+        'job_download': 1,  # 404: the export file was never written
+    }
+    POST = {
+        'task_reorder': 7,
+        'task_bulk': 4,  # savepoint + counters + tasks + release
+        'task_restore': 9,  # ids + savepoint + archive rows + insert + counters (2) + created_at + delete + release
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_tasks', '300', '--lists', '5', stdout=StringIO())
+        Job.objects.create(kind=jobs.EXPORT, status=Job.SUCCEEDED, result={'file': 'tasks-1.ndjson'})
+
+    def test_get_views(self):
+        for label, path in view_requests(sample_task()):
+            if label in self.POST:
+                continue
+            with self.subTest(label), self.assertNumQueries(self.EXPECTED[label]):
+                response = self.client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, {'task_toggle': 302, 'task_feed': 204, 'job_download': 404}.get(label, 200))
+
+    def test_post_views(self):
+        task = sample_task()
+        other = Task.objects.filter(task_list_id=task.task_list_id).exclude(pk=task.pk).first()
+        ids = list(Task.objects.filter(task_list_id=task.task_list_id).values_list('pk', flat=True)[:100])
+        with self.assertNumQueries(self.POST['task_reorder']):
+            self.client.post(reverse('task_reorder', args=[task.pk]), {'before': other.pk})
+        with self.assertNumQueries(self.POST['task_bulk']):
+            self.client.post(reverse('task_bulk'), {'action': 'complete', 'ids': ids})
+        archive.archive_tasks(timezone.now())
+        archived = TaskArchive.objects.first()
+        with self.assertNumQueries(self.POST['task_restore']):
+            self.client.post(reverse('task_restore', args=[archived.pk]))
+
+
+class SeedTasksTests(TestCase):
+    def test_created_at_spreads_over_the_past_year(self):
+        call_command('seed_tasks', '200', '--lists', '3', stdout=StringIO())
+        created = Task.objects.aggregate(oldest=Min('created_at'), newest=Max('created_at'))
+        self.assertGreater(created['newest'] - created['oldest'], timezone.timedelta(days=180))
+        self.assertFalse(Task.objects.filter(completed_at__lt=F('created_at')).exists())
+
+
+class LiveFeedTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.task = Task.objects.create(title="Watched", task_list=self.work)
+        self.start = feed.broker.last_id
+
+    def events(self):
+        return [event for _, event in feed.broker.since(self.start)]
+
+    def test_saves_publish_only_changed_fields(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=self.task.pk)
+            task.title = "Renamed"
+            task.save()
+            task.save()  # nothing changed: no event
+            Task.objects.create(title="New", task_list=self.work)
+        update, create = self.events()
+        self.assertEqual(update, {'op': 'update', 'id': task.pk, 'task_list_id': self.work.pk, 'fields': {'title': "Renamed"}})
+        self.assertEqual((create['op'], create['fields']['title']), ('create', "New"))
+
+    def test_nothing_is_published_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(reverse('task_toggle', args=[self.task.pk]))
+        self.assertEqual(self.events(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('task_toggle', args=[self.task.pk]))
+        self.assertEqual(self.events(), [{'op': 'toggle', 'id': self.task.pk}])
+
+    def test_cascade_deletes_and_bulk_actions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.bulk_create([Task(title="Other", task_list=self.work)])
+            Task.objects.filter(task_list=self.work).reprioritize(Task.PRIORITY_HIGH)
+            self.client.post(reverse('task_bulk'), {'action': 'complete', 'filter_task_list': self.work.pk})
+            self.work.delete()
+        # The CASCADE sends one reload, not a delete per task.
+        self.assertEqual(self.events(), [{'op': 'reload'}] * 2)
+
+    def test_bulk_deletes_publish_one_reload(self):
+        Task.objects.bulk_create(Task(title=f"Task {i}", task_list=self.work) for i in range(feed.BUFFER_SIZE + 10))
+        Task.objects.filter(task_list=self.work).update(
+            completed=True, completed_at=timezone.now() - timezone.timedelta(days=1),
+        )
+        self.start = feed.broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_tasks(timezone.now(), chunk_size=600)
+        self.assertEqual(self.events(), [{'op': 'reload'}] * 2)  # one per chunk
+        Task.objects.bulk_create(Task(title=f"Left {i}", task_list=self.work) for i in range(3))
+        self.start = feed.broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('task_bulk'), {'action': 'delete', 'filter_task_list': self.work.pk})
+        self.assertEqual(self.events(), [{'op': 'reload'}])
+
+    def test_single_delete_is_still_published(self):
+        pk = self.task.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+        self.assertEqual(self.events(), [{'op': 'delete', 'id': pk, 'task_list_id': self.work.pk}])
+
+    def test_list_filter_and_reset(self):
+        home = TaskList.objects.create(name="Home")
+        broker = feed.Broker(size=2)
+        for event in ({'op': 'delete', 'id': 1, 'task_list_id': home.pk},
+                      {'op': 'update', 'id': 2, 'task_list_id': home.pk, 'previous_task_list_id': self.work.pk},
+                      {'op': 'toggle', 'id': 3}):
+            broker.publish(event)
+        self.assertIsNone(broker.since(0))
+        self.assertEqual([event['id'] for _, event in broker.since(1) if feed._concerns(event, self.work.pk)], [2, 3])
+
+    def test_one_publish_wakes_every_subscriber(self):
+        broker = feed.Broker()
+
+        async def subscribers(count):
+            waiting = [asyncio.ensure_future(broker.wait(0, timeout=5)) for _ in range(count)]
+            await asyncio.sleep(0)
+            threading.Thread(target=broker.publish, args=({'op': 'reload'},)).start()
+            return await asyncio.gather(*waiting)
+
+        self.assertEqual(asyncio.run(subscribers(2000)), [True] * 2000)
+
+    async def test_stream(self):
+        request = RequestFactory().get(reverse('task_feed'), {'task_list': self.work.pk})
+        response = await async_views.task_feed(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertIn(b"retry:", await anext(chunks))
+        feed.broker.publish({'op': 'toggle', 'id': self.task.pk})
+        self.assertEqual(
+            await asyncio.wait_for(anext(chunks), 5),
+            f'id: {feed.broker.last_id}\nevent: toggle\ndata: {{"op":"toggle","id":{self.task.pk}}}\n\n'.encode(),
+        )
+
+
+class ToggleTaskTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(title="Toggle me")
+
+    def test_toggle_is_a_single_update(self):
+        """Toggling issues one UPDATE of the task and one of its list's counters, and no SELECT."""
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('task_toggle', args=[self.task.pk]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_toggle_sets_and_clears_completed_at(self):
+        """completed_at follows completed exactly as Task.save() does."""
+        Task.objects.filter(pk=self.task.pk).toggle()
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.completed)
+        self.assertIsNotNone(self.task.completed_at)
+
+        Task.objects.filter(pk=self.task.pk).toggle()
+        self.task.refresh_from_db()
+        self.assertFalse(self.task.completed)
+        self.assertIsNone(self.task.completed_at)
+
+    def test_toggle_missing_task_returns_404(self):
+        response = self.client.post(reverse('task_toggle', args=[self.task.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkTaskTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.home = TaskList.objects.create(name="Home")
+        self.tasks = Task.objects.bulk_create(
+            Task(title=f"Task {i}", task_list=self.work) for i in range(600)
+        )
+        self.ids = [task.pk for task in self.tasks]
+
+    def post(self, **data):
+        return self.client.post(reverse('task_bulk'), data)
+
+    def test_complete_by_ids_in_batches(self):
+        """600 ids are completed in two batches and get completed_at stamped."""
+        with self.assertNumQueries(6):  # savepoint + 2 x (counters + tasks) + release
+            response = self.post(action='complete', ids=','.join(map(str, self.ids)))
+        self.assertEqual(response.json()['count'], 600)
+        self.assertFalse(Task.objects.filter(completed=False).exists())
+        self.assertFalse(Task.objects.filter(completed_at__isnull=True).exists())
+
+    def test_reopen_by_filter_clears_completed_at(self):
+        Task.objects.complete()
+        response = self.post(action='reopen', filter_task_list=self.work.pk)
+        self.assertEqual(response.json()['count'], 600)
+        self.assertFalse(Task.objects.filter(completed_at__isnull=False).exists())
+
+    def test_move_and_reprioritize(self):
+        self.post(action='move', ids=self.ids[:10], task_list=self.home.pk)
+        self.assertEqual(self.home.tasks.count(), 10)
+        self.post(action='reprioritize', filter_task_list=self.home.pk, priority=Task.PRIORITY_HIGH)
+        self.assertEqual(Task.objects.filter(priority=Task.PRIORITY_HIGH).count(), 10)
+
+    def test_delete_with_ids_and_filter(self):
+        """Ids are narrowed by filters rather than widened."""
+        Task.objects.filter(pk__in=self.ids[:5]).update(task_list=self.home)
+        response = self.post(action='delete', ids=self.ids[:20], filter_task_list=self.home.pk)
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(Task.objects.count(), 595)
+
+    def test_requires_a_selector(self):
+        response = self.post(action='complete')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(completed=True).exists())
+
+    def test_admin_move_action(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        self.client.post(reverse('admin:todos_task_changelist'), {
+            'action': 'move_to_list',
+            '_selected_action': self.ids[:3],
+            'task_list': self.home.pk,
+        })
+        self.assertEqual(self.home.tasks.count(), 3)
+
+    def test_admin_move_action_requires_a_list(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        response = self.client.post(reverse('admin:todos_task_changelist'), {
+            'action': 'move_to_list',
+            '_selected_action': self.ids[:3],
+        }, follow=True)
+        self.assertContains(response, "Choose a list first.")
+        self.assertEqual(self.work.tasks.count(), 600)
+
+
+class TaskAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.work = TaskList.objects.create(name="Work")
+        Task.objects.bulk_create(Task(title=f"Task {i}", task_list=cls.work) for i in range(30))
+        Task.objects.create(title="Overdue report", due_date=timezone.now() - timezone.timedelta(days=1))
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.client.login(username='admin', password='admin')
+
+    def test_count_is_capped(self):
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 10):
+            self.assertEqual(EstimatedCountPaginator(Task.objects.filter(task_list=self.work), 5).count, 10)
+            # Unfiltered, without statistics yet, then with them.
+            self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 5).count, 10)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE todos_task')
+            self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 5).count, 31)
+        self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 5).count, 31)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:todos_task_changelist')
+        # session, user, count, tasks joined with their list, and the lists
+        # for the task_list filter and the action form.
+        for params in ({}, {'completed__exact': 0}, {'due': 'overdue'}, {'task_list__id__exact': self.work.pk}, {'q': 'report'}):
+            with self.subTest(params), self.assertNumQueries(6):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get(url, {'q': 'report'}), "Overdue report")
+        self.assertNotContains(self.client.get(url, {'due': 'overdue'}), "Task 1<")
+
+    def test_task_list_autocomplete(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'todos', 'model_name': 'task', 'field_name': 'task_list', 'term': 'wo',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ["Work"])
+
+    def test_task_list_changelist(self):
+        response = self.client.get(reverse('admin:todos_tasklist_changelist'))
+        self.assertContains(response, "Work")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        Task.objects.create(title="Write report", task_list=self.work, due_date=timezone.now())
+        Task.objects.create(title="Buy milk")
+
+    def test_ndjson_export_streams_all_tasks(self):
+        response = self.client.get(reverse('task_export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ["Write report", "Buy milk"])
+        self.assertEqual(rows[0]['task_list_name'], "Work")
+
+    def test_csv_export_filtered_by_task_list(self):
+        response = self.client.get(reverse('task_export'), {'format': 'csv', 'task_list': self.work.pk})
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['title'] for row in rows], ["Write report"])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('task_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_tasks', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class ImportTests(TestCase):
+    def test_import_round_trips_export(self):
+        """An NDJSON export imports back, reusing and creating TaskLists by name."""
+        work = TaskList.objects.create(name="Work")
+        Task.objects.create(title="Write report", task_list=work, completed=True)
+        Task.objects.create(title="Buy milk", priority=Task.PRIORITY_HIGH)
+        export_file = StringIO()
+        call_command('export_tasks', stdout=export_file)
+        lines = export_file.getvalue().splitlines()
+        lines.append(json.dumps({'title': "Call mum", 'task_list_name': "Home", 'completed': True}))
+        lines.append(json.dumps({"description": "no title"}))
+        lines.append("{not json")
+
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.write('\n'.join(lines))
+        self.addCleanup(os.unlink, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_tasks', f.name, '--batch-size', '2', stdout=out, stderr=err)
+
+        self.assertIn("Imported 3 task(s)", out.getvalue())
+        self.assertIn("Skipping record 4", err.getvalue())
+        self.assertIn("Skipping record 5", err.getvalue())
+        self.assertEqual(work.tasks.filter(title="Write report").count(), 2)
+        self.assertEqual(TaskList.objects.get(name="Home").tasks.get().title, "Call mum")
+        self.assertFalse(Task.objects.filter(completed=True, completed_at__isnull=True).exists())
+        self.assertEqual(Task.objects.filter(title="Buy milk", priority=Task.PRIORITY_HIGH).count(), 2)
+
+    def test_import_csv(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write("title,priority,completed,task_list_name\nA,High,false,Work\nB,3,1,\n")
+        self.addCleanup(os.unlink, f.name)
+        call_command('import_tasks', f.name, stdout=StringIO())
+        self.assertEqual(Task.objects.get(title="A").task_list.name, "Work")
+        self.assertIsNotNone(Task.objects.get(title="B").completed_at)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        self.task_list = TaskList.objects.create(name="Work")
+        self.task = Task.objects.create(title="Cached task", task_list=self.task_list)
+        page_cache.reset_stats()
+
+    def assert_cached_page_is_fresh(self):
+        response = self.client.get(reverse('task_list'))
+        self.assertContains(response, "Cached task")
+        with self.assertNumQueries(0):
+            self.client.get(reverse('task_list'))
+        self.assertEqual(page_cache.stats()['hits'], 1)
+
+        Task.objects.filter(pk=self.task.pk).update(title="Renamed task")
+        self.assertContains(self.client.get(reverse('task_list')), "Renamed task")
+
+        self.task.refresh_from_db()
+        self.task.title = "Saved task"
+        self.task.save()
+        self.assertContains(self.client.get(reverse('task_list')), "Saved task")
+
+        Task.objects.bulk_create([Task(title="Bulk task")])
+        self.assertContains(self.client.get(reverse('task_list')), "Bulk task")
+
+        self.task.delete()
+        self.assertNotContains(self.client.get(reverse('task_list')), "Saved task")
+
+    def test_locmem_cache(self):
+        self.assert_cached_page_is_fresh()
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.assert_cached_page_is_fresh()
+
+    def test_fragment_per_task_list(self):
+        Task.objects.create(title="Other list task", task_list=TaskList.objects.create(name="Home"))
+        url = reverse('task_list_fragment', args=[self.task_list.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Cached task")
+        self.assertNotContains(response, "Other list task")
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_stats_endpoint(self):
+        self.client.get(reverse('task_list'))
+        self.client.get(reverse('task_list'))
+        stats = self.client.get(reverse('cache_stats')).json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.task = Task.objects.create(title="Conditional task")
+
+    def test_list_etag_returns_304_without_queries(self):
+        response = self.client.get(reverse('task_list'))
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('task_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_write_changes_validators(self):
+        response = self.client.get(reverse('task_update', args=[self.task.pk]))
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.client.post(reverse('task_toggle', args=[self.task.pk]))
+        response = self.client.get(reverse('task_update', args=[self.task.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.get(
+            reverse('task_list'), HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            reverse('task_list'), HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class SqlitePragmaTests(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            original = cursor.fetchone()[0]
+        self.addCleanup(lambda: connection.cursor().execute(f'PRAGMA cache_size = {original}'))
+
+        with self.settings(SQLITE_PRAGMAS={'cache_size': -4321}):
+            apply_pragmas(sender=connection.__class__, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4321)
+
+
+class ProductionSettingsTests(TestCase):
+    def test_cache_is_shared_between_processes(self):
+        # In a subprocess: the production module updates the DATABASES it
+        # imports from todo_project.settings in place.
+        env = dict(os.environ, DJANGO_SECRET_KEY='test', DJANGO_SETTINGS_MODULE='todo_project.settings_production')
+        backend = subprocess.run(
+            [sys.executable, '-c', "from django.conf import settings; print(settings.CACHES['default']['BACKEND'])"],
+            env=env, capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+        self.assertNotIn('locmem', backend)
+        self.assertEqual(backend, 'django.core.cache.backends.filebased.FileBasedCache')
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.task_list = TaskList.objects.create(name="Work")
+        self.task = Task.objects.create(title="Async task", task_list=self.task_list)
+
+    async def test_asgi_requests_use_async_views(self):
+        response = await self.async_client.get(reverse('task_list'))
+        self.assertEqual(response.resolver_match.func, async_views.task_list)
+        self.assertContains(response, "Async task")
+
+    async def test_task_list_uses_the_async_cache_api(self):
+        backend = page_cache._cache()
+
+        class AsyncOnly:
+            def __getattr__(self, name):
+                if not (name.startswith('a') and hasattr(backend, name[1:])):
+                    raise AssertionError(f"sync cache.{name}() called from an async view")
+                return getattr(backend, name)
+
+        with mock.patch.object(page_cache, '_cache', AsyncOnly):
+            response = await self.async_client.get(reverse('task_list'))
+            self.assertContains(response, "Async task")
+            page_cache.reset_stats()
+            response = await self.async_client.get(reverse('task_list'))
+            self.assertEqual(page_cache._stats['hits'], 1)
+            response = await self.async_client.get(reverse('task_list'), headers={'If-None-Match': response['ETag']})
+            self.assertEqual(response.status_code, 304)
+
+    async def test_conditional_post_is_processed(self):
+        response = await self.async_client.get(reverse('task_update', args=[self.task.pk]))
+        etag = response['ETag']
+        response = await self.async_client.post(reverse('task_update', args=[self.task.pk]), {
+            'title': 'Renamed', 'priority': Task.PRIORITY_LOW, 'task_list': self.task_list.pk,
+        }, headers={'If-None-Match': etag, 'If-Match': '"stale"'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await Task.objects.aget(pk=self.task.pk)).title, 'Renamed')
+
+    async def test_toggle(self):
+        response = await self.async_client.post(reverse('task_toggle', args=[self.task.pk]))
+        self.assertEqual(response.status_code, 302)
+        task = await Task.objects.aget(pk=self.task.pk)
+        self.assertTrue(task.completed)
+        self.assertIsNotNone(task.completed_at)
+
+    async def test_create_update_delete(self):
+        response = await self.async_client.get(reverse('task_create'))
+        self.assertContains(response, "Work")
+        response = await self.async_client.post(reverse('task_create'), {
+            'title': 'Created async', 'priority': Task.PRIORITY_HIGH, 'task_list': self.task_list.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        created = await Task.objects.aget(title='Created async')
+
+        response = await self.async_client.post(reverse('task_update', args=[created.pk]), {
+            'title': 'Updated async', 'priority': Task.PRIORITY_LOW, 'completed': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        updated = await Task.objects.aget(pk=created.pk)
+        self.assertEqual(updated.title, 'Updated async')
+        self.assertIsNotNone(updated.completed_at)
+
+        response = await self.async_client.post(reverse('task_delete', args=[created.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await Task.objects.filter(pk=created.pk).aexists())
+
+    def test_wsgi_requests_keep_sync_views(self):
+        response = self.client.get(reverse('task_list'))
+        self.assertEqual(response.resolver_match.func.view_class, TaskListView)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        Task.objects.create(title="Measured", task_list=TaskList.objects.create(name="Work"))
+        metrics.reset()
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('todo_project.requests', 'INFO') as logs:
+            response = self.client.get(reverse('task_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status'], record['queries']), ('task_list', 200, 2))
+        self.assertGreater(record['template_ms'], 0)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_requests_are_sampled_with_sql(self):
+        with self.assertLogs('todo_project.requests', 'WARNING') as logs:
+            self.client.get(reverse('task_due'))
+        sample = json.loads(logs.records[0].getMessage())
+        self.assertIn('todos_task', sample['sql'][0]['sql'])
+        self.assertNotIn('params', sample['sql'][0])
+        self.assertEqual(metrics.snapshot()['slow'][0]['view'], 'task_due')
+
+    def test_metrics_endpoint(self):
+        for _ in range(3):
+            self.client.get(reverse('task_list'))
+        self.client.get('/no-such-page/')
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        views = self.client.get(reverse('request_metrics')).json()['views']
+        self.assertEqual(views['task_list']['count'], 3)
+        self.assertEqual(views['task_list']['mean_queries'], 2)
+        self.assertEqual(sum(views['task_list']['buckets'].values()), 3)
+        self.assertEqual(views['<unresolved>']['count'], 1)
+
+    async def test_async_views_are_measured(self):
+        response = await self.async_client.get(reverse('task_list'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReadReplicaTests(TransactionTestCase):
+    """The router against a real second SQLite file, refreshed by `replicate`."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after the test runner's checks and database setup, which
+        # would otherwise try to create a test database for it.
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        cls.databases = {'default', 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        Task.objects.create(title="Replicated")
+        call_command('replicate', stdout=StringIO())
+        Task.objects.create(title="Primary only")
+
+    def test_list_export_and_search_read_the_replica(self):
+        content = self.client.get(reverse('task_list')).content.decode()
+        self.assertIn("Replicated", content)
+        self.assertNotIn("Primary only", content)
+        export = b''.join(self.client.get(reverse('task_export')).streaming_content).decode()
+        self.assertNotIn("Primary only", export)
+        self.assertNotIn("Primary only", self.client.get(reverse('task_search'), {'q': 'primary'}).content.decode())
+        call_command('replicate', stdout=StringIO())
+        self.assertIn("Primary only", self.client.get(reverse('task_list')).content.decode())
+
+    def test_other_views_read_the_primary(self):
+        task = Task.objects.get(title="Primary only")
+        self.assertEqual(self.client.get(reverse('task_update', args=[task.pk])).status_code, 200)
+
+    def test_writers_read_their_writes(self):
+        response = self.client.post(reverse('task_create'), {'title': "Mine", 'priority': Task.PRIORITY_MEDIUM})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertIn("Mine", self.client.get(reverse('task_list')).content.decode())
+        export = b''.join(self.client.get(reverse('task_export')).streaming_content).decode()
+        self.assertIn("Mine", export)
+        # Export is not cached, so it shows which database each client reads.
+        export = b''.join(Client().get(reverse('task_export')).streaming_content).decode()
+        self.assertNotIn("Mine", export)
+        self.client.cookies[PIN_COOKIE] = '0'
+        export = b''.join(self.client.get(reverse('task_export')).streaming_content).decode()
+        self.assertNotIn("Mine", export)
+
+    def test_pages_read_soon_after_a_write_are_not_cached(self):
+        page_cache.reset_stats()
+        for _ in range(2):
+            self.assertNotIn('ETag', self.client.get(reverse('task_list')))
+        self.assertEqual(page_cache.stats()['hits'], 0)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.work = TaskList.objects.create(name="Work")
+        self.tasks = [Task.objects.create(title=f"Task {i}", task_list=self.work) for i in range(5)]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(JOBS_EXPORT_DIR=directory.name))
+
+    def register_flaky(self, failures):
+        calls = []
+
+        def flaky(job):
+            calls.append(job.attempts)
+            if len(calls) <= failures:
+                raise RuntimeError("flaky")
+            return {'calls': len(calls)}
+
+        jobs.register('test_flaky')(flaky)
+        self.addCleanup(jobs._kinds.pop, 'test_flaky')
+        return calls
+
+    def test_export_job_writes_a_downloadable_file(self):
+        response = self.client.post(reverse('job_list'), {'kind': jobs.EXPORT, 'format': 'csv'})
+        self.assertEqual(response.status_code, 202)
+        status_url = response['Location']
+        self.assertEqual(self.client.get(status_url).json()['status'], Job.QUEUED)
+
+        self.assertEqual(jobs.work(once=True), 1)
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], Job.SUCCEEDED)
+        self.assertEqual((status['done'], status['total']), (5, 5))
+        self.assertEqual(status['result']['rows'], 5)
+        response = self.client.get(reverse('job_download', args=[status['id']]))
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(sorted(row['title'] for row in rows), [task.title for task in self.tasks])
+
+    def test_background_bulk_action_runs_in_the_worker(self):
+        response = self.client.post(reverse('task_bulk'), {
+            'action': 'complete', 'ids': [task.pk for task in self.tasks[:3]], 'background': 'on',
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Task.objects.filter(completed=True).count(), 0)
+
+        call_command('run_workers', '--once', stdout=StringIO())
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'action': 'complete', 'count': 3})
+        self.assertEqual(Task.objects.filter(completed=True).count(), 3)
+        self.work.refresh_from_db()
+        self.assertEqual(self.work.completed_count, 3)
+
+    def test_background_bulk_action_keeps_only_form_fields(self):
+        response = self.client.post(reverse('task_bulk'), {
+            'action': 'complete', 'ids': self.tasks[0].pk, 'background': 'on', 'kind': 'export', 'extra': 'x',
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().params, {'data': {'action': ['complete'], 'ids': [str(self.tasks[0].pk)]}})
+
+    def test_background_bulk_action_on_a_filter_walks_every_task(self):
+        with mock.patch('todos.bulk.BATCH_SIZE', 2):
+            self.client.post(reverse('task_bulk'), {'action': 'complete', 'filter_completed': 'false', 'background': 'on'})
+            jobs.work(once=True)
+        job = Job.objects.get()
+        self.assertEqual((job.done, job.total, job.result['count']), (5, 5, 5))
+        self.assertFalse(Task.objects.filter(completed=False).exists())
+
+    def test_failed_job_is_retried_after_a_backoff(self):
+        calls = self.register_flaky(failures=1)
+        job = jobs.enqueue('test_flaky')
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: flaky", job.error)
+        self.assertGreater(job.run_after, timezone.now() + timezone.timedelta(seconds=jobs.RETRY_DELAY - 5))
+        # Not due yet.
+        self.assertEqual(jobs.work(once=True), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result, job.error), (Job.SUCCEEDED, 2, {'calls': 2}, ''))
+        self.assertEqual(calls, [1, 2])
+
+    def test_job_fails_after_its_last_attempt(self):
+        self.register_flaky(failures=5)
+        job = jobs.enqueue('test_flaky')
+        for _ in range(job.max_attempts):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, job.max_attempts))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claim_takes_a_job_once(self):
+        job = jobs.enqueue(jobs.RECOUNT)
+        self.assertEqual(jobs.claim('a').pk, job.pk)
+        self.assertIsNone(jobs.claim('b'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.RUNNING, 'a', 1))
+
+    def test_stale_jobs_are_requeued(self):
+        job = jobs.enqueue(jobs.RECOUNT)
+        jobs.claim('gone')
+        Job.objects.update(heartbeat_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 2))
+
+    def test_archive_job_reports_progress(self):
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:2]]).update(
+            completed=True, completed_at=timezone.now() - timezone.timedelta(days=60),
+        )
+        job = jobs.enqueue(jobs.ARCHIVE, older_than=30)
+        jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.done, job.total, job.result), (Job.SUCCEEDED, 2, 2, {'archived': 2}))
+        self.assertEqual(TaskArchive.objects.count(), 2)
+
+    def test_import_in_the_background(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as source:
+            source.write(json.dumps({'title': "Imported", 'task_list': "Work"}) + "\n")
+        self.addCleanup(os.unlink, source.name)
+        output = StringIO()
+        call_command('import_tasks', source.name, '--background', stdout=output)
+        self.assertIn("Queued import job", output.getvalue())
+        self.assertFalse(Task.objects.filter(title="Imported").exists())
+        jobs.work(once=True)
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+        self.assertEqual(Task.objects.get(title="Imported").task_list, self.work)
+
+    def test_invalid_job_request(self):
+        response = self.client.post(reverse('job_list'), {'kind': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('kind', response.json()['errors'])
+        self.assertFalse(Job.objects.exists())
@@ -7,4 +7,18 @@ urlpatterns = [
     path('update/<int:pk>/', views.TaskUpdateView.as_view(), name='task_update'),
     path('delete/<int:pk>/', views.TaskDeleteView.as_view(), name='task_delete'),
     path('toggle/<int:pk>/', views.toggle_task, name='task_toggle'),
+    path('reorder/<int:pk>/', views.reorder_task, name='task_reorder'),
+    path('bulk/', views.bulk_tasks, name='task_bulk'),
+    path('export/', views.export_tasks, name='task_export'),
+    path('search/', views.task_search, name='task_search'),
+    path('due/', views.due_tasks, name='task_due'),
+    path('archive/', views.archived_tasks, name='task_archive'),
+    path('archive/<int:pk>/restore/', views.restore_task, name='task_restore'),
+    path('lists/<int:list_pk>/fragment/', views.TaskListFragmentView.as_view(), name='task_list_fragment'),
+    path('feed/', views.task_feed, name='task_feed'),
+    path('changes/', views.task_changes, name='task_changes'),
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
 ]
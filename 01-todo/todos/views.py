@@ -1,16 +1,133 @@
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from .models import Task
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from todo_project import routers
+from . import archive, cache, due, export, feed, jobs, ordering, search, sync
+from .forms import BulkTaskForm, JobForm, ReorderTaskForm
+from .models import Job, Task, TaskArchive, TaskList
+from .pagination import InvalidCursor, KeysetPaginator
+
+def replica_may_lag():
+    """
+    Whether this request reads from a replica that may not have the latest
+    write yet. Such pages are neither cached nor given validators, or they
+    would be served as current after the replica caught up.
+    """
+    return routers.reading_replica() and (
+        cache.last_modified() > timezone.now() - timedelta(seconds=routers.replica_lag())
+    )
+
+async def areplica_may_lag():
+    return routers.reading_replica() and (
+        await cache.alast_modified() > timezone.now() - timedelta(seconds=routers.replica_lag())
+    )
+
+def _data_etag(request, *args, **kwargs):
+    if replica_may_lag():
+        return None
+    return f'v{cache.get_version()}'
+
+def _data_last_modified(request, *args, **kwargs):
+    if replica_may_lag():
+        return None
+    return cache.last_modified()
+
+def conditional_on_data(view):
+    """
+    Answer If-None-Match / If-Modified-Since from the cache version alone, so
+    a 304 costs no database query and no template rendering. no-cache makes
+    browsers revalidate instead of reusing a page heuristically.
+
+    For an async view the validators are read with the async cache API
+    first, since `condition` would call its functions on the event loop.
+    """
+    if iscoroutinefunction(view):
+        view = _aconditional_on_data(view)
+    else:
+        view = condition(etag_func=_data_etag, last_modified_func=_data_last_modified)(view)
+    return cache_control(no_cache=True)(view)
+
+def _aconditional_on_data(view):
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        etag = last_modified = None
+        if not await areplica_may_lag():
+            etag, last_modified = f'v{await cache.aget_version()}', await cache.alast_modified()
+        conditional = condition(
+            etag_func=lambda *args, **kwargs: etag,
+            last_modified_func=lambda *args, **kwargs: last_modified,
+        )(view)
+        return await conditional(request, *args, **kwargs)
+    return inner
+
+def sidebar_lists():
+    """Every TaskList with its task counts: one query, in name index order."""
+    return TaskList.objects.only('name', 'open_count', 'completed_count', 'overdue_count')
 
+@method_decorator(routers.use_replica, name='dispatch')
+@method_decorator(conditional_on_data, name='get')
 class TaskListView(ListView):
     model = Task
     template_name = 'todos/task_list.html'
     context_object_name = 'tasks'
+    ordering = ('completed', '-priority', 'due_date', 'id')
+    paginate_by = 50
+    sidebar = True
 
     def get_queryset(self):
-        return Task.objects.all().order_by('completed', '-priority', 'due_date')
+        return Task.objects.all().order_by(*self.ordering)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.sidebar:
+            context['task_lists'] = sidebar_lists()
+        return context
+
+    def get_cache_key(self):
+        return cache.make_key('page', self.request.GET.get('cursor', ''))
+
+    def get(self, request, *args, **kwargs):
+        """Serve the rendered page from the versioned cache when possible."""
+        key = self.get_cache_key()
+        content = cache.lookup(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.render()
+        if response.status_code == 200 and not replica_may_lag():
+            cache.store(key, response.content)
+        return response
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate with opaque `?cursor=` tokens instead of page numbers."""
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+class TaskListFragmentView(TaskListView):
+    """The tasks of one TaskList as an embeddable HTML fragment, in list order."""
+    template_name = 'todos/task_items.html'
+    ordering = ('-priority', 'due_date', 'order', 'id')
+    sidebar = False
+
+    def get_queryset(self):
+        return Task.objects.filter(task_list_id=self.kwargs['list_pk']).order_by(*self.ordering)
+
+    def get_cache_key(self):
+        return cache.make_key('fragment', self.kwargs['list_pk'], self.request.GET.get('cursor', ''))
 
 class TaskCreateView(CreateView):
     model = Task
@@ -18,6 +135,7 @@ class TaskCreateView(CreateView):
     fields = ['title', 'description', 'due_date', 'priority', 'task_list']
     success_url = reverse_lazy('task_list')
 
+@method_decorator(conditional_on_data, name='get')
 class TaskUpdateView(UpdateView):
     model = Task
     template_name = 'todos/task_form.html'
@@ -30,7 +148,170 @@ class TaskDeleteView(DeleteView):
     success_url = reverse_lazy('task_list')
 
 def toggle_task(request, pk):
-    task = get_object_or_404(Task, pk=pk)
-    task.completed = not task.completed
-    task.save()
+    if not Task.objects.filter(pk=pk).toggle():
+        raise Http404("No Task matches the given query.")
+    feed.task_toggled(pk)
     return redirect('task_list')
+
+def task_feed(request):
+    """
+    The live feed is served by `async_views.task_feed` under ASGI; a sync
+    worker cannot hold streams open. 204 tells EventSource not to reconnect.
+    """
+    return HttpResponse(status=204)
+
+@require_POST
+def reorder_task(request, pk):
+    """Move a task directly before or after another one, in manual order."""
+    task = get_object_or_404(Task, pk=pk)
+    form = ReorderTaskForm(request.POST, task=task)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    rebalanced = ordering.move(task, before=form.cleaned_data['before'], after=form.cleaned_data['after'])
+    return JsonResponse({'id': task.pk, 'order': task.order, 'rebalanced': rebalanced})
+
+@require_POST
+def bulk_tasks(request):
+    """
+    Apply one action to many tasks, selected by `ids` and/or filters; with
+    `background`, queue it as a job and answer 202 at once.
+    """
+    form = BulkTaskForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    if form.cleaned_data['background']:
+        # Only the form's own fields: anything else in the POST is not validated.
+        data = {name: request.POST.getlist(name) for name in form.fields if name != 'background' and name in request.POST}
+        return _job_accepted(jobs.enqueue(jobs.BULK, data=data))
+    count = form.save()
+    return JsonResponse({'action': form.cleaned_data['action'], 'count': count})
+
+@routers.use_replica
+def export_tasks(request):
+    """Stream every task (optionally one TaskList's) as NDJSON or CSV."""
+    format = request.GET.get('format', 'ndjson')
+    if format not in export.FORMATS:
+        return JsonResponse({'errors': {'format': [f"Choose one of: {', '.join(export.FORMATS)}."]}}, status=400)
+    task_list = None
+    if request.GET.get('task_list'):
+        task_list = get_object_or_404(TaskList, pk=request.GET['task_list'])
+    response = StreamingHttpResponse(
+        export.export_lines(format, task_list=task_list),
+        content_type=export.CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="tasks.{format}"'
+    return response
+
+@routers.use_replica
+def task_search(request):
+    """Tasks whose title or description match `?q=`, best matches first."""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = search.search_tasks(query, TaskListView.paginate_by, request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    return render(request, 'todos/task_search.html', {
+        'query': query,
+        'page_params': urlencode({'q': query}),
+        'tasks': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    })
+
+def due_tasks(request):
+    """Open tasks that are overdue or due within `?hours=` hours, soonest first."""
+    try:
+        hours = int(request.GET.get('hours', due.DUE_SOON_HOURS))
+    except ValueError:
+        hours = -1
+    if not 0 <= hours <= due.MAX_HOURS:
+        return JsonResponse({'errors': {'hours': [f"Enter a whole number from 0 to {due.MAX_HOURS}."]}}, status=400)
+    now = timezone.now()
+    paginator = KeysetPaginator(Task.objects.due_by(now + timedelta(hours=hours)), TaskListView.paginate_by)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    return render(request, 'todos/task_due.html', {
+        'hours': hours,
+        'now': now,
+        'page_params': urlencode({'hours': hours}),
+        'tasks': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    })
+
+def archived_tasks(request):
+    """Archived tasks (optionally one TaskList's), most recently completed first."""
+    tasks = TaskArchive.objects.order_by('-completed_at', '-id')
+    page_params = ''
+    if request.GET.get('task_list'):
+        task_list = get_object_or_404(TaskList, pk=request.GET['task_list'])
+        tasks = tasks.filter(task_list=task_list)
+        page_params = urlencode({'task_list': task_list.pk})
+    paginator = KeysetPaginator(tasks, TaskListView.paginate_by)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    return render(request, 'todos/task_archive.html', {
+        'page_params': page_params,
+        'tasks': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    })
+
+@require_POST
+def restore_task(request, pk):
+    if not archive.restore(TaskArchive.objects.filter(pk=pk)):
+        raise Http404("No archived Task matches the given query.")
+    return redirect('task_archive')
+
+def task_changes(request):
+    """
+    Tasks and TaskLists changed or deleted since `?cursor=` (everything
+    without one), as JSON for offline clients; see `todos.sync`.
+    """
+    try:
+        limit = int(request.GET.get('limit', sync.PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= sync.MAX_PAGE_SIZE:
+        return JsonResponse({'errors': {'limit': [f"Enter a whole number from 1 to {sync.MAX_PAGE_SIZE}."]}}, status=400)
+    try:
+        changes = sync.changes(request.GET.get('cursor'), limit)
+    except InvalidCursor:
+        raise Http404("Invalid cursor.")
+    except sync.CursorExpired:
+        return JsonResponse({'errors': {'cursor': ["Expired; sync again without a cursor."]}}, status=410)
+    return JsonResponse(changes)
+
+def _job_accepted(job):
+    response = JsonResponse(jobs.describe(job), status=202)
+    response['Location'] = reverse('job_status', args=[job.pk])
+    return response
+
+def job_list(request):
+    """GET: the most recent jobs. POST: queue a `JobForm` job (202, with its status URL)."""
+    if request.method == 'POST':
+        form = JobForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return _job_accepted(form.save())
+    return JsonResponse({'jobs': [jobs.describe(job) for job in Job.objects.order_by('-id')[:50]]})
+
+def job_status(request, pk):
+    """Status and progress of one background job."""
+    return JsonResponse(jobs.describe(get_object_or_404(Job, pk=pk)))
+
+def job_download(request, pk):
+    """The file written by a finished export job."""
+    job = get_object_or_404(Job, pk=pk, kind=jobs.EXPORT, status=Job.SUCCEEDED)
+    try:
+        return FileResponse(open(jobs.export_path(job), 'rb'), as_attachment=True, filename=job.result['file'])
+    except FileNotFoundError:
+        raise Http404("The export file is gone.")
+
+def cache_stats(request):
+    """Hit/miss counters of the rendered-page cache for this process."""
+    return JsonResponse(cache.stats())
@@ -0,0 +1,148 @@
+"""
+Heading-aware chunking of markdown documents for the search index.
+
+Indexing each file as one `content` string dilutes the score of a passage
+in a long page and leaves only the start of the file to preview. Instead,
+every file is split at its markdown headings (outside fenced code blocks),
+and sections longer than CHUNK_SIZE are split again at blank lines. A
+heading with no text of its own stays with the section after it, and YAML
+frontmatter is left out, its `title` heading the page. Each chunk keeps
+the file's `filename`, its `heading` path ("Page > Section") and its
+`start`/`end` character offsets in the file, which the index keeps as
+keyword fields.
+
+Search results are chunks; `collapse_by_file` keeps the best chunk of each
+file, so a long page still counts as one result.
+"""
+import re
+
+# Characters per chunk, at most (a single longer line is cut at this size).
+CHUNK_SIZE = 2000
+KEYWORD_FIELDS = ['filename', 'heading', 'start', 'end']
+# How many chunks to ask the index for per wanted file, before collapsing.
+CANDIDATES_PER_RESULT = 4
+
+HEADING = re.compile(r'^(#{1,6})[ \t]+(.*?)[ \t#]*$')
+TITLE = re.compile(r'^title:[ \t]*(.*?)[ \t]*$')
+FENCES = ('```', '~~~')
+
+
+def split_frontmatter(text):
+    """
+    Return (title, offset) for a YAML frontmatter block at the start of
+    `text`: its `title`, or None, and where the body after it starts.
+    Without frontmatter, returns (None, 0).
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[0].rstrip('\r\n') != '---':
+        return None, 0
+    title = None
+    offset = len(lines[0])
+    for line in lines[1:]:
+        offset += len(line)
+        if line.rstrip('\r\n') in ('---', '...'):
+            return title, offset
+        match = TITLE.match(line.rstrip('\r\n'))
+        if match and title is None:
+            title = match.group(1).strip('\'"') or None
+    # No closing line: not frontmatter after all.
+    return None, 0
+
+
+def split_sections(text):
+    """
+    Return (heading path, start, end) for each heading section of `text`.
+
+    Frontmatter is left out, its title heading the page unless a top-level
+    heading replaces it. A heading with no body of its own (say, followed
+    straight by a subheading) is kept in the section that follows it.
+    """
+    sections = []
+    page_title, start = split_frontmatter(text)
+    path = [(1, page_title)] if page_title else []  # (level, title) of the enclosing headings
+    offset = start
+    has_body = False
+    fence = None
+    for line in text[start:].splitlines(keepends=True):
+        stripped = line.strip()
+        match = None
+        if fence is not None:
+            if stripped.startswith(fence):
+                fence = None
+        elif stripped.startswith(FENCES):
+            fence = stripped[:3]
+        else:
+            match = HEADING.match(line.rstrip('\r\n'))
+            if match:
+                if has_body:
+                    sections.append((tuple(title for _, title in path), start, offset))
+                    start = offset
+                    has_body = False
+                level = len(match.group(1))
+                path = [heading for heading in path if heading[0] < level] + [(level, match.group(2))]
+        if stripped and not match:
+            has_body = True
+        offset += len(line)
+    if has_body or (not sections and offset > start):
+        sections.append((tuple(title for _, title in path), start, offset))
+    elif sections:
+        # Trailing headings without a body belong to the last section.
+        path, section_start, _ = sections.pop()
+        sections.append((path, section_start, offset))
+    return sections
+
+
+def split_size(text, start, end, size=CHUNK_SIZE):
+    """Split text[start:end] into (start, end) pieces of at most `size`, at blank lines where possible."""
+    pieces = []
+    while end - start > size:
+        # The last blank line (LF or CRLF) in range, cut after it.
+        cut, blank = max((text.rfind(blank, start + 1, start + size), blank) for blank in ('\n\n', '\n\r\n'))
+        if cut != -1:
+            cut += len(blank)
+        else:
+            cut = text.rfind('\n', start + 1, start + size)
+            cut = start + size if cut == -1 else cut + 1
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def chunk_document(doc, size=CHUNK_SIZE):
+    """Split a {'content', 'filename'} document into chunk documents."""
+    text = doc['content']
+    chunks = []
+    for path, section_start, section_end in split_sections(text):
+        for start, end in split_size(text, section_start, section_end, size):
+            content = text[start:end]
+            if not content.strip():
+                continue
+            chunks.append({
+                'content': content,
+                'filename': doc['filename'],
+                'heading': ' > '.join(path),
+                'start': start,
+                'end': end,
+            })
+    return chunks
+
+
+def collapse_by_file(index, query, num_results):
+    """
+    Search `index` (of chunks) and return the best chunk of each of the top
+    `num_results` files, asking for more chunks while one file takes up
+    too many of the candidates.
+    """
+    limit = num_results * CANDIDATES_PER_RESULT
+    while True:
+        chunks = index.search(query, num_results=limit)
+        best = {}
+        for chunk in chunks:
+            best.setdefault(chunk['filename'], chunk)
+            if len(best) == num_results:
+                return list(best.values())
+        if len(chunks) < limit:
+            # Every matching chunk has been seen.
+            return list(best.values())
+        limit *= 2
@@ -0,0 +1,192 @@
+"""
+On-disk snapshot of the documentation search index, reused across restarts.
+
+Fitting the minsearch index means reading and tokenizing every file in the
+corpus, on every start (and on every query of the search.py CLI). The
+snapshot, a pickle written next to the corpus directory, holds the fitted
+index, its documents and a manifest of the files they came from: path,
+size, mtime and SHA-256 of each one.
+
+On start the corpus is scanned against that manifest. A file whose size and
+mtime are unchanged keeps its recorded hash, so the check costs one stat per
+file; only files that look changed are read and hashed. The index is rebuilt
+only when the set of paths or their hashes differ, and then saved again.
+The snapshot is loaded with a single pickle.load (protocol 5), which copies
+the index's numpy buffers straight into memory instead of re-tokenizing.
+
+While a server runs, a `Watcher` thread polls the corpus with the same
+scan and reports which files changed or disappeared, so only those need to
+be read again.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import minsearch
+
+# Bump when the snapshot layout, or what the index is built from, changes.
+FORMAT = 3
+EXTENSIONS = ('.md', '.mdx')
+# Seconds between the Watcher's scans of the corpus.
+POLL_SECONDS = 2.0
+
+
+def snapshot_path(base_path):
+    """The snapshot file of the corpus at base_path: a sibling of the directory."""
+    base_path = Path(base_path)
+    return base_path.parent / f"{base_path.name}.index.pickle"
+
+
+def corpus_files(base_path):
+    """The files to index, in load_documents() order: every .md, then every .mdx."""
+    for extension in EXTENSIONS:
+        yield from Path(base_path).rglob(f"*{extension}")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan(base_path, previous=None):
+    """
+    Build the manifest of the corpus: {relative path: (size, mtime_ns, sha256)}.
+
+    Hashes are taken from `previous` (an earlier manifest) for files whose
+    size and mtime have not changed.
+    """
+    base_path = Path(base_path)
+    previous = previous or {}
+    manifest = {}
+    for file_path in corpus_files(base_path):
+        stat = file_path.stat()
+        name = str(file_path.relative_to(base_path))
+        known = previous.get(name)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = known[2]
+        else:
+            digest = file_hash(file_path)
+        manifest[name] = (stat.st_size, stat.st_mtime_ns, digest)
+    return manifest
+
+
+def _contents(manifest):
+    """What the index depends on: the paths and their hashes, not their stats."""
+    return {name: entry[2] for name, entry in manifest.items()}
+
+
+def diff(old, new):
+    """Return (changed, removed): paths added or edited in `new`, and paths gone from it."""
+    changed = [name for name, entry in new.items() if name not in old or old[name][2] != entry[2]]
+    removed = [name for name in old if name not in new]
+    return changed, removed
+
+
+def load(base_path):
+    """Return the saved snapshot dict, or None if there is no usable one."""
+    path = snapshot_path(base_path)
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable index snapshot {path}: {e}")
+        return None
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get('format') != FORMAT
+        or snapshot.get('minsearch') != getattr(minsearch, '__version__', None)
+    ):
+        return None
+    return snapshot
+
+
+def save(base_path, manifest, index, documents):
+    """Write the snapshot atomically. A read-only location only costs the next start a rebuild."""
+    path = snapshot_path(base_path)
+    snapshot = {
+        'format': FORMAT,
+        'minsearch': getattr(minsearch, '__version__', None),
+        'manifest': manifest,
+        'index': index,
+        'documents': documents,
+    }
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save index snapshot {path}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def load_or_build(base_path, build):
+    """
+    Return (index, documents, manifest) for the corpus at base_path: from
+    the snapshot if the corpus still matches its manifest, otherwise from
+    `build()`, a callable returning (index, documents), whose result is then
+    saved.
+    """
+    snapshot = load(base_path)
+    # Scanned before building, so a file changed during the build is seen
+    # as changed on the next start.
+    manifest = scan(base_path, snapshot and snapshot['manifest'])
+    if snapshot is not None and _contents(snapshot['manifest']) == _contents(manifest):
+        if snapshot['manifest'] != manifest:
+            # Touched but not changed: record the new stats so the next
+            # start does not hash these files again.
+            save(base_path, manifest, snapshot['index'], snapshot['documents'])
+        print(f"Loaded search index snapshot ({len(snapshot['documents'])} documents)")
+        return snapshot['index'], snapshot['documents'], manifest
+
+    index, documents = build()
+    save(base_path, manifest, index, documents)
+    return index, documents, manifest
+
+
+class Watcher(threading.Thread):
+    """
+    Polls the corpus every `interval` seconds and calls
+    ``on_change(manifest, changed, removed)`` when files were added, edited
+    or removed (see `diff`). A file that is only touched is not reported.
+
+    If `on_change` raises, the change is reported again on the next poll.
+    """
+
+    def __init__(self, base_path, manifest, on_change, interval=POLL_SECONDS):
+        super().__init__(name="index-watcher", daemon=True)
+        self.base_path = Path(base_path)
+        self.manifest = manifest
+        self.on_change = on_change
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Scan once and report any change. Returns whether there was one."""
+        try:
+            manifest = scan(self.base_path, self.manifest)
+            changed, removed = diff(self.manifest, manifest)
+            if changed or removed:
+                self.on_change(manifest, changed, removed)
+            self.manifest = manifest
+            return bool(changed or removed)
+        except Exception as e:
+            print(f"Error updating search index: {e}")
+            return False
+
+    def stop(self):
+        self._stopped.set()
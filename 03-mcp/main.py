@@ -4,12 +4,20 @@ from typing import Optional, List, Dict, Any
 from pathlib import Path
 from minsearch import Index
 import os
+import threading
+
+import chunking
+import index_cache
 
 mcp = FastMCP("Demo 🚀")
 
 # Global variables for search functionality
 _search_index = None
 _search_documents = None
+# Guards swapping the two above; searches take both under it, so they never
+# pair an index with the documents of another version.
+_search_lock = threading.Lock()
+_search_watcher = None
 
 def load_documents():
     """
@@ -18,9 +26,7 @@ def load_documents():
     a list of documents with content and filename fields.
     """
     documents = []
-    # Get absolute path relative to the script location
-    script_dir = Path(__file__).parent
-    base_path = script_dir / "fastmcp-main"
+    base_path = docs_path()
     
     if not base_path.exists():
         raise FileNotFoundError(f"Directory {base_path} not found. Make sure the zip file has been extracted.")
@@ -35,6 +41,10 @@ def load_documents():
     print(f"Loaded {len(documents)} documents")
     return documents
 
+def docs_path():
+    """The fastmcp-main directory, relative to the script location."""
+    return Path(__file__).parent / "fastmcp-main"
+
 def process_file(file_path, base_path):
     """Process a single file and return a document dictionary."""
     try:
@@ -54,38 +64,81 @@ def process_file(file_path, base_path):
 
 def create_search_index(documents):
     """
-    Create and fit a minsearch index with the documents.
-    Uses 'content' as the text field and 'filename' as a keyword field.
+    Create and fit a minsearch index with the documents, split into
+    heading-aware chunks (see chunking.py). Uses 'content' as the text field
+    and 'filename', 'heading', 'start' and 'end' as keyword fields.
     """
     # Filter out None values from processing errors
     valid_docs = [doc for doc in documents if doc is not None]
+    chunks = [chunk for doc in valid_docs for chunk in chunking.chunk_document(doc)]
     
-    if not valid_docs:
+    if not chunks:
         raise ValueError("No valid documents to index")
     
-    # Create the index with content as text field and filename as keyword field
+    # Create the index with content as text field and the chunk's location as keyword fields
     index = Index(
         text_fields=['content'],
-        keyword_fields=['filename']
+        keyword_fields=chunking.KEYWORD_FIELDS
     )
     
-    # Fit the index with the documents
-    index.fit(valid_docs)
+    # Fit the index with the chunks
+    index.fit(chunks)
     
-    print(f"Index created with {len(valid_docs)} documents")
+    print(f"Index created with {len(chunks)} chunks from {len(valid_docs)} documents")
     return index
 
-def initialize_search():
-    """Initialize the search index and documents globally."""
+def initialize_search(watch=True):
+    """
+    Initialize the search index and documents globally. With `watch`, a
+    background thread then keeps them up to date as the docs change.
+    """
+    global _search_index, _search_documents, _search_watcher
+    
+    with _search_lock:
+        if _search_index is None or _search_documents is None:
+            print("Initializing search index...")
+            
+            def build():
+                documents = load_documents()
+                return create_search_index(documents), documents
+            
+            # Reuses the on-disk snapshot unless the corpus has changed
+            _search_index, _search_documents, manifest = index_cache.load_or_build(docs_path(), build)
+            if watch:
+                _search_watcher = index_cache.Watcher(docs_path(), manifest, update_search)
+                _search_watcher.start()
+            print("Search initialization complete.")
+        
+        return _search_index, _search_documents
+
+def update_search(manifest, changed, removed):
+    """
+    Apply changed and removed files to the search index: only those files
+    are read again, the index is fitted off to the side and then swapped in
+    with the new documents at once, so searches in progress keep using the
+    previous version.
+    """
     global _search_index, _search_documents
     
-    if _search_index is None or _search_documents is None:
-        print("Initializing search index...")
-        _search_documents = load_documents()
-        _search_index = create_search_index(_search_documents)
-        print("Search initialization complete.")
+    base_path = docs_path()
+    with _search_lock:
+        current = _search_documents
+    documents = {doc['filename']: doc for doc in current if doc is not None}
+    for name in removed:
+        documents.pop(name, None)
+    for name in changed:
+        doc = process_file(base_path / name, base_path)
+        if doc is None:
+            documents.pop(name, None)
+        else:
+            documents[name] = doc
     
-    return _search_index, _search_documents
+    documents = list(documents.values())
+    index = create_search_index(documents)
+    with _search_lock:
+        _search_index, _search_documents = index, documents
+    index_cache.save(base_path, manifest, index, documents)
+    print(f"Search index updated: {len(changed)} changed, {len(removed)} removed")
 
 def _download_web_page_impl(url: str) -> str:
     """
@@ -183,7 +236,8 @@ def search_mcp_documentation(query: str, num_results: int = 5) -> str:
         num_results: Number of results to return (default: 5, max: 20)
     
     Returns:
-        Formatted search results with filenames and content previews
+        Formatted search results with filenames, section headings and previews
+        of the matching section
     """
     try:
         # Validate num_results
@@ -195,8 +249,8 @@ def search_mcp_documentation(query: str, num_results: int = 5) -> str:
         # Initialize search index and documents
         index, documents = initialize_search()
         
-        # Perform search
-        results = index.search(query, num_results=num_results)
+        # Perform search, keeping the best matching chunk of each file
+        results = chunking.collapse_by_file(index, query, num_results)
         
         if not results:
             return f"No results found for query: '{query}'"
@@ -209,9 +263,11 @@ def search_mcp_documentation(query: str, num_results: int = 5) -> str:
             filename = result.get('filename', 'Unknown file')
             content = result.get('content', '')
             
-            output_lines.append(f"{i}. {filename}")
+            heading = result.get('heading')
+            
+            output_lines.append(f"{i}. {filename}" + (f" ({heading})" if heading else ""))
             
-            # Show first 200 characters of content as preview
+            # Show first 200 characters of the matching chunk as preview
             content_preview = content[:200].replace('\n', ' ').strip()
             if len(content) > 200:
                 content_preview += "..."
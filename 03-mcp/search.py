@@ -4,6 +4,9 @@ import argparse
 from pathlib import Path
 from minsearch import Index
 
+import chunking
+import index_cache
+
 def load_documents():
     """
     Load all .md and .mdx files from the fastmcp-main directory,
@@ -45,41 +48,48 @@ def process_file(file_path, base_path):
 
 def create_search_index(documents):
     """
-    Create and fit a minsearch index with the documents.
-    Uses 'content' as the text field and 'filename' as a keyword field.
+    Create and fit a minsearch index with the documents, split into
+    heading-aware chunks (see chunking.py). Uses 'content' as the text field
+    and 'filename', 'heading', 'start' and 'end' as keyword fields.
     """
     # Filter out None values from processing errors
     valid_docs = [doc for doc in documents if doc is not None]
+    chunks = [chunk for doc in valid_docs for chunk in chunking.chunk_document(doc)]
     
-    if not valid_docs:
+    if not chunks:
         raise ValueError("No valid documents to index")
     
-    # Create the index with content as text field and filename as keyword field
+    # Create the index with content as text field and the chunk's location as keyword fields
     index = Index(
         text_fields=['content'],
-        keyword_fields=['filename']
+        keyword_fields=chunking.KEYWORD_FIELDS
     )
     
-    # Fit the index with the documents
-    index.fit(valid_docs)
+    # Fit the index with the chunks
+    index.fit(chunks)
     
-    print(f"Index created with {len(valid_docs)} documents")
+    print(f"Index created with {len(chunks)} chunks from {len(valid_docs)} documents")
     return index
 
 def search_documents(query, index, num_results=5):
     """
-    Search the index for the given query and return the top num_results documents.
+    Search the index for the given query and return the best matching chunk
+    of each of the top num_results documents.
     """
-    results = index.search(query, num_results=num_results)
+    results = chunking.collapse_by_file(index, query, num_results)
     return results
 
 def main(query, num_results=5):
     """Main function to search for a specific query."""
-    print("Loading documents...")
-    documents = load_documents()
+    def build():
+        print("Loading documents...")
+        documents = load_documents()
+        
+        print("Creating search index...")
+        return create_search_index(documents), documents
     
-    print("Creating search index...")
-    index = create_search_index(documents)
+    # Reuses the on-disk snapshot unless the corpus has changed
+    index, documents, _ = index_cache.load_or_build(Path("fastmcp-main"), build)
     
     print(f"\nSearching for: '{query}'")
     print("=" * 50)
@@ -88,8 +98,9 @@ def main(query, num_results=5):
     
     if results:
         for i, result in enumerate(results, 1):
-            print(f"{i}. {result.get('filename', 'Unknown file')}")
-            # Show first 100 characters of content as preview
+            heading = result.get('heading')
+            print(f"{i}. {result.get('filename', 'Unknown file')}" + (f" ({heading})" if heading else ""))
+            # Show first 100 characters of the matching chunk as preview
             content_preview = result.get('content', '')[:100].replace('\n', ' ').strip()
             print(f"   Preview: {content_preview}...")
             print()
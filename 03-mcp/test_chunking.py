@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the heading-aware chunking of documents (chunking.py).
+
+Run with pytest, or directly: python test_chunking.py
+"""
+from minsearch import Index
+
+import chunking
+
+
+def chunks_of(text, size=chunking.CHUNK_SIZE):
+    return chunking.chunk_document({'content': text, 'filename': "page.md"}, size)
+
+
+def headings(chunks):
+    return [chunk['heading'] for chunk in chunks]
+
+
+def test_chunks_follow_the_heading_path():
+    text = "# Page\nIntro.\n\n## Setup\nInstall it.\n\n### Linux\napt.\n\n## Usage\nRun it.\n"
+    chunks = chunks_of(text)
+    assert headings(chunks) == ["Page", "Page > Setup", "Page > Setup > Linux", "Page > Usage"]
+    for chunk in chunks:
+        assert text[chunk['start']:chunk['end']] == chunk['content']
+    assert chunks[-1]['end'] == len(text)
+
+
+def test_heading_without_body_stays_with_the_next_section():
+    text = "# Page\n\n## Installation\n\n### With pip\npip install fastmcp\n\n## Usage\n## Running\nfastmcp run\n"
+    chunks = chunks_of(text)
+    assert headings(chunks) == ["Page > Installation > With pip", "Page > Running"]
+    assert chunks[0]['content'].startswith("# Page\n\n## Installation\n")
+    assert chunks[1]['content'] == "## Usage\n## Running\nfastmcp run\n"
+
+
+def test_trailing_heading_without_body_joins_the_last_section():
+    chunks = chunks_of("# Page\nText.\n\n## Empty\n")
+    assert headings(chunks) == ["Page"]
+    assert chunks[0]['content'] == "# Page\nText.\n\n## Empty\n"
+
+
+def test_frontmatter_is_dropped_and_its_title_heads_the_page():
+    text = '---\ntitle: "Installation"\nsidebarTitle: Install\nicon: download\n---\n\n## With pip\npip install fastmcp\n'
+    chunks = chunks_of(text)
+    assert headings(chunks) == ["Installation > With pip"]
+    assert "sidebarTitle" not in chunks[0]['content']
+    assert text[chunks[0]['start']:chunks[0]['end']] == chunks[0]['content']
+
+    chunks = chunks_of("---\ntitle: Installation\n---\n# Install FastMCP\nText.\n")
+    assert headings(chunks) == ["Install FastMCP"]
+
+    chunks = chunks_of("---\nicon: download\n---\nJust text.\n")
+    assert headings(chunks) == [""]
+    assert chunks[0]['content'] == "Just text.\n"
+
+
+def test_unclosed_frontmatter_is_text():
+    chunks = chunks_of("---\nNot frontmatter.\n")
+    assert [chunk['content'] for chunk in chunks] == ["---\nNot frontmatter.\n"]
+
+
+def test_hash_lines_in_fences_are_not_headings():
+    text = "# Page\n```bash\n# install it\npip install fastmcp\n```\n~~~python\n## not a heading\n~~~\n## Next\nText.\n"
+    assert headings(chunks_of(text)) == ["Page", "Page > Next"]
+
+    # A fenced block is body text, so the heading before it is not merged away.
+    text = "## Example\n```\n# comment\n```\n## Next\nText.\n"
+    assert headings(chunks_of(text)) == ["Example", "Next"]
+
+
+def test_crlf_input():
+    text = "# Page\r\nIntro.\r\n\r\n## Setup\r\n\r\n### Linux\r\napt.\r\n"
+    chunks = chunks_of(text)
+    assert headings(chunks) == ["Page", "Page > Setup > Linux"]
+    for chunk in chunks:
+        assert text[chunk['start']:chunk['end']] == chunk['content']
+
+    chunks = chunks_of("---\r\ntitle: Guide\r\n---\r\nText.\r\n")
+    assert headings(chunks) == ["Guide"]
+    assert chunks[0]['content'] == "Text.\r\n"
+
+
+def test_file_without_headings_is_one_chunk():
+    text = "Some notes.\n\nMore notes.\n"
+    chunks = chunks_of(text)
+    assert [(chunk['heading'], chunk['start'], chunk['end']) for chunk in chunks] == [("", 0, len(text))]
+    assert chunks_of("") == []
+    assert chunks_of("\n\n") == []
+    assert headings(chunks_of("# Only a title\n")) == ["Only a title"]
+
+
+def test_long_sections_are_split_at_blank_lines():
+    paragraphs = [f"Paragraph {i} " + "word " * 15 for i in range(20)]
+    for newline in ("\n", "\r\n"):
+        text = "# Page" + newline + (newline * 2).join(paragraphs) + newline
+        chunks = chunks_of(text, size=250)
+        assert len(chunks) > 1
+        assert all(chunk['end'] - chunk['start'] <= 250 for chunk in chunks)
+        assert all(chunk['heading'] == "Page" for chunk in chunks)
+        assert [chunk['start'] for chunk in chunks[1:]] == [chunk['end'] for chunk in chunks[:-1]]
+        assert "".join(chunk['content'] for chunk in chunks) == text
+        for chunk in chunks[1:]:
+            assert chunk['content'].startswith("Paragraph")
+
+
+def test_long_line_is_cut_at_the_size():
+    assert chunking.split_size("x" * 25, 0, 25, size=10) == [(0, 10), (10, 20), (20, 25)]
+    assert chunking.split_size("aaaa\nbbbbbbbb", 0, 13, size=10) == [(0, 5), (5, 13)]
+
+
+def test_collapse_by_file_keeps_the_best_chunk_of_each_file():
+    documents = [
+        {'content': "# Tools\n" + "\n\n".join(f"## Tool {i}\nTools decorate functions." for i in range(12)), 'filename': "tools.md"},
+        {'content': "# Resources\nResources expose data.\n\n## Templates\nTools can also read resources.", 'filename': "resources.md"},
+        {'content': "# Prompts\nPrompt templates.", 'filename': "prompts.md"},
+    ]
+    chunks = [chunk for doc in documents for chunk in chunking.chunk_document(doc)]
+    index = Index(text_fields=['content'], keyword_fields=chunking.KEYWORD_FIELDS)
+    index.fit(chunks)
+
+    # tools.md has more matching chunks than the first round of candidates.
+    results = chunking.collapse_by_file(index, "tools", 2)
+    assert [result['filename'] for result in results] == ["tools.md", "resources.md"]
+    assert results[1]['heading'] == "Resources > Templates"
+
+    results = chunking.collapse_by_file(index, "tools", 5)
+    assert sorted(result['filename'] for result in results) == ["resources.md", "tools.md"]
+    assert chunking.collapse_by_file(index, "nothing matches this", 3) == []
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"ok  {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk search index snapshot (index_cache.py).
+
+Run with pytest, or directly: python test_index_cache.py
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import index_cache
+
+
+def make_corpus(tmp_path, files):
+    """Write `files` ({relative path: text}) under tmp_path/docs and return that directory."""
+    base_path = tmp_path / "docs"
+    for name, text in files.items():
+        path = base_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+    return base_path
+
+
+def counting_build(base_path):
+    """A build() for load_or_build that records how often it ran."""
+    calls = []
+
+    def build():
+        calls.append(1)
+        documents = sorted(p.relative_to(base_path).as_posix() for p in index_cache.corpus_files(base_path))
+        return {'files': documents}, documents
+
+    return build, calls
+
+
+def test_snapshot_is_reused_when_nothing_changed(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# A\nalpha", "sub/b.mdx": "# B\nbeta"})
+    build, calls = counting_build(base_path)
+    index, documents, manifest = index_cache.load_or_build(base_path, build)
+    assert len(calls) == 1
+    assert index_cache.snapshot_path(base_path).exists()
+    assert set(manifest) == {"a.md", os.path.join("sub", "b.mdx")}
+
+    index, documents, _ = index_cache.load_or_build(base_path, build)
+    assert len(calls) == 1
+    assert documents == ["a.md", "sub/b.mdx"]
+
+
+def test_touching_a_file_does_not_rebuild(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# A\nalpha"})
+    build, calls = counting_build(base_path)
+    index_cache.load_or_build(base_path, build)
+    stat = (base_path / "a.md").stat()
+    os.utime(base_path / "a.md", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index_cache.load_or_build(base_path, build)
+    assert len(calls) == 1
+
+
+def test_snapshot_is_rebuilt_after_edit_add_and_remove(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# A\nalpha", "b.md": "# B\nbeta"})
+    build, calls = counting_build(base_path)
+    index_cache.load_or_build(base_path, build)
+
+    (base_path / "a.md").write_text("# A\nalpha, edited", encoding='utf-8')
+    index_cache.load_or_build(base_path, build)
+    assert len(calls) == 2
+
+    (base_path / "c.md").write_text("# C\ngamma", encoding='utf-8')
+    _, documents, _ = index_cache.load_or_build(base_path, build)
+    assert len(calls) == 3
+    assert documents == ["a.md", "b.md", "c.md"]
+
+    (base_path / "b.md").unlink()
+    _, documents, _ = index_cache.load_or_build(base_path, build)
+    assert len(calls) == 4
+    assert documents == ["a.md", "c.md"]
+
+    index_cache.load_or_build(base_path, build)
+    assert len(calls) == 4
+
+
+def test_snapshot_is_rebuilt_when_the_format_or_minsearch_version_changes(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# A\nalpha"})
+    build, calls = counting_build(base_path)
+    index_cache.load_or_build(base_path, build)
+
+    original = index_cache.FORMAT
+    index_cache.FORMAT = original + 1
+    try:
+        index_cache.load_or_build(base_path, build)
+    finally:
+        index_cache.FORMAT = original
+    assert len(calls) == 2
+
+    original = getattr(index_cache.minsearch, '__version__', None)
+    index_cache.minsearch.__version__ = "0.0.0-test"
+    try:
+        index_cache.load_or_build(base_path, build)
+    finally:
+        index_cache.minsearch.__version__ = original
+    assert len(calls) == 3
+
+
+def test_corrupt_or_truncated_snapshot_falls_back_to_a_rebuild(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# A\nalpha"})
+    build, calls = counting_build(base_path)
+    index_cache.load_or_build(base_path, build)
+    path = index_cache.snapshot_path(base_path)
+
+    path.write_bytes(path.read_bytes()[:20])
+    _, documents, _ = index_cache.load_or_build(base_path, build)
+    assert len(calls) == 2
+    assert documents == ["a.md"]
+
+    path.write_bytes(b"not a pickle at all")
+    index_cache.load_or_build(base_path, build)
+    assert len(calls) == 3
+
+    # The rebuild replaced the damaged file with a usable snapshot.
+    index_cache.load_or_build(base_path, build)
+    assert len(calls) == 3
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+        print(f"ok  {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for keeping the server's search index up to date: index_cache.Watcher
+polling a corpus and main.update_search applying what it reports.
+
+Run with pytest, or directly: python test_watcher.py
+"""
+import tempfile
+from pathlib import Path
+
+import chunking
+import index_cache
+import main
+
+
+def make_corpus(tmp_path, files):
+    """Write `files` ({relative path: text}) under tmp_path/docs and return that directory."""
+    base_path = tmp_path / "docs"
+    for name, text in files.items():
+        path = base_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+    return base_path
+
+
+def start_server(base_path):
+    """Point main at base_path and load its index; returns a Watcher to poll by hand."""
+    main.docs_path = lambda: base_path
+    main._search_index = main._search_documents = None
+    index, documents = main.initialize_search(watch=False)
+    return index_cache.Watcher(base_path, index_cache.scan(base_path), main.update_search)
+
+
+def search(query):
+    index, _ = main.initialize_search(watch=False)
+    return chunking.collapse_by_file(index, query, 5)
+
+
+def filenames(results):
+    return sorted(result['filename'] for result in results)
+
+
+def run_with_server(test):
+    """Restore main's globals after `test`, which points them at a temporary corpus."""
+    def wrapper(tmp_path):
+        saved = main.docs_path, main._search_index, main._search_documents
+        try:
+            test(tmp_path)
+        finally:
+            main.docs_path, main._search_index, main._search_documents = saved
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@run_with_server
+def test_poll_picks_up_an_edit(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# Tools\nDecorate a function.", "b.md": "# Resources\nServe files."})
+    watcher = start_server(base_path)
+    assert watcher.poll() is False
+    assert search("prompts") == []
+
+    (base_path / "a.md").write_text("# Prompts\nReusable prompt templates.", encoding='utf-8')
+    assert watcher.poll() is True
+    assert filenames(search("prompts")) == ["a.md"]
+    assert search("decorate") == []
+    assert watcher.poll() is False
+
+
+@run_with_server
+def test_poll_drops_the_chunks_of_a_deleted_file(tmp_path):
+    base_path = make_corpus(tmp_path, {
+        "a.md": "# Tools\nDecorate a function.",
+        "b.md": "# Resources\nServe files.\n\n## Templates\nResource templates.",
+    })
+    watcher = start_server(base_path)
+    assert filenames(search("resource templates")) == ["b.md"]
+
+    (base_path / "b.md").unlink()
+    assert watcher.poll() is True
+    assert search("resource templates") == []
+    assert [doc['filename'] for doc in main._search_documents] == ["a.md"]
+    assert filenames(search("decorate")) == ["a.md"]
+
+
+@run_with_server
+def test_failed_rebuild_keeps_serving_the_old_index(tmp_path):
+    base_path = make_corpus(tmp_path, {"a.md": "# Tools\nDecorate a function."})
+    watcher = start_server(base_path)
+    index, documents = main._search_index, main._search_documents
+
+    def fail(documents):
+        raise ValueError("index build failed")
+
+    create_search_index = main.create_search_index
+    main.create_search_index = fail
+    try:
+        (base_path / "a.md").write_text("# Prompts\nReusable prompt templates.", encoding='utf-8')
+        assert watcher.poll() is False
+    finally:
+        main.create_search_index = create_search_index
+    assert main._search_index is index and main._search_documents is documents
+    assert filenames(search("decorate")) == ["a.md"]
+
+    # The change was not recorded as applied, so the next poll retries it.
+    assert watcher.poll() is True
+    assert filenames(search("prompts")) == ["a.md"]
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+        print(f"ok  {test.__name__}")
+    print(f"\n{len(tests)} tests passed")